@@ -0,0 +1,151 @@
+import numpy as numpy
+import gurobipy as gp
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import dataloader as loader
+
+# the cache is shared by all the databases, so that the size bound holds for the whole cache
+BASELINE_CACHE_DIR = os.path.join('Data', '.baselines')
+MAX_CACHE_BYTES = 1<<30
+BASELINE_FORMAT_VERSION = 1
+
+def baseline_key(database_name, measuresToRun, dataDir='Data'):
+    """
+    baseline_key - the key of the measures of a clean database.
+    The key depends on the contents of inputDB.csv (and the settings it is parsed with), the contents of dcs.txt,
+    the selected measures and, for I_R and I_lin_R, the version of the solver.
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database
+    measuresToRun : dictionary
+        a dictionary in which the measures are the keys and true/false are the values
+
+    Returns
+    -------
+    string
+        the hex digest of the key
+    """
+    databaseDir = os.path.join(dataDir, database_name)
+    selected = sorted(m for m in measuresToRun if measuresToRun[m])
+    solver = None
+    if "I_R" in selected or "I_lin_R" in selected:
+        solver = 'gurobi ' + '.'.join(str(v) for v in gp.gurobi.version())
+    parts = [loader.cache_key(os.path.join(databaseDir, 'inputDB.csv'), loader.NA_VALUES, True),
+             loader.file_hash(os.path.join(databaseDir, 'dcs.txt')),
+             ','.join(selected), str(solver), str(BASELINE_FORMAT_VERSION)]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+def load_baseline(key, cacheDir=BASELINE_CACHE_DIR):
+    """
+    load_baseline - reads the measures and the violating pairs of a clean database from the cache.
+    A hit marks the entry as recently used.
+
+    Returns
+    -------
+    list of a dictionary and an array:
+        the values of the measures and the (n,2) array of the violating pairs (None when the pairs were not
+        stored), or None when the key is not in the cache
+    """
+    entryDir = os.path.join(cacheDir, key)
+    valuesFileName = os.path.join(entryDir, 'values.json')
+    if not os.path.exists(valuesFileName):
+        return None
+    with open(valuesFileName, 'r') as f:
+        values = json.load(f)
+    pairsFileName = os.path.join(entryDir, 'pairs.npy')
+    pairs = numpy.load(pairsFileName, mmap_mode='r') if os.path.exists(pairsFileName) else None
+    os.utime(entryDir)
+    return values, pairs
+
+def store_baseline(key, values, pairs=None, cacheDir=BASELINE_CACHE_DIR, maxBytes=MAX_CACHE_BYTES):
+    """
+    store_baseline - writes the measures and the violating pairs of a clean database to the cache, then evicts
+    the least recently used entries until the cache fits in maxBytes.
+    An entry is written to a temporary directory that is renamed into place, so readers never see a partial entry.
+
+    Parameters
+    ----------
+    key : string
+        the result of baseline_key
+    values : dictionary
+        from the names of the measures to their values
+    pairs : (n,2) array of int
+        the violating pairs of the clean database, or None
+    """
+    if not os.path.exists(cacheDir):
+        os.makedirs(cacheDir, exist_ok=True)
+    entryDir = os.path.join(cacheDir, key)
+    tmpDir = tempfile.mkdtemp(prefix='.tmp_', dir=cacheDir)
+    with open(os.path.join(tmpDir, 'values.json'), 'w') as f:
+        json.dump(dict((m, v if isinstance(v, int) else float(v)) for m, v in values.items()), f)
+    if pairs is not None:
+        numpy.save(os.path.join(tmpDir, 'pairs.npy'), numpy.asarray(pairs, dtype=numpy.int64).reshape(-1, 2))
+    try:
+        os.rename(tmpDir, entryDir)
+    except OSError:
+        # another process has already stored the same entry
+        shutil.rmtree(tmpDir, ignore_errors=True)
+    evict(cacheDir, maxBytes, keep=key)
+
+def _entry_size(entryDir):
+    return sum(os.path.getsize(os.path.join(entryDir, name)) for name in os.listdir(entryDir))
+
+def evict(cacheDir=BASELINE_CACHE_DIR, maxBytes=MAX_CACHE_BYTES, keep=None):
+    """
+    evict - removes the least recently used entries of the cache until its size is at most maxBytes.
+    The entry keep is never removed.
+
+    Returns
+    -------
+    list of strings, the keys of the removed entries
+    """
+    entries = []
+    for name in os.listdir(cacheDir):
+        entryDir = os.path.join(cacheDir, name)
+        if name.startswith('.') or not os.path.isdir(entryDir):
+            continue
+        entries.append((os.path.getmtime(entryDir), name, _entry_size(entryDir)))
+    total = sum(entry[2] for entry in entries)
+    removed = []
+    for accessed, name, size in sorted(entries):
+        if total <= maxBytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(cacheDir, name), ignore_errors=True)
+        total -= size
+        removed.append(name)
+    return removed
+
+def cached_baseline(database_name, measuresToRun, compute, cacheDir=BASELINE_CACHE_DIR, maxBytes=MAX_CACHE_BYTES, dataDir='Data'):
+    """
+    cached_baseline - the measures of a clean database, from the cache when the same database, constraints and
+    measures were computed before, and from compute otherwise (the result is then stored in the cache).
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database
+    measuresToRun : dictionary
+        a dictionary in which the measures are the keys and true/false are the values
+    compute : function
+        computes the measures, returns a dictionary of the values and an (n,2) array of the violating pairs
+        (or None)
+
+    Returns
+    -------
+    list of a dictionary, an array and a bool:
+        the values of the measures, the violating pairs (or None) and true when they were found in the cache
+    """
+    key = baseline_key(database_name, measuresToRun, dataDir)
+    cached = load_baseline(key, cacheDir)
+    if cached is not None:
+        return cached[0], cached[1], True
+    values, pairs = compute()
+    store_baseline(key, values, pairs, cacheDir, maxBytes)
+    return values, pairs, False
@@ -0,0 +1,38 @@
+import numpy as numpy
+
+def connected_components(uniquePairs):
+    """
+    connected_components - finds the connected components of the conflict graph, wherein nodes represent tuples
+    and edges represent pairs of tuples that jointly violate a constraint.
+    Components are found by repeatedly hooking the root of the larger endpoint of every edge onto the smaller
+    root, followed by pointer jumping, which keeps all the work in numpy.
+
+    Parameters
+    ----------
+    uniquePairs : (n,2) array of int
+        the pairs of ids of tuples that jointly violate a constraint
+
+    Returns
+    -------
+    list of two arrays of int:
+        nodes are the ids of the tuples that participate in a violation, sorted.
+        labels[k] is the component of nodes[k], components are numbered from 0.
+    """
+    uniquePairs = numpy.asarray(uniquePairs).reshape(-1, 2)
+    nodes = numpy.unique(uniquePairs)
+    a = numpy.searchsorted(nodes, uniquePairs[:,0])
+    b = numpy.searchsorted(nodes, uniquePairs[:,1])
+    parent = numpy.arange(len(nodes))
+    while True:
+        rootA, rootB = parent[a], parent[b]
+        differ = rootA != rootB
+        if not differ.any():
+            break
+        numpy.minimum.at(parent, numpy.maximum(rootA, rootB)[differ], numpy.minimum(rootA, rootB)[differ])
+        while True:
+            grandParent = parent[parent]
+            if numpy.array_equal(grandParent, parent):
+                break
+            parent = grandParent
+    labels = numpy.unique(parent, return_inverse=True)[1]
+    return nodes, labels.reshape(-1)
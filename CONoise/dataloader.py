@@ -0,0 +1,251 @@
+import pandas as pd
+import numpy as numpy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# the values that are parsed as missing values when reading inputDB.csv
+NA_VALUES = ['-1.#IND', '1.#QNAN', '1.#IND', '-1.#QNAN', '#N/A N/A', '#N/A', 'N/A', 'n/a','', '#NA', 'NULL','null', 'NaN', '-NaN', 'nan', '-nan', '']
+
+CACHE_FORMAT_VERSION = 1
+
+def file_hash(path, blockSize=1<<24):
+    """
+    file_hash - computes the sha256 hash of the contents of a file.
+    Hashing a multi-GB file is not free, so the hash is memoized in a small index file next to the
+    input, keyed by the size and the modification time of the file. The contents are re-hashed only
+    when one of them changes.
+
+    Parameters
+    ----------
+    path : string
+        the path of the file
+    blockSize : int
+        the number of bytes read at a time
+
+    Returns
+    -------
+    string
+        the hex digest of the contents of the file
+    """
+    stat = os.stat(path)
+    statKey = str(stat.st_size) + ':' + str(stat.st_mtime_ns)
+    indexFileName = os.path.join(os.path.dirname(os.path.abspath(path)), '.hashes.json')
+    index = {}
+    if os.path.exists(indexFileName):
+        try:
+            with open(indexFileName, 'r') as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+    entry = index.get(os.path.basename(path))
+    if entry is not None and entry[0] == statKey:
+        return entry[1]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        block = f.read(blockSize)
+        while block:
+            digest.update(block)
+            block = f.read(blockSize)
+    contentHash = digest.hexdigest()
+
+    index[os.path.basename(path)] = [statKey, contentHash]
+    _atomic_write_json(indexFileName, index)
+    return contentHash
+
+def cache_key(csvPath, naValues, renameColumns):
+    """
+    cache_key - the key of the binary cache of a csv file.
+    The key depends on the contents of the file and on every setting that changes the parsed frame.
+
+    Parameters
+    ----------
+    csvPath : string
+        the path of the csv file
+    naValues : list of strings
+        the values that are parsed as missing values
+    renameColumns : bool
+        true if spaces in the column names are replaced with '_'
+
+    Returns
+    -------
+    string
+        the key of the cache
+    """
+    settings = json.dumps({'version': CACHE_FORMAT_VERSION, 'pandas': pd.__version__, 'na_values': sorted(set(naValues)), 'rename': bool(renameColumns)}, sort_keys=True)
+    return hashlib.sha256((file_hash(csvPath) + settings).encode('utf-8')).hexdigest()[:32]
+
+def write_cache(df, cacheDir):
+    """
+    write_cache - stores a dataframe as a columnar binary cache, one .npy file per column.
+    Numeric and boolean columns are stored as they are. Any other column is stored as a fixed width
+    unicode array together with a boolean mask of its missing values, so that every file of the cache
+    can be memory-mapped.
+    The cache is written into a temporary directory and moved into place at the end, so concurrent
+    readers never see a partial cache.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    cacheDir : string
+        the directory of the cache
+    """
+    parentDir = os.path.dirname(os.path.abspath(cacheDir))
+    os.makedirs(parentDir, exist_ok=True)
+    tmpDir = tempfile.mkdtemp(dir=parentDir, prefix='.tmp_')
+
+    columns = []
+    for k, col in enumerate(df.columns):
+        series = df[col]
+        kind = series.dtype.kind
+        if kind in 'biuf':
+            numpy.save(os.path.join(tmpDir, 'col_'+str(k)+'.npy'), series.to_numpy())
+            columns.append({'name': col, 'dtype': str(series.dtype), 'kind': 'numeric'})
+        else:
+            mask = series.isna().to_numpy()
+            values = series.astype(object).where(~mask, '').astype(str).to_numpy(dtype=str)
+            numpy.save(os.path.join(tmpDir, 'col_'+str(k)+'.npy'), values)
+            numpy.save(os.path.join(tmpDir, 'col_'+str(k)+'.mask.npy'), mask)
+            columns.append({'name': col, 'dtype': str(series.dtype), 'kind': 'string'})
+
+    _atomic_write_json(os.path.join(tmpDir, 'meta.json'), {'rows': int(df.shape[0]), 'columns': columns})
+    try:
+        os.rename(tmpDir, cacheDir)
+    except OSError:
+        # another process has already written the same cache
+        shutil.rmtree(tmpDir, ignore_errors=True)
+
+def read_cache(cacheDir, mmapMode='c'):
+    """
+    read_cache - loads a dataframe from a columnar binary cache written by write_cache.
+    Numeric columns are memory-mapped, so the pages of the cache are shared between all the processes
+    that read it. With the default copy-on-write mode, changes to the frame stay private to the process
+    and never reach the files of the cache.
+
+    Parameters
+    ----------
+    cacheDir : string
+        the directory of the cache
+    mmapMode : string
+        the mode passed to numpy.load ('c' for copy-on-write, 'r' for read only, None to load into memory)
+
+    Returns
+    -------
+    dataframe
+        the database frame
+    """
+    with open(os.path.join(cacheDir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+
+    data = {}
+    for k, column in enumerate(meta['columns']):
+        values = numpy.load(os.path.join(cacheDir, 'col_'+str(k)+'.npy'), mmap_mode=mmapMode)
+        if column['kind'] == 'numeric':
+            data[column['name']] = pd.Series(values, name=column['name'], copy=False)
+        else:
+            mask = numpy.load(os.path.join(cacheDir, 'col_'+str(k)+'.mask.npy'))
+            objects = values.astype(object)
+            objects[mask] = numpy.nan
+            data[column['name']] = pd.Series(objects, name=column['name']).astype(column['dtype'])
+
+    return pd.DataFrame(data, columns=[column['name'] for column in meta['columns']], copy=False)
+
+def load_database(database_name, naValues=NA_VALUES, renameColumns=True, useCache=True, dataDir='Data'):
+    """
+    load_database - loads Data/<database_name>/inputDB.csv into a dataframe.
+    The first load converts the csv file into a columnar binary cache under Data/<database_name>/.cache,
+    keyed by the contents of the file and the parsing settings. Later loads (and parallel workers)
+    memory-map the cache instead of parsing the csv file again.
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database
+    naValues : list of strings
+        the values that are parsed as missing values
+    renameColumns : bool
+        true if spaces in the column names should be replaced with '_'
+    useCache : bool
+        false to always parse the csv file and skip the cache
+    dataDir : string
+        the folder containing the databases
+
+    Returns
+    -------
+    dataframe
+        the database frame
+    """
+    csvPath = os.path.join(dataDir, database_name, 'inputDB.csv')
+    if useCache:
+        cacheDir = os.path.join(dataDir, database_name, '.cache', 'db_' + cache_key(csvPath, naValues, renameColumns))
+        if os.path.exists(os.path.join(cacheDir, 'meta.json')):
+            return read_cache(cacheDir)
+
+    df = pd.read_csv(csvPath, keep_default_na=False, na_values=naValues, header=0)
+
+    # in case the column names include spaces
+    if renameColumns:
+        allColumns = {}
+        for col in df.columns:
+            allColumns[col] = col.replace(' ','_')
+        df = df.rename(columns=allColumns)
+
+    if useCache:
+        write_cache(df, cacheDir)
+        return read_cache(cacheDir)
+    return df
+
+def read_chunks(database_name, chunkSize, naValues=NA_VALUES, renameColumns=True, dataDir='Data'):
+    """
+    read_chunks - reads Data/<database_name>/inputDB.csv in chunks of rows, for the streaming measures
+    (see streaming.py). The chunks are parsed like load_database, without the cache.
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database
+    chunkSize : int
+        the number of rows of every chunk
+    naValues, renameColumns, dataDir :
+        see load_database
+
+    Returns
+    -------
+    generator of dataframes
+    """
+    csvPath = os.path.join(dataDir, database_name, 'inputDB.csv')
+    for chunk in pd.read_csv(csvPath, keep_default_na=False, na_values=naValues, header=0, chunksize=chunkSize):
+        if renameColumns:
+            chunk = chunk.rename(columns=dict((col, col.replace(' ','_')) for col in chunk.columns))
+        yield chunk
+
+def load_constraints(database_name, dataDir='Data'):
+    """
+    load_constraints - reads the denial constraints of a database from Data/<database_name>/dcs.txt.
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database
+    dataDir : string
+        the folder containing the databases
+
+    Returns
+    -------
+    list of strings
+        the constraints, where spaces in column names are replaced with '_'
+    """
+    with open(os.path.join(dataDir, database_name, 'dcs.txt'), 'r') as constraints_raw:
+        constraints = [line.strip() for line in constraints_raw.readlines()]
+    constraints = [x.replace(' ', '_') for x in constraints if x] #in case the columns names include spaces
+    return constraints
+
+def _atomic_write_json(path, obj):
+    tmpFileName = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpFileName, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmpFileName, path)
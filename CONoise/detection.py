@@ -0,0 +1,1229 @@
+import pandas as pd
+import numpy as numpy
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from multiprocessing import shared_memory
+import pairstore
+
+# the comparison operators that may appear in a denial constraint
+OPERATORS = {'=': numpy.equal, '!=': numpy.not_equal, '<': numpy.less, '>': numpy.greater, '<=': numpy.less_equal, '>=': numpy.greater_equal}
+
+# the operator of a comparison whose sides are swapped
+CONVERSE = {'<': '>', '<=': '>=', '=': '=', '!=': '!=', '>': '<', '>=': '<='}
+
+# an estimate of the memory used for every candidate pair of tuples while it is being checked
+PAIR_BYTES = 64
+
+# the number of processes of parallel_constraints_check, the cores this process may run on
+DETECTION_WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+def parse_constraint(con):
+    """
+    parse_constraint - splits a constraint of the form not(t1.A=t2.A&t1.B!=t2.B) into its conditions.
+
+    Parameters
+    ----------
+    con : string
+        a constraint from the dcs file
+
+    Returns
+    -------
+    list of tuples (rowA, fieldA, op, rowB, fieldB):
+        rowA and rowB are either t1 or t2. In case the right-hand side of the condition is a constant,
+        rowB is None and fieldB is the value of the constant.
+    """
+    predicates = []
+    for condition in con.strip()[4:-1].split('&'):
+        lhs, op, rhs = re.split('(!=|>=|<=|>|<|=)', condition, 1)
+        rowA, fieldA = lhs.strip().split('.', 1)
+        rhs = rhs.strip()
+        if re.match(r't[12]\.', rhs):
+            rowB, fieldB = rhs.split('.', 1)
+        else:
+            rowB, fieldB = None, _parse_constant(rhs)
+        predicates.append((rowA, fieldA, op, rowB, fieldB))
+    return predicates
+
+def normalize_predicates(predicates, swap=False):
+    """
+    normalize_predicates - a canonical form of the conditions of a constraint, so that conditions that are
+    written differently but compare the same values are equal. Every condition becomes (left, op, right), where
+    left and right are (row, field) and left <= right, or right is None and the condition compares left with the
+    constant value. The rows of a constraint on two tuples are interchangeable: swap renames t1 to t2 and t2 to t1.
+
+    Parameters
+    ----------
+    predicates : list of tuples
+        the conditions, as returned by parse_constraint
+    swap : bool
+        true to swap the tuples of the constraint
+
+    Returns
+    -------
+    list of tuples (left, op, right, value)
+    """
+    rename = {'t1': 't2', 't2': 't1'} if swap else {'t1': 't1', 't2': 't2'}
+    normalized = []
+    for rowA, fieldA, op, rowB, fieldB in predicates:
+        left = (rename[rowA], fieldA)
+        if rowB is None:
+            normalized.append((left, op, None, fieldB))
+            continue
+        right = (rename[rowB], fieldB)
+        if right < left:
+            left, right, op = right, left, CONVERSE[op]
+        normalized.append((left, op, right, None))
+    return normalized
+
+def is_symmetric(predicates):
+    """
+    is_symmetric - true if a constraint on two tuples does not change when t1 and t2 are swapped (for example
+    not(t1.A=t2.A&t1.B!=t2.B)). The pair (i,j) violates such a constraint if and only if (j,i) does, so only the
+    pairs i<j are checked.
+
+    Parameters
+    ----------
+    predicates : list of tuples
+        the conditions, as returned by parse_constraint
+
+    Returns
+    -------
+    bool
+    """
+    return set(normalize_predicates(predicates)) == set(normalize_predicates(predicates, True))
+
+def _parse_constant(value):
+    value = value.strip('\'"')
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def split_conditions(con, index=0):
+    """
+    split_conditions - separates the equality conditions t1.fieldA=t2.fieldB of a constraint, which define the
+    blocks of candidate pairs, from its other conditions. The constants of the conditions are not encoded.
+
+    Parameters
+    ----------
+    con : string
+        a constraint from the dcs file
+    index : int
+        the position of the constraint in its list
+
+    Returns
+    -------
+    dictionary with the keys index, constraint, single (true if the constraint refers to a single tuple),
+    symmetric (see is_symmetric), keys (the pairs (fieldA, fieldB) of the conditions t1.fieldA=t2.fieldB) and
+    predicates (all the other conditions)
+    """
+    predicates = parse_constraint(con)
+    single = "t2" not in con
+    keys, rest = [], []
+    for rowA, fieldA, op, rowB, fieldB in predicates:
+        if not single and op == '=' and rowB is not None and rowA != rowB:
+            keys.append((fieldA, fieldB) if rowA == 't1' else (fieldB, fieldA))
+        else:
+            rest.append((rowA, fieldA, op, rowB, fieldB))
+    return {'index': index, 'constraint': con, 'single': single, 'symmetric': not single and is_symmetric(predicates), 'keys': keys, 'predicates': rest}
+
+def compile_constraints(constraintSets, df):
+    """
+    compile_constraints - prepares the constraints for the violation detection.
+    The columns that appear in the constraints are encoded as numeric arrays: numeric columns are kept as
+    floats and string columns are replaced by their rank in a vocabulary shared by all the string columns,
+    so that equality and order between different columns are preserved.
+
+    Parameters
+    ----------
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    df : dataframe
+        the database frame
+
+    Returns
+    -------
+    dictionary with the keys:
+        columns - a dictionary from a column name to its encoded values
+        valid - a boolean array, true for the tuples without missing values (the other tuples are ignored,
+                like in the queries of build_dynamic_queries)
+        dcs - a list of dictionaries, one per constraint, as returned by split_conditions, with the constants
+              of the predicates encoded
+        groups - the constraints grouped by their equality conditions, as returned by group_constraints
+    """
+    dcs = [split_conditions(con, index) for index, con in enumerate(constraintSets)]
+
+    usedColumns = []
+    stringConstants = []
+    for dc in dcs:
+        for fieldA, fieldB in dc['keys']:
+            usedColumns += [fieldA, fieldB]
+        for rowA, fieldA, op, rowB, fieldB in dc['predicates']:
+            usedColumns.append(fieldA)
+            if rowB is None:
+                if isinstance(fieldB, str):
+                    stringConstants.append(fieldB)
+            else:
+                usedColumns.append(fieldB)
+    usedColumns = list(dict.fromkeys(usedColumns))
+
+    # the distinct values of every string column are found by hashing, only the vocabulary itself is sorted
+    stringColumns = [col for col in usedColumns if df[col].dtype.kind not in 'biuf']
+    factorized = {}
+    for col in stringColumns:
+        codes, uniques = pd.factorize(df[col])
+        factorized[col] = (codes, numpy.asarray(uniques, dtype=object).astype(str))
+    vocabulary = numpy.unique(numpy.concatenate([factorized[col][1] for col in stringColumns] + [numpy.array(stringConstants, dtype=str)])) if stringColumns or stringConstants else numpy.array([], dtype=str)
+
+    columns = {}
+    for col in usedColumns:
+        if col in stringColumns:
+            codes, uniques = factorized[col]
+            # missing values get the code -1, they are ignored anyway
+            columns[col] = numpy.append(numpy.searchsorted(vocabulary, uniques), -1).astype(numpy.int64)[codes]
+        else:
+            columns[col] = df[col].to_numpy(dtype=numpy.float64)
+
+    for dc in dcs:
+        dc['predicates'] = [(rowA, fieldA, op, rowB, numpy.searchsorted(vocabulary, fieldB) if rowB is None and isinstance(fieldB, str) else fieldB) for rowA, fieldA, op, rowB, fieldB in dc['predicates']]
+
+    valid = df.notna().all(axis=1).to_numpy()
+    return {'columns': columns, 'valid': valid, 'dcs': dcs, 'groups': group_constraints(dcs)}
+
+def evaluate_predicates(predicates, columns, I, J):
+    """
+    evaluate_predicates - checks the conditions of a constraint on candidate pairs of tuples.
+
+    Parameters
+    ----------
+    predicates : list of tuples
+        the conditions, as returned by parse_constraint
+    columns : dictionary
+        the encoded columns
+    I, J : arrays of int
+        the positions of the tuples playing the roles of t1 and t2, respectively
+
+    Returns
+    -------
+    a boolean array, true for the pairs that satisfy all the conditions (i.e., violate the constraint)
+    """
+    mask = numpy.ones(len(I), dtype=bool)
+    for rowA, fieldA, op, rowB, fieldB in predicates:
+        left = columns[fieldA][I if rowA == 't1' else J]
+        if rowB is None:
+            right = fieldB
+        else:
+            right = columns[fieldB][I if rowB == 't1' else J]
+        mask &= OPERATORS[op](left, right)
+    return mask
+
+def key_codes(columns, keys, positions):
+    """
+    key_codes - encodes the values of the equality conditions t1.fieldA=t2.fieldB of a constraint.
+    Two tuples i and j are candidates for a violation only if leftCodes[i] equals rightCodes[j].
+
+    Parameters
+    ----------
+    columns : dictionary
+        the encoded columns
+    keys : list of pairs (fieldA, fieldB)
+    positions : array of int
+        the positions of the tuples to encode
+
+    Returns
+    -------
+    two arrays of int, the codes of the tuples as t1 and as t2
+    """
+    n = len(positions)
+    left = right = numpy.zeros(n, dtype=numpy.int64)
+    for k, (fieldA, fieldB) in enumerate(keys):
+        # conditions of the form t1.A=t2.A give the same codes to both sides, so the column is encoded once
+        if fieldA == fieldB:
+            codes, uniques = pd.factorize(columns[fieldA][positions])
+            leftCodes = rightCodes = codes
+        else:
+            codes, uniques = pd.factorize(numpy.concatenate([columns[fieldA][positions], columns[fieldB][positions]]))
+            leftCodes, rightCodes = codes[:n], codes[n:]
+        if k == 0:
+            left, right = leftCodes, rightCodes
+        elif left is right and leftCodes is rightCodes:
+            left = right = pd.factorize(left * len(uniques) + leftCodes)[0]
+        else:
+            combined, _ = pd.factorize(numpy.concatenate([left * len(uniques) + leftCodes, right * len(uniques) + rightCodes]))
+            left, right = combined[:n], combined[n:]
+    return left.astype(numpy.int64), right.astype(numpy.int64)
+
+def candidate_pairs(leftCodes, rightCodes):
+    """
+    candidate_pairs - the number of candidate pairs (i,j) such that leftCodes[i] equals rightCodes[j],
+    including the pairs where i equals j.
+    """
+    size = int(max(leftCodes.max(initial=-1), rightCodes.max(initial=-1))) + 1
+    return int(numpy.dot(numpy.bincount(leftCodes, minlength=size).astype(numpy.float64), numpy.bincount(rightCodes, minlength=size).astype(numpy.float64)))
+
+def _upper_pairs(starts, sizes, rows):
+    # the pairs (a,b), a<b, of positions of sorted blocks, for the rows a of the blocks given as (block, row)
+    block, row = rows
+    lengths = sizes[block] - 1 - row
+    pairRows = numpy.repeat(numpy.arange(len(row)), lengths)
+    offsets = numpy.arange(lengths.sum()) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    a = starts[block] + row
+    return a[pairRows], a[pairRows] + 1 + offsets
+
+def block_pairs(leftIdx, leftCodes, rightIdx, rightCodes, maxPairs, smallestFirst=False, upper=False):
+    """
+    block_pairs - generates the candidate pairs (i,j) such that leftCodes[i] equals rightCodes[j], in batches
+    of at most maxPairs pairs. A block that is larger than maxPairs is split into tiles of its t1 tuples.
+    When both sides are the same tuples with the same codes, upper generates each pair of a block once, as
+    (i,j) with i<j (the positions must be increasing), for the constraints that are symmetric.
+
+    Parameters
+    ----------
+    leftIdx, rightIdx : arrays of int
+        the positions of the tuples playing the roles of t1 and t2, respectively
+    leftCodes, rightCodes : arrays of int
+        the codes of the tuples, as returned by key_codes
+    maxPairs : int
+        the maximal number of pairs in a batch
+    smallestFirst : bool
+        true to generate the small blocks first
+    upper : bool
+        true to generate only the pairs i<j, rightIdx and rightCodes are then ignored
+
+    Returns
+    -------
+    generator of pairs of arrays (I,J)
+    """
+    maxPairs = max(1, int(maxPairs))
+    if upper:
+        yield from _upper_block_pairs(leftIdx, leftCodes, maxPairs, smallestFirst)
+        return
+    lo = numpy.argsort(leftCodes, kind='stable')
+    ro = numpy.argsort(rightCodes, kind='stable')
+    leftIdx, leftCodes = leftIdx[lo], leftCodes[lo]
+    rightIdx, rightCodes = rightIdx[ro], rightCodes[ro]
+    lu, ls, ln = numpy.unique(leftCodes, return_index=True, return_counts=True)
+    ru, rs, rn = numpy.unique(rightCodes, return_index=True, return_counts=True)
+    common, a, b = numpy.intersect1d(lu, ru, assume_unique=True, return_indices=True)
+    ls, ln, rs, rn = ls[a], ln[a], rs[b], rn[b]
+    sizes = ln * rn
+    if smallestFirst:
+        order = numpy.argsort(sizes, kind='stable')
+        common, ls, ln, rs, rn, sizes = common[order], ls[order], ln[order], rs[order], rn[order], sizes[order]
+
+    start = 0
+    while start < len(common):
+        if sizes[start] > maxPairs:
+            # a single block that does not fit, split its t1 tuples into tiles
+            tileRows = max(1, maxPairs // rn[start])
+            J = rightIdx[rs[start]:rs[start]+rn[start]]
+            for tile in range(ls[start], ls[start]+ln[start], tileRows):
+                I = leftIdx[tile:min(tile+tileRows, ls[start]+ln[start])]
+                yield numpy.repeat(I, len(J)), numpy.tile(J, len(I))
+            start += 1
+            continue
+        end = start + max(1, int(numpy.searchsorted(numpy.cumsum(sizes[start:]), maxPairs, side='right')))
+        groupSizes = sizes[start:end]
+        g = numpy.repeat(numpy.arange(start, end), groupSizes)
+        offsets = numpy.arange(groupSizes.sum()) - numpy.repeat(numpy.cumsum(groupSizes) - groupSizes, groupSizes)
+        yield leftIdx[ls[g] + offsets // rn[g]], rightIdx[rs[g] + offsets % rn[g]]
+        start = end
+
+def _upper_block_pairs(idx, codes, maxPairs, smallestFirst):
+    order = numpy.argsort(codes, kind='stable')
+    idx = idx[order]
+    _, starts, counts = numpy.unique(codes[order], return_index=True, return_counts=True)
+    keep = counts > 1
+    starts, counts = starts[keep], counts[keep]
+    sizes = counts * (counts - 1) // 2
+    if smallestFirst:
+        order = numpy.argsort(sizes, kind='stable')
+        starts, counts, sizes = starts[order], counts[order], sizes[order]
+
+    start = 0
+    while start < len(starts):
+        if sizes[start] > maxPairs:
+            # a single block that does not fit, split its rows into tiles of about maxPairs pairs
+            rows = numpy.arange(counts[start] - 1)
+            cumulative = numpy.cumsum(counts[start] - 1 - rows)
+            first = 0
+            while first < len(rows):
+                end = max(first + 1, int(numpy.searchsorted(cumulative, (cumulative[first-1] if first else 0) + maxPairs, side='right')))
+                a, b = _upper_pairs(starts, counts, (numpy.full(end - first, start), rows[first:end]))
+                yield idx[a], idx[b]
+                first = end
+            start += 1
+            continue
+        end = start + max(1, int(numpy.searchsorted(numpy.cumsum(sizes[start:]), maxPairs, side='right')))
+        block = numpy.repeat(numpy.arange(start, end), counts[start:end])
+        row = numpy.arange(len(block)) - numpy.repeat(numpy.cumsum(counts[start:end]) - counts[start:end], counts[start:end])
+        a, b = _upper_pairs(starts, counts, (block, row))
+        yield idx[a], idx[b]
+        start = end
+
+def group_constraints(dcs):
+    """
+    group_constraints - groups the constraints by the signature of their equality conditions.
+    All the constraints of a group share the same blocks of candidate pairs, so the blocks are built once
+    per group and every candidate pair is checked against all the constraints of the group in one pass.
+    The constraints that refer to a single tuple form a group of their own. A group is symmetric when all its
+    constraints are (see is_symmetric), and then only the candidate pairs i<j are generated.
+
+    Parameters
+    ----------
+    dcs : list of dictionaries
+        the compiled constraints, as returned by compile_constraints
+
+    Returns
+    -------
+    list of dictionaries with the keys single, symmetric, keys (the shared equality conditions) and dcs
+    """
+    groups = {}
+    for dc in dcs:
+        signature = ('single',) if dc['single'] else tuple(sorted(set(dc['keys'])))
+        if signature not in groups:
+            groups[signature] = {'single': dc['single'], 'symmetric': not dc['single'], 'keys': [] if dc['single'] else list(signature), 'dcs': []}
+        groups[signature]['dcs'].append(dc)
+        groups[signature]['symmetric'] &= dc['symmetric']
+    return list(groups.values())
+
+def mask_bytes(count):
+    """
+    mask_bytes - the number of bytes of the bitmask of the constraints violated by a pair, one bit per constraint.
+    """
+    return max(1, (count + 7) // 8)
+
+def _mark(masks, index, violated):
+    # sets the bit of the constraint of the given index in the masks of the violating pairs
+    masks[violated, index // 8] |= numpy.uint8(1 << (index % 8))
+
+def _pair_violations(dcs, columns, I, J, orientations=2, masks=None):
+    # the mask of the candidate pairs (i != j) that violate one of the constraints. A symmetric constraint is only
+    # checked on the pairs i<j, or not at all when the pairs (j,i) are checked separately (orientations=1).
+    # With masks, the bit of every violated constraint is set in the mask of the pair as well.
+    mask = numpy.zeros(len(I), dtype=bool)
+    ordered = None
+    for dc in dcs:
+        if not dc['symmetric'] or orientations == 1:
+            violated = evaluate_predicates(dc['predicates'], columns, I, J)
+        elif orientations == 2:
+            if ordered is None:
+                ordered = numpy.flatnonzero(I < J)
+            violated = numpy.zeros(len(I), dtype=bool)
+            violated[ordered] = evaluate_predicates(dc['predicates'], columns, I[ordered], J[ordered])
+        else:
+            continue
+        mask |= violated
+        if masks is not None:
+            _mark(masks, dc['index'], violated)
+    return mask
+
+def _group_violations(group, columns, positions, leftCodes, rightCodes, maxPairs, sink, maskBytes=0):
+    # checks all the constraints of a group over a set of tuples and sends the canonical violating pairs to the
+    # sink, with their bitmasks when maskBytes is given
+    if group['single']:
+        mask = numpy.zeros(len(positions), dtype=bool)
+        masks = numpy.zeros((len(positions), maskBytes), dtype=numpy.uint8) if maskBytes else None
+        for dc in group['dcs']:
+            violated = evaluate_predicates(dc['predicates'], columns, positions, positions)
+            mask |= violated
+            if maskBytes:
+                _mark(masks, dc['index'], violated)
+        sink(positions[mask] + 1, positions[mask] + 1, *((masks[mask],) if maskBytes else ()))
+        return
+    upper = group['symmetric'] and numpy.array_equal(leftCodes, rightCodes)
+    for I, J in block_pairs(positions, leftCodes, positions, rightCodes, maxPairs, upper=upper):
+        candidates = I < J if group['symmetric'] else I != J
+        I, J = I[candidates], J[candidates]
+        masks = numpy.zeros((len(I), maskBytes), dtype=numpy.uint8) if maskBytes else None
+        mask = _pair_violations(group['dcs'], columns, I, J, masks=masks)
+        I, J = I[mask], J[mask]
+        sink(numpy.minimum(I, J) + 1, numpy.maximum(I, J) + 1, *((masks[mask],) if maskBytes else ()))
+
+def detect_violations(plan, sink, maxPairs, spillDir=None, attribution=False):
+    """
+    detect_violations - finds the pairs of tuples that jointly violate the constraints, one group of
+    constraints (see group_constraints) at a time.
+    The tuples are hash-partitioned on the values of the equality conditions of the group (t1.A=t2.B), so
+    that two tuples that jointly violate a constraint of the group always fall in the same partition.
+    When the candidate pairs of a group exceed maxPairs and spillDir is given, the partitions are spilled to
+    disk and then processed one at a time. Groups without equality conditions are checked in tiles of
+    tuples of at most maxPairs candidate pairs.
+    With attribution, every pair is sent with a bitmask of the constraints it violates (bit k of byte k//8 for
+    the constraint of index k), set while the constraints are evaluated, so no constraint is checked twice.
+
+    Parameters
+    ----------
+    plan : dictionary
+        the compiled constraints, as returned by compile_constraints
+    sink : function
+        called with two arrays id1, id2 (id1 <= id2) for every chunk of violating pairs, a pair may be sent more than once.
+        With attribution, it is called with a third (n,mask_bytes) array of uint8, the bitmasks of the pairs
+    maxPairs : int
+        the maximal number of candidate pairs held in memory at once
+    spillDir : string
+        the directory for the spilled partitions, or None to keep the partitions in memory
+    attribution : bool
+        true to send the bitmasks of the pairs to the sink
+    """
+    columns = plan['columns']
+    positions = numpy.flatnonzero(plan['valid'])
+    maskBytes = mask_bytes(len(plan['dcs'])) if attribution else 0
+
+    for group in plan['groups']:
+        if group['single']:
+            _group_violations(group, columns, positions, None, None, maxPairs, sink, maskBytes)
+            continue
+
+        leftCodes, rightCodes = key_codes(columns, group['keys'], positions)
+        candidates = candidate_pairs(leftCodes, rightCodes)
+        partitions = 1 if not group['keys'] or spillDir is None else max(1, int(math.ceil(candidates / float(maxPairs))))
+        if partitions == 1:
+            _group_violations(group, columns, positions, leftCodes, rightCodes, maxPairs, sink, maskBytes)
+            continue
+
+        # spill the partitions of the group to disk, then process them one at a time
+        groupDir = tempfile.mkdtemp(prefix='partitions_', dir=spillDir)
+        fields = list(dict.fromkeys([p[1] for dc in group['dcs'] for p in dc['predicates']] + [p[4] for dc in group['dcs'] for p in dc['predicates'] if p[3] is not None]))
+        for p in range(partitions):
+            leftRows = leftCodes % partitions == p
+            rightRows = rightCodes % partitions == p
+            rows = leftRows | rightRows
+            numpy.savez(os.path.join(groupDir, 'part_' + str(p) + '.npz'), positions=positions[rows], leftCodes=numpy.where(leftRows, leftCodes, -1)[rows], rightCodes=numpy.where(rightRows, rightCodes, -2)[rows], **dict(('col_' + str(k), columns[f][positions[rows]]) for k, f in enumerate(fields)))
+        for p in range(partitions):
+            part = numpy.load(os.path.join(groupDir, 'part_' + str(p) + '.npz'))
+            partColumns = dict((f, part['col_' + str(k)]) for k, f in enumerate(fields))
+            partPositions = part['positions']
+            local = numpy.arange(len(partPositions))
+            _group_violations(group, partColumns, local, part['leftCodes'], part['rightCodes'], maxPairs, lambda id1, id2, *masks: sink(partPositions[id1-1] + 1, partPositions[id2-1] + 1, *masks), maskBytes)
+        shutil.rmtree(groupDir, ignore_errors=True)
+
+def key_hashes(df, keys, rows):
+    """
+    key_hashes - hash codes of the values of the equality conditions t1.fieldA=t2.fieldB of a constraint, like
+    key_codes, but computed from the values themselves, so that the codes of the tuples do not depend on the
+    other tuples and stay valid while tuples are added to the database. Numeric values are hashed as floats.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    keys : list of pairs (fieldA, fieldB)
+    rows : array of int
+        the positions of the tuples to encode
+
+    Returns
+    -------
+    two arrays of int, the codes of the tuples as t1 and as t2
+    """
+    def column_hashes(field):
+        values = df[field].to_numpy()[rows]
+        return pd.util.hash_array(values.astype(numpy.float64) if values.dtype.kind in 'biuf' else values.astype(object))
+    left = numpy.zeros(len(rows), dtype=numpy.uint64)
+    right = numpy.zeros(len(rows), dtype=numpy.uint64)
+    for fieldA, fieldB in keys:
+        leftHashes = column_hashes(fieldA)
+        left = pd.util.hash_array(left ^ leftHashes)
+        right = pd.util.hash_array(right ^ (leftHashes if fieldA == fieldB else column_hashes(fieldB)))
+    return left.view(numpy.int64), right.view(numpy.int64)
+
+def _index_pairs(rows, codes, indexRows, indexCodes, maxPairs):
+    # the pairs (i,j) of the given tuples i and the tuples j of a sort index with the same code, in batches of
+    # about maxPairs pairs (a tuple with more matches than maxPairs is a batch of its own)
+    low = numpy.searchsorted(indexCodes, codes, side='left')
+    counts = numpy.searchsorted(indexCodes, codes, side='right') - low
+    ends = numpy.cumsum(counts)
+    start = 0
+    while start < len(rows):
+        end = max(start + 1, int(numpy.searchsorted(ends, (ends[start-1] if start else 0) + maxPairs, side='right')))
+        batchCounts = counts[start:end]
+        offsets = numpy.arange(batchCounts.sum()) - numpy.repeat(numpy.cumsum(batchCounts) - batchCounts, batchCounts)
+        yield numpy.repeat(rows[start:end], batchCounts), indexRows[numpy.repeat(low[start:end], batchCounts) + offsets]
+        start = end
+
+class AppendIndex(object):
+    """
+    AppendIndex - finds the violations of a database that grows by appending tuples, without checking the
+    pairs of old tuples again. For every group of constraints with equality conditions (see group_constraints)
+    it keeps a sort index of the tuples seen so far: their hash codes (see key_hashes) as t1 and as t2, sorted,
+    with their positions. The new tuples are matched against the index by binary search, so the cost of an
+    append grows with the new tuples and the pairs they take part in, not with the size of the database.
+    The index of a group outlives the encoding of the columns, which changes as new string values arrive.
+
+    Every append checks the pairs new x old, in both orders, through the index and the pairs new x new like
+    detect_violations. Groups without equality conditions check new x old in tiles, and the constraints that
+    refer to a single tuple only check the new tuples.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.groups = {}
+
+    def append_violations(self, df, plan, sink, maxPairs):
+        """
+        append_violations - finds the violating pairs that involve the tuples appended since the last call.
+
+        Parameters
+        ----------
+        df : dataframe
+            the whole database, the tuples after the ones of the last call are the new ones
+        plan : dictionary
+            the compiled constraints of the whole database, as returned by compile_constraints
+        sink : function
+            called with two arrays id1, id2 (id1 <= id2) for every chunk of new violating pairs, a pair may be
+            sent more than once
+        maxPairs : int
+            the maximal number of candidate pairs held in memory at once
+        """
+        columns = plan['columns']
+        positions = numpy.flatnonzero(plan['valid'])
+        old = positions[positions < self.rows]
+        new = positions[positions >= self.rows]
+        tileRows = max(1, int(math.sqrt(maxPairs)))
+        for group in plan['groups']:
+            if group['single']:
+                _group_violations(group, columns, new, None, None, maxPairs, sink)
+                continue
+            if not group['keys']:
+                for startA in range(0, len(new), tileRows):
+                    for startB in range(0, len(old), tileRows):
+                        _tile_violations(group, columns, new[startA:startA+tileRows], old[startB:startB+tileRows], False, sink)
+                leftCodes, rightCodes = key_codes(columns, group['keys'], new)
+                _group_violations(group, columns, new, leftCodes, rightCodes, maxPairs, sink)
+                continue
+
+            signature = tuple(group['keys'])
+            index = self.groups.get(signature)
+            if index is None:
+                empty = numpy.zeros(0, dtype=numpy.int64)
+                index = self.groups[signature] = {'leftCodes': empty, 'leftRows': empty, 'rightCodes': empty, 'rightRows': empty}
+            leftHashes, rightHashes = key_hashes(df, group['keys'], new)
+            keyPredicates = [('t1', fieldA, '=', 't2', fieldB) for fieldA, fieldB in group['keys']]
+            # the new tuples as t1 and the old ones as t2, then the other way round for the asymmetric constraints
+            orders = [(leftHashes, 'rightRows', 'rightCodes', False, 1)]
+            if not group['symmetric']:
+                orders.append((rightHashes, 'leftRows', 'leftCodes', True, 0))
+            for codes, indexRows, indexCodes, swap, orientations in orders:
+                for I, J in _index_pairs(new, codes, index[indexRows], index[indexCodes], maxPairs):
+                    if swap:
+                        I, J = J, I
+                    # the codes are hashes, the equality conditions are checked on the values
+                    mask = _pair_violations(group['dcs'], columns, I, J, orientations) & evaluate_predicates(keyPredicates, columns, I, J)
+                    sink(numpy.minimum(I[mask], J[mask]) + 1, numpy.maximum(I[mask], J[mask]) + 1)
+            leftCodes, rightCodes = key_codes(columns, group['keys'], new)
+            _group_violations(group, columns, new, leftCodes, rightCodes, maxPairs, sink)
+
+            for side, hashes in (('left', leftHashes), ('right', rightHashes)):
+                order = numpy.argsort(hashes, kind='stable')
+                at = numpy.searchsorted(index[side + 'Codes'], hashes[order], side='right')
+                index[side + 'Codes'] = numpy.insert(index[side + 'Codes'], at, hashes[order])
+                index[side + 'Rows'] = numpy.insert(index[side + 'Rows'], at, new[order])
+        self.rows = len(df.index)
+
+def _single_predicate_violated(dc, columns, positions, codes):
+    # For a constraint whose equality conditions are of the form t1.A=t2.A and that has a single other
+    # condition t1.X op t2.X, a block of tuples violates the constraint if and only if it contains two
+    # distinct values of X (op is one of !=,<,>), or two tuples (op is <= or >=). Returns None for
+    # other constraints.
+    if len(dc['predicates']) != 1:
+        return None
+    rowA, fieldA, op, rowB, fieldB = dc['predicates'][0]
+    if rowB is None or rowA == rowB or fieldA != fieldB or op == '=':
+        return None
+    if op in ('<=', '>='):
+        return len(numpy.unique(codes)) < len(codes)
+    valueCodes, uniques = pd.factorize(columns[fieldA][positions])
+    return len(pd.unique(codes * len(uniques) + valueCodes)) > len(pd.unique(codes))
+
+def is_consistent(df, constraintSets, maxPairs=1<<16):
+    """
+    is_consistent - checks whether the database satisfies the constraints, and stops at the first violation.
+    Unlike constraints_check, no violating pair is materialized. The cheapest constraints are checked first:
+    the constraints that refer to a single tuple, then the groups of constraints (see group_constraints)
+    with the fewest candidate pairs, and within a group the smallest blocks first. Constraints with a single
+    condition besides their equality conditions on the same attributes are decided from the distinct values
+    of each block, in a single pass over the tuples.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    maxPairs : int
+        the number of candidate pairs checked at once, small values stop earlier on inconsistent databases
+
+    Returns
+    -------
+    bool
+        true if the database is consistent, and false otherwise
+    """
+    plan = compile_constraints(constraintSets, df)
+    columns = plan['columns']
+    positions = numpy.flatnonzero(plan['valid'])
+
+    pairGroups = []
+    for group in plan['groups']:
+        if group['single']:
+            for dc in group['dcs']:
+                if evaluate_predicates(dc['predicates'], columns, positions, positions).any():
+                    return False
+            continue
+        leftCodes, rightCodes = key_codes(columns, group['keys'], positions)
+        candidates = candidate_pairs(leftCodes, rightCodes)
+        pairGroups.append((candidates, group, leftCodes, rightCodes))
+
+    for candidates, group, leftCodes, rightCodes in sorted(pairGroups, key=lambda g: g[0]):
+        dcs = list(group['dcs'])
+        if numpy.array_equal(leftCodes, rightCodes):
+            for dc in group['dcs']:
+                violated = _single_predicate_violated(dc, columns, positions, leftCodes)
+                if violated:
+                    return False
+                if violated is not None:
+                    dcs.remove(dc)
+        if not dcs:
+            continue
+        symmetric = all(dc['symmetric'] for dc in dcs)
+        upper = symmetric and numpy.array_equal(leftCodes, rightCodes)
+        for I, J in block_pairs(positions, leftCodes, positions, rightCodes, maxPairs, smallestFirst=True, upper=upper):
+            candidates = I < J if symmetric else I != J
+            I, J = I[candidates], J[candidates]
+            for dc in dcs:
+                if evaluate_predicates(dc['predicates'], columns, I, J).any():
+                    return False
+    return True
+
+class PairCount(object):
+    """
+    PairCount - stands for the violating pairs when only their number is known (see count_constraints_check).
+    len() of a PairCount is the number of pairs, so first_measurer_I_D and second_measurer_I_MI accept it
+    in place of the pairs.
+    """
+
+    def __init__(self, count):
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+class Attribution(object):
+    """
+    Attribution - the constraints violated by every violating pair, found in the same pass as the pairs (see
+    detect_violations). Every pair has a bitmask of one bit per constraint, so the masks take
+    mask_bytes(len(constraints)) bytes per pair next to the (n,2) array of the pairs, and the measures of every
+    constraint are read from the masks instead of checking each constraint on its own.
+
+    Parameters
+    ----------
+    constraints : list of strings
+        the constraints, in the order of their bits
+    pairs : (n,2) array of int
+        the distinct violating pairs, id1 <= id2
+    masks : (n,mask_bytes) array of uint8
+        the bitmask of every pair, bit k of byte k//8 is set if the pair violates the constraint k
+    """
+
+    def __init__(self, constraints, pairs, masks):
+        self.constraints = list(constraints)
+        self.pairs = numpy.asarray(pairs, dtype=numpy.int64).reshape(-1, 2)
+        self.masks = numpy.asarray(masks, dtype=numpy.uint8).reshape(len(self.pairs), mask_bytes(len(self.constraints)))
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def _index(self, constraint):
+        return constraint if isinstance(constraint, (int, numpy.integer)) else self.constraints.index(constraint)
+
+    def violates(self, constraint):
+        """
+        violates - a boolean array, true for the pairs that violate the constraint (a string or its index).
+        """
+        k = self._index(constraint)
+        return (self.masks[:, k // 8] >> (k % 8)) & 1 == 1
+
+    def violates_any(self, constraints):
+        """
+        violates_any - a boolean array, true for the pairs that violate at least one of the constraints (strings
+        or indexes), the violating pairs of the database when only these constraints are checked.
+        """
+        subsetMask = numpy.zeros(self.masks.shape[1], dtype=numpy.uint8)
+        for constraint in constraints:
+            k = self._index(constraint)
+            subsetMask[k // 8] |= numpy.uint8(1 << (k % 8))
+        return (self.masks & subsetMask).any(axis=1)
+
+    def constraint_pairs(self, constraint):
+        """
+        constraint_pairs - the (k,2) array of the pairs that violate the constraint (a string or its index).
+        """
+        return self.pairs[self.violates(constraint)]
+
+    def bits(self, chunkSize=1<<16):
+        """
+        bits - iterates over the masks as (k,len(constraints)) arrays of 0/1 of at most chunkSize pairs.
+        """
+        for start in range(0, len(self.pairs), chunkSize):
+            yield numpy.unpackbits(self.masks[start:start+chunkSize], axis=1, count=len(self.constraints), bitorder='little')
+
+    def measures(self):
+        """
+        measures - I_MI and I_P of every constraint on its own: the number of pairs that violate the constraint
+        and the number of tuples in these pairs. A pair may violate many constraints, so the sums over the
+        constraints are at least the measures of the whole database.
+
+        Returns
+        -------
+        dataframe indexed by the constraints, with the columns I_MI and I_P
+        """
+        counts = numpy.zeros(len(self.constraints), dtype=numpy.int64)
+        for bits in self.bits():
+            counts += bits.sum(axis=0, dtype=numpy.int64)
+        tuples = [len(numpy.unique(self.constraint_pairs(k))) for k in range(len(self.constraints))]
+        return pd.DataFrame({'I_MI': counts, 'I_P': tuples}, index=pd.Index(self.constraints, name='constraint'))
+
+    def overlap(self):
+        """
+        overlap - the number of pairs that violate both constraints of every two constraints. The diagonal is
+        the I_MI of every constraint.
+
+        Returns
+        -------
+        dataframe with a row and a column per constraint
+        """
+        matrix = numpy.zeros((len(self.constraints), len(self.constraints)), dtype=numpy.int64)
+        for bits in self.bits():
+            bits = bits.astype(numpy.int64)
+            matrix += bits.T @ bits
+        return pd.DataFrame(matrix, index=self.constraints, columns=self.constraints)
+
+def count_violating_pairs(df, constraintSets):
+    """
+    count_violating_pairs - counts the pairs of tuples that jointly violate the constraints without enumerating them.
+    The counting applies when all the constraints that refer to two tuples share the same equality conditions
+    of the form t1.A=t2.A and each has a single other condition on one attribute (t1.X op t2.X), as in
+    functional dependencies. Within a block of n tuples that agree on the equality conditions:
+    - if some constraint has op <= or >= (or no other condition), all the n(n-1)/2 pairs are violating;
+    - otherwise a pair is violating if and only if it differs on one of the attributes X (for !=, < and > alike,
+      since one of the two orders of the pair satisfies < or >), so the count is n(n-1)/2 minus the pairs within
+      the sub-blocks that agree on all the attributes X.
+    Constraints that refer to a single tuple add one pair (i,i) per violating tuple.
+    For other combinations, the pairs of different constraints may overlap in ways that the block sizes do not
+    determine, and the function returns None.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+
+    Returns
+    -------
+    int or None
+        the number of violating pairs, or None if it cannot be counted
+    """
+    plan = compile_constraints(constraintSets, df)
+    columns = plan['columns']
+    positions = numpy.flatnonzero(plan['valid'])
+
+    count = 0
+    pairGroups = []
+    for group in plan['groups']:
+        if group['single']:
+            mask = numpy.zeros(len(positions), dtype=bool)
+            for dc in group['dcs']:
+                mask |= evaluate_predicates(dc['predicates'], columns, positions, positions)
+            count += int(mask.sum())
+        else:
+            pairGroups.append(group)
+    if not pairGroups:
+        return count
+    if len(pairGroups) > 1:
+        return None
+
+    group = pairGroups[0]
+    if any(fieldA != fieldB for fieldA, fieldB in group['keys']):
+        return None
+    allPairs = False
+    fields = []
+    for dc in group['dcs']:
+        if not dc['predicates']:
+            allPairs = True
+            continue
+        if len(dc['predicates']) != 1:
+            return None
+        rowA, fieldA, op, rowB, fieldB = dc['predicates'][0]
+        if rowB is None or rowA == rowB or fieldA != fieldB or op == '=':
+            return None
+        if op in ('<=', '>='):
+            allPairs = True
+        else:
+            fields.append(fieldA)
+
+    codes, _ = key_codes(columns, group['keys'], positions)
+    blockSizes = numpy.bincount(codes).astype(numpy.int64)
+    count += int((blockSizes * (blockSizes - 1) // 2).sum())
+    if not allPairs:
+        subCodes = codes
+        for field in dict.fromkeys(fields):
+            valueCodes, uniques = pd.factorize(columns[field][positions])
+            subCodes = pd.factorize(subCodes * len(uniques) + valueCodes)[0]
+        subSizes = numpy.bincount(subCodes).astype(numpy.int64)
+        count -= int((subSizes * (subSizes - 1) // 2).sum())
+    return count
+
+def count_constraints_check(df, constraintSets, memoryBudget=1<<30):
+    """
+    count_constraints_check - finds the number of violating pairs, for the measures that do not need the pairs.
+    The pairs are counted by count_violating_pairs, and enumerated by blocked_constraints_check only when
+    they cannot be counted.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    memoryBudget : int
+        the number of bytes that the candidate pairs may use at once, in case the pairs are enumerated
+
+    Returns
+    -------
+    list of two objects and two double variables, like constraints_check:
+        a PairCount of the violating pairs, None in place of the violating tuples, and the running times.
+    """
+    start = time.time()
+    count = count_violating_pairs(df, constraintSets)
+    if count is None:
+        count = len(blocked_constraints_check(df, constraintSets, memoryBudget)[0])
+    end1 = time.time()
+    return PairCount(count), None, end1-start, 0
+
+def unique_pairs(chunks):
+    """
+    unique_pairs - removes the duplicate pairs from chunks of violating pairs in a single step.
+
+    Parameters
+    ----------
+    chunks : list of pairs of arrays (id1, id2)
+
+    Returns
+    -------
+    an (n,2) array of int of the distinct pairs, sorted
+    """
+    if not chunks:
+        return numpy.empty((0, 2), dtype=numpy.int64)
+    id1 = numpy.concatenate([c[0] for c in chunks]).astype(numpy.int64)
+    id2 = numpy.concatenate([c[1] for c in chunks]).astype(numpy.int64)
+    base = int(id2.max()) + 1 if len(id2) else 1
+    codes = numpy.unique(id1 * base + id2)
+    return numpy.stack([codes // base, codes % base], axis=1)
+
+def unique_attributed_pairs(chunks, maskBytes):
+    """
+    unique_attributed_pairs - removes the duplicate pairs from chunks of violating pairs with their bitmasks,
+    the masks of a duplicate pair are merged.
+
+    Parameters
+    ----------
+    chunks : list of triples of arrays (id1, id2, masks)
+    maskBytes : int
+        the number of bytes of a mask
+
+    Returns
+    -------
+    an (n,2) array of int of the distinct pairs, sorted, and the (n,maskBytes) array of uint8 of their masks
+    """
+    if not chunks:
+        return numpy.empty((0, 2), dtype=numpy.int64), numpy.empty((0, maskBytes), dtype=numpy.uint8)
+    id1 = numpy.concatenate([c[0] for c in chunks]).astype(numpy.int64)
+    id2 = numpy.concatenate([c[1] for c in chunks]).astype(numpy.int64)
+    masks = numpy.concatenate([c[2] for c in chunks])
+    base = int(id2.max()) + 1 if len(id2) else 1
+    codes = id1 * base + id2
+    order = numpy.argsort(codes, kind='stable')
+    codes = codes[order]
+    starts = numpy.flatnonzero(numpy.r_[True, codes[1:] != codes[:-1]]) if len(codes) else numpy.empty(0, dtype=numpy.int64)
+    masks = numpy.bitwise_or.reduceat(masks[order], starts, axis=0) if len(codes) else masks
+    codes = codes[starts]
+    return numpy.stack([codes // base, codes % base], axis=1), masks
+
+def blocked_constraints_check(df, constraintSets, memoryBudget=1<<30, attribution=False):
+    """
+    blocked_constraints_check - finds the violations of the constraints in memory, without the dynamic queries.
+    The constraints are grouped by their equality conditions, the blocks of each group are built once and
+    all the constraints of the group are checked in one pass over every block (see detect_violations).
+    The pairs of all the groups are deduplicated in a single step, instead of SQL UNION and DISTINCT.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    memoryBudget : int
+        the number of bytes that the candidate pairs may use at once
+    attribution : bool
+        true to find the constraints violated by every pair as well (see Attribution)
+
+    Returns
+    -------
+    list of two objects and two double variables, like constraints_check:
+        violatingPairs is a dataframe of the pairs (id1,id2) of ids of tuples that jointly violate a constraint.
+        violatingTuples is an array of the ids of the tuples that participate in a violation.
+        end1-start, end2-start2 are the running times of the two steps.
+    with attribution, the Attribution of the pairs is appended to the list
+    """
+    start = time.time()
+    plan = compile_constraints(constraintSets, df)
+    chunks = []
+    detect_violations(plan, lambda *chunk: chunks.append(chunk), max(1, memoryBudget // PAIR_BYTES), attribution=attribution)
+    if attribution:
+        pairs, masks = unique_attributed_pairs(chunks, mask_bytes(len(plan['dcs'])))
+    else:
+        pairs = unique_pairs(chunks)
+    violatingPairs = pd.DataFrame(pairs, columns=['id1', 'id2'])
+    end1 = time.time()
+
+    start2 = time.time()
+    violatingTuples = numpy.unique(violatingPairs.values)
+    end2 = time.time()
+
+    if attribution:
+        return violatingPairs, violatingTuples, end1-start, end2-start2, Attribution([dc['constraint'] for dc in plan['dcs']], pairs, masks)
+    return violatingPairs, violatingTuples, end1-start, end2-start2
+
+def partitioned_constraints_check(df, constraintSets, memoryBudget=1<<30, workDir=None, attribution=False):
+    """
+    partitioned_constraints_check - finds the violations of the constraints for databases whose violating
+    pairs do not fit in memory.
+    The violations are found by detect_violations, which spills to disk the partitions of every group of
+    constraints whose candidate pairs exceed memoryBudget, and the violating pairs are streamed to an
+    on-disk PairStore.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    memoryBudget : int
+        the number of bytes that the candidate pairs of a single partition may use
+    workDir : string
+        the directory for the spilled partitions and for the pair store (a temporary directory by default)
+    attribution : bool
+        true to store the bitmasks of the violated constraints next to the pairs (see Attribution)
+
+    Returns
+    -------
+    list of two objects and two double variables, like constraints_check:
+        store is a PairStore of the pairs (id1,id2) of ids of tuples that jointly violate a constraint.
+        tuples is an array of the ids of the tuples that participate in a violation.
+        end1-start, end2-start2 are the running times of the two steps.
+    with attribution, the Attribution of the pairs is appended to the list
+    """
+    start = time.time()
+    if workDir is None:
+        workDir = tempfile.mkdtemp(prefix='violations_')
+    plan = compile_constraints(constraintSets, df)
+    store = pairstore.PairStore(os.path.join(workDir, 'pairs'), maskBytes=mask_bytes(len(plan['dcs'])) if attribution else 0)
+    detect_violations(plan, store.append, max(1, memoryBudget // PAIR_BYTES), workDir, attribution)
+
+    store.finalize()
+    end1 = time.time()
+
+    start2 = time.time()
+    violatingTuples = store.tuples()
+    end2 = time.time()
+
+    if attribution:
+        return store, violatingTuples, end1-start, end2-start2, Attribution([dc['constraint'] for dc in plan['dcs']], store.values, store.masks)
+    return store, violatingTuples, end1-start, end2-start2
+
+# the pool of parallel_constraints_check, kept between calls since a simulation detects the violations many times
+_POOL = None
+_POOL_WORKERS = 0
+
+def _detection_pool(workers):
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != workers:
+        if _POOL is not None:
+            _POOL.terminate()
+        # like sweep.py, the workers are forked so that the scripts of the experiments are not imported again
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+        _POOL = context.Pool(workers)
+        _POOL_WORKERS = workers
+    return _POOL
+
+def _share_arrays(arrays):
+    # copies the arrays into one shared memory block, returns the block and the layout name -> (offset, dtype, length)
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = (offset, array.dtype.str, len(array))
+        offset += (array.nbytes + 7) // 8 * 8
+    block = shared_memory.SharedMemory(create=True, size=max(1, offset))
+    for name, array in arrays.items():
+        start, dtype, length = layout[name]
+        numpy.ndarray(length, dtype=dtype, buffer=block.buf, offset=start)[:] = array
+    return block, layout
+
+def _tile_violations(group, columns, rowsA, rowsB, diagonal, sink, maskBytes=0):
+    # checks all the pairs of a tile of rows x rows, in both orientations, for a group without equality conditions.
+    # The symmetric constraints are checked in one orientation only.
+    I = numpy.repeat(rowsA, len(rowsB))
+    J = numpy.tile(rowsB, len(rowsA))
+    if diagonal:
+        candidates = I < J if group['symmetric'] else I != J
+        orientations = ((I[candidates], J[candidates], 2),)
+    else:
+        orientations = ((I, J, 1),) if group['symmetric'] else ((I, J, 1), (J, I, 0))
+    for A, B, symmetricOrientations in orientations:
+        masks = numpy.zeros((len(A), maskBytes), dtype=numpy.uint8) if maskBytes else None
+        mask = _pair_violations(group['dcs'], columns, A, B, symmetricOrientations, masks)
+        sink(numpy.minimum(A[mask], B[mask]) + 1, numpy.maximum(A[mask], B[mask]) + 1, *((masks[mask],) if maskBytes else ()))
+
+def _run_task(arrays, group, kind, args, maxPairs, maskBytes):
+    columns = dict((name[4:], array) for name, array in arrays.items() if name.startswith('col:'))
+    positions = arrays['positions']
+    chunks = []
+    sink = lambda *chunk: chunks.append(chunk)
+    if kind == 'rows':
+        # a block of rows of the constraints that refer to a single tuple
+        start, end = args
+        _group_violations(group, columns, positions[start:end], None, None, maxPairs, sink, maskBytes)
+    elif kind == 'partition':
+        # a hash partition of the values of the equality conditions of the group
+        g, p, partitions = args
+        leftCodes, rightCodes = arrays['left:' + str(g)], arrays['right:' + str(g)]
+        leftRows = leftCodes % partitions == p
+        rightRows = rightCodes % partitions == p
+        rows = leftRows | rightRows
+        _group_violations(group, columns, positions[rows], numpy.where(leftRows, leftCodes, -1)[rows], numpy.where(rightRows, rightCodes, -2)[rows], maxPairs, sink, maskBytes)
+    else:
+        # a tile of two blocks of rows i <= j of a group without equality conditions
+        (startA, endA), (startB, endB) = args
+        _tile_violations(group, columns, positions[startA:endA], positions[startB:endB], startA == startB, sink, maskBytes)
+    if maskBytes:
+        return unique_attributed_pairs(chunks, maskBytes)
+    return unique_pairs(chunks), None
+
+def _masks_file_name(chunkFileName):
+    return chunkFileName[:-len('.npy')] + '_dcs.npy'
+
+def _detection_task(task):
+    # runs in a worker of the pool, the columns are read from the shared memory block without copies
+    blockName, layout, group, kind, args, maxPairs, maskBytes, chunkFileName = task
+    block = shared_memory.SharedMemory(name=blockName)
+    arrays = dict((name, numpy.ndarray(length, dtype=dtype, buffer=block.buf, offset=start)) for name, (start, dtype, length) in layout.items())
+    try:
+        pairs, masks = _run_task(arrays, group, kind, args, maxPairs, maskBytes)
+    finally:
+        # the views of the block must be released before it is closed
+        arrays = None
+    block.close()
+    if len(pairs) == 0:
+        return None
+    numpy.save(chunkFileName, pairs)
+    if maskBytes:
+        numpy.save(_masks_file_name(chunkFileName), masks)
+    return chunkFileName
+
+def parallel_constraints_check(df, constraintSets, memoryBudget=1<<30, workDir=None, workers=None, attribution=False):
+    """
+    parallel_constraints_check - finds the violations of the constraints on a pool of worker processes.
+    The encoded columns (see compile_constraints) and the codes of the equality conditions are copied once into
+    a shared memory block that the workers read without copies, instead of sending them the database.
+    The work is split into tasks:
+    - groups of constraints without equality conditions are split into tiles of two blocks of rows i <= j, and
+      every tile checks the pairs of its blocks in both orientations, so every pair is checked in one tile;
+    - groups with equality conditions are hash-partitioned on the values of the conditions, like in
+      detect_violations, one task per partition;
+    - the constraints that refer to a single tuple are checked in blocks of rows.
+    Every task writes its violating pairs to a chunk file, and the chunks are merged into the same (id1,id2)
+    pairs as blocked_constraints_check. With attribution, the bitmasks of the pairs are written to a second
+    file per task and merged with the pairs.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    memoryBudget : int
+        the number of bytes that the candidate pairs of all the workers may use at once
+    workDir : string
+        the directory of the chunk files (a temporary directory by default)
+    workers : int
+        the number of processes, DETECTION_WORKERS by default
+    attribution : bool
+        true to find the constraints violated by every pair as well (see Attribution)
+
+    Returns
+    -------
+    list of two objects and two double variables, like constraints_check:
+        violatingPairs is a dataframe of the pairs (id1,id2) of ids of tuples that jointly violate a constraint.
+        violatingTuples is an array of the ids of the tuples that participate in a violation.
+        end1-start, end2-start2 are the running times of the two steps.
+    with attribution, the Attribution of the pairs is appended to the list
+    """
+    start = time.time()
+    workers = max(1, workers if workers is not None else DETECTION_WORKERS)
+    maxPairs = max(1, memoryBudget // PAIR_BYTES // workers)
+    plan = compile_constraints(constraintSets, df)
+    maskBytes = mask_bytes(len(plan['dcs'])) if attribution else 0
+    positions = numpy.flatnonzero(plan['valid']).astype(numpy.int64)
+    n = len(positions)
+
+    arrays = {'positions': positions}
+    for name, column in plan['columns'].items():
+        arrays['col:' + name] = column
+    tasks = []
+    for g, group in enumerate(plan['groups']):
+        if group['single']:
+            rows = max(1, int(math.ceil(n / float(workers))))
+            tasks += [(group, 'rows', (r, min(r + rows, n))) for r in range(0, n, rows)]
+        elif group['keys']:
+            leftCodes, rightCodes = key_codes(plan['columns'], group['keys'], positions)
+            arrays['left:' + str(g)], arrays['right:' + str(g)] = leftCodes, rightCodes
+            partitions = max(1, min(4 * workers, int(math.ceil(candidate_pairs(leftCodes, rightCodes) / float(maxPairs)))))
+            tasks += [(group, 'partition', (g, p, partitions)) for p in range(partitions)]
+        else:
+            tileRows = max(1, int(math.sqrt(maxPairs)))
+            blocks = [(r, min(r + tileRows, n)) for r in range(0, n, tileRows)]
+            tasks += [(group, 'tile', (blocks[a], blocks[b])) for a in range(len(blocks)) for b in range(a, len(blocks))]
+
+    chunkDir = tempfile.mkdtemp(prefix='tiles_', dir=workDir)
+    block, layout = _share_arrays(arrays)
+    try:
+        pool = _detection_pool(workers)
+        jobs = [(block.name, layout, group, kind, args, maxPairs, maskBytes, os.path.join(chunkDir, 'chunk_' + str(t) + '.npy')) for t, (group, kind, args) in enumerate(tasks)]
+        chunkFileNames = [f for f in pool.imap_unordered(_detection_task, jobs, chunksize=max(1, len(jobs) // (8 * workers))) if f is not None]
+        chunks = []
+        for chunkFileName in chunkFileNames:
+            pairs = numpy.load(chunkFileName)
+            chunks.append((pairs[:,0], pairs[:,1]) + ((numpy.load(_masks_file_name(chunkFileName)),) if maskBytes else ()))
+    finally:
+        block.close()
+        block.unlink()
+        shutil.rmtree(chunkDir, ignore_errors=True)
+    if attribution:
+        pairs, masks = unique_attributed_pairs(chunks, maskBytes)
+    else:
+        pairs = unique_pairs(chunks)
+    violatingPairs = pd.DataFrame(pairs, columns=['id1', 'id2'])
+    end1 = time.time()
+
+    start2 = time.time()
+    violatingTuples = numpy.unique(violatingPairs.values)
+    end2 = time.time()
+
+    if attribution:
+        return violatingPairs, violatingTuples, end1-start, end2-start2, Attribution([dc['constraint'] for dc in plan['dcs']], pairs, masks)
+    return violatingPairs, violatingTuples, end1-start, end2-start2
@@ -0,0 +1,156 @@
+import pandas as pd
+import numpy as numpy
+import measurments as meas
+import treedecomp
+
+class DynamicCover(object):
+    """
+    DynamicCover - maintains I_R, the size of a minimum vertex cover of the conflict graph, while violating pairs
+    are added and removed. A change of a single cell usually adds or removes a few pairs inside one connected
+    component, so only the components that contain an endpoint of a changed pair are solved again, and the cost
+    of an update grows with the size of these components rather than with the whole graph.
+
+    Every component keeps its cover as the starting point of the next update. A changed component is solved as
+    follows:
+
+    1. the covers of its tuples before the update, completed with an endpoint of every uncovered pair and
+       cleared of the tuples whose neighbours are all in the cover, give an upper bound;
+    2. the tuples that violate a constraint on their own and a maximal matching of the other tuples give a
+       lower bound (every pair of the matching needs its own tuple in the cover);
+    3. when the bounds meet the cover is optimal, otherwise the component is solved by dynamic programming over
+       a tree decomposition (see treedecomp.py) when its width is small, and by fourth_measurer_I_R, started
+       from the cover of step 1 and stopped at the bound of step 2, when it is not. The dynamic programming only
+       gives the size of the cover, the component keeps the cover of step 1.
+
+    Parameters
+    ----------
+    maxWidth : int
+        the widest tree decomposition that is solved by dynamic programming
+    """
+
+    def __init__(self, maxWidth=treedecomp.MAX_WIDTH):
+        self.maxWidth = maxWidth
+        self.neighbors = {}
+        self.loops = set()
+        self.cover = set()
+        # the component of every tuple with a violation, and the size of the optimal cover of every component
+        self.componentOf = {}
+        self.componentCover = {}
+        self.nextComponent = 0
+        self.value = 0
+        self.lastSolved = 0
+        self.lastTight = 0
+
+    def update(self, addedEdges, removedEdges):
+        """
+        update - applies a change of the violating pairs and returns the new value of I_R.
+
+        Parameters
+        ----------
+        addedEdges : (n,2) array of int
+            the new violating pairs (i,j), a pair (i,i) is a tuple that violates a constraint on its own
+        removedEdges : (m,2) array of int
+            the pairs that do not violate the constraints any more
+
+        Returns
+        -------
+        int, the minimal number of tuples to remove for the constraints to hold
+        """
+        touched = set()
+        for a, b in numpy.asarray(removedEdges, dtype=numpy.int64).reshape(-1, 2).tolist():
+            if a == b:
+                self.loops.discard(a)
+            else:
+                self.neighbors.get(a, set()).discard(b)
+                self.neighbors.get(b, set()).discard(a)
+            touched.update((a, b))
+        for a, b in numpy.asarray(addedEdges, dtype=numpy.int64).reshape(-1, 2).tolist():
+            if a == b:
+                self.loops.add(a)
+            else:
+                self.neighbors.setdefault(a, set()).add(b)
+                self.neighbors.setdefault(b, set()).add(a)
+            touched.update((a, b))
+
+        # the components of the touched tuples before the update are dropped
+        for component in set(self.componentOf[v] for v in touched if v in self.componentOf):
+            self.value -= self.componentCover.pop(component)
+        self.lastSolved = self.lastTight = 0
+        visited = set()
+        for v in touched:
+            if v in visited:
+                continue
+            if not self.neighbors.get(v) and v not in self.loops:
+                # the tuple has no violations left
+                self.neighbors.pop(v, None)
+                self.componentOf.pop(v, None)
+                self.cover.discard(v)
+                continue
+            vertices = self._component(v)
+            visited.update(vertices)
+            component = self.nextComponent
+            self.nextComponent += 1
+            for u in vertices:
+                self.componentOf[u] = component
+            self.componentCover[component] = self._solve(vertices)
+            self.value += self.componentCover[component]
+            self.lastSolved += 1
+        return self.value
+
+    def _component(self, v):
+        vertices = [v]
+        seen = set(vertices)
+        for u in vertices:
+            for w in self.neighbors.get(u, ()):
+                if w not in seen:
+                    seen.add(w)
+                    vertices.append(w)
+        return vertices
+
+    def _solve(self, vertices):
+        # the warm start: the previous cover, completed and pruned
+        cover = set(u for u in vertices if u in self.cover) | set(u for u in vertices if u in self.loops)
+        for u in vertices:
+            if u not in cover:
+                for w in self.neighbors.get(u, ()):
+                    if w not in cover:
+                        cover.add(w if len(self.neighbors[w]) >= len(self.neighbors[u]) else u)
+                        if u in cover:
+                            break
+        for u in sorted(cover, key=lambda u: len(self.neighbors.get(u, ()))):
+            if u not in self.loops and all(w in cover for w in self.neighbors.get(u, ())):
+                cover.discard(u)
+
+        # the lower bound: the loops and a maximal matching of the other tuples
+        matched = set()
+        lowerBound = 0
+        for u in vertices:
+            if u in self.loops:
+                lowerBound += 1
+            elif u not in matched:
+                for w in self.neighbors.get(u, ()):
+                    if w not in matched and w not in self.loops:
+                        matched.update((u, w))
+                        lowerBound += 1
+                        break
+
+        if len(cover) > lowerBound:
+            local = dict((u, k) for k, u in enumerate(u for u in vertices if u not in self.loops))
+            neighbors = [[local[w] for w in self.neighbors.get(u, ()) if w in local] for u in local]
+            decomposition = treedecomp.tree_decomposition(neighbors, self.maxWidth)
+            if decomposition is not None:
+                size = len(self.loops.intersection(vertices)) + treedecomp.min_vertex_cover(neighbors, decomposition)
+                self._replace(vertices, cover)
+                return size
+            edges = [(u, w) for u in vertices for w in self.neighbors.get(u, ()) if u < w]
+            edges += [(u, u) for u in vertices if u in self.loops]
+            pairsDf = pd.DataFrame(edges, columns=['id1', 'id2'])
+            cover = meas.fourth_measurer_I_R(pairsDf, start=cover, lowerBound=lowerBound, withCover=True)[2]
+        else:
+            self.lastTight += 1
+        self._replace(vertices, cover)
+        return len(cover)
+
+    def _replace(self, vertices, cover):
+        self.cover.difference_update(vertices)
+        self.cover.update(cover)
@@ -10,7 +10,6 @@ import os
 from subprocess import PIPE, run
 import pandasql as psql
 import time
-import matplotlib.pyplot as plt
 import subprocess
 import ViolationsAlgorithm as vio
 import datetime
@@ -18,8 +17,16 @@ from datetime import date
 from collections import defaultdict
 from itertools import repeat
 import measurments as meas
-
-def insertViolationsExp(database_name, timesToRunTheTest=100, measuresToRun={"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}, singleIteration=False):
+import dataloader as loader
+import tracing
+import results
+import baselinecache
+import measurememo
+import pipeline
+import dcimplication
+import liveindex
+
+def insertViolationsExp(database_name, timesToRunTheTest=100, measuresToRun={"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}, singleIteration=False, detectionMode='sql', memoryBudget=1<<30, estimateCheckpoints=False, sampleBudget=10000, profilePhases=(), trackMemory=False, seed=None, resultsFormat='csv', batchSize=100, useBaselineCache=True, memoizeMeasures=True, pipelined=False, measureWorkers=1, queueSize=4, snapshotWorkers=0):
     """
     insertViolationsExp - the main function that computes the measures specified by the user on the given database.
     
@@ -38,19 +45,65 @@ def insertViolationsExp(database_name, timesToRunTheTest=100, measuresToRun={"I_
         a dictionary in which the measures are the keys and true/false are the values.
         The function will compute the measures for which the value is true.
         measuresToRun shoud be in the form : {"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}
+        "I_MC_log":True adds the logarithm of I_MC, approximated in a bounded time where I_MC cannot be
+        enumerated (see mcapprox.py).
     singleIteration : bool
         true if the measures should be computed once on the given database, and false for a simulation.
+    detectionMode : string
+        'sql' to find the violations with the dynamic queries, 'blocked' to check the constraints in shared
+        blocks of tuples, 'parallel' to check them on a pool of processes, or 'partitioned' for databases whose
+        violating pairs do not fit in memory (see constraints_check). 'live' updates the violating pairs and the
+        measures with every changed tuple instead of detecting the violations at every iteration (see
+        liveindex.py), the iterations are then never estimated.
+    memoryBudget : int
+        the number of bytes available for the violation detection in the 'blocked' and 'partitioned' modes.
+    estimateCheckpoints : bool
+        true to estimate I_MI, I_P and I_R from samples at the intermediate checkpoints (see estimators.py),
+        and to compute the exact measures only on the final snapshot. I_lin_R and I_MC are not estimated and
+        are recorded as nan at the intermediate checkpoints.
+    sampleBudget : int
+        the number of sampled pairs for the estimations.
+    profilePhases : list of strings
+        the phases of the trace to run under cProfile, for example ['detection', 'I_R.build'] (see tracing.py).
+    trackMemory : bool
+        true to record the peak memory allocated by every phase in the trace.
+    seed : int
+        the seed of the random changes, a random seed by default. The seed is recorded with the results.
+    resultsFormat : string
+        'csv' or 'parquet', the format of the results file (see results.py).
+    batchSize : int
+        the number of computed iterations written to the results file at once.
+    useBaselineCache : bool
+        true to read the measures of the clean database from the on-disk cache when the same database,
+        constraints and measures were computed before (see baselinecache.py).
+    memoizeMeasures : bool
+        true to compute I_R, I_lin_R and I_MC per connected component of the conflict graph, reusing the values
+        of the components that did not change since the previous checkpoint (see measurememo.py).
+    pipelined : bool
+        true to compute the measures of an iteration in other threads while the simulation makes the next
+        changes (see pipeline.py).
+    measureWorkers : int
+        the number of threads computing I_R, I_lin_R and I_MC in a pipelined run.
+    queueSize : int
+        the number of iterations a stage of a pipelined run may hold before the previous stage waits.
+    snapshotWorkers : int
+        the number of processes of a pipelined run that detect and measure whole checkpoints at once, each on a
+        snapshot of the database (see pipeline.SnapshotPool), 0 to detect the checkpoints one after the other in
+        a single thread.
         
     Returns
     -------
-    Generate a chart for each measure where the y axis is the value of the measure and the x axis is the 
-    iteration number. The charts will be saved under the folder containing the database.
+    string, the path of the results file. The file has a row for every computed iteration, with the
+    configuration, the seed, the value of every measure and the running time of every phase.
+    Charts of many runs are drawn afterwards by results.plot_results (or python results.py).
     
-    The files "Running_Time.txt" and "All_results.txt" contain the average running time of each maasure and
-    all the results of the execution, respectively.
+    The file "Running_Time.txt" contains the average running time of each phase and the file "trace.jsonl"
+    contains a span for every phase of every iteration (see tracing.py).
     
     """
     global df
+    if pipelined and detectionMode == 'live':
+        raise ValueError('the live detection mode is not supported in a pipelined run')
     # messages at start
     if not singleIteration:
         print('Test '+database_name+' : running ' + str(timesToRunTheTest) + ' iterations; startTime:' + str(time.time()))
@@ -63,185 +116,129 @@ def insertViolationsExp(database_name, timesToRunTheTest=100, measuresToRun={"I_
     if (not os.path.exists(fullPath)):
         os.makedirs(fullPath);
     runningTimesFileName = fullPath +'/Running_Time.txt'
-    allResultsFileName = fullPath +'/All_results.txt'
+    resultsFileName = fullPath + '/results.' + resultsFormat
 
     start = time.time()
     
     # load the csv file and generate a list of constraints
-    df = pd.read_csv('Data/'+ database_name + '/' + "inputDB.csv", keep_default_na=False, na_values=['-1.#IND', '1.#QNAN', '1.#IND', '-1.#QNAN', '#N/A N/A', '#N/A', 'N/A', 'n/a','', '#NA', 'NULL','null', 'NaN', '-NaN', 'nan', '-nan', ''] , header=0)
-    constraints_raw = open('Data/'+ database_name+'/dcs.txt', 'r')
-    constraints = [line.strip() for line in constraints_raw.readlines()]
-    constraints = [x.replace(' ', '_') for x in constraints] #in case the columns names include spaces
+    # the csv file is parsed once into a binary cache, later runs memory-map the cache
+    df = loader.load_database(database_name)
+    constraints = loader.load_constraints(database_name)
 
     pd.options.mode.chained_assignment = None 
     
-    # in case the column names include spaces
-    allColumns = {}
-    for col in df.columns: 
-        allColumns[col] = col.replace(' ','_')
-    df = df.rename(columns=allColumns)
     
     # initializations
-    exes,measurments1,measurments2,measurments3,measurments4,measurments5,measurments6 = [],[],[],[],[],[],[]
-    sum2,sum3,sum4,sum5,sum6 = 0,0,0,0,0
+    if seed is None:
+        seed = random.randrange(2**32)
+    random.seed(seed)
+    numpy.random.seed(seed)
+    config = {'database': database_name, 'times_to_run': timesToRunTheTest, 'single_iteration': singleIteration, 'detection_mode': detectionMode, 'seed': seed}
+    writer = results.ResultsWriter(resultsFileName, config, batchSize)
+    memo = measurememo.MeasureMemo() if memoizeMeasures else None
+    tracer = tracing.activate(tracing.Tracer(fullPath + '/trace.jsonl', profilePhases, trackMemory=trackMemory, database=database_name, run_id=writer.runId))
     
+    # constraints implied by other constraints add no violating pairs, they are not checked (the violations
+    # are still inserted for all the constraints)
+    detectionConstraints, removedConstraints = dcimplication.reduce_constraints(constraints)
+    for con, other in removedConstraints.items():
+        print('Constraint ' + con + (' is implied by ' + other if other else ' can never be violated') + ', it is not checked')
+
     # construct the dynamic queries which will be used for detecting violations in the database
-    allConstraints = meas.build_dynamic_queries(constraints,df)
-    allColumns = allConstraints[2]  
+    allConstraints = meas.build_dynamic_queries(detectionConstraints,df)
+    # in case only I_D and I_MI are computed, the violating pairs are counted instead of enumerated
+    if detectionMode != 'live' and not any(measuresToRun.get(m, False) for m in ("I_P", "I_R", "I_lin_R", "I_MC", "I_MC_log")):
+        detectionMode = 'count'
+
     # calculations for the first stage - the database should be consistent
-    exes.append(0)
-    sdfc = meas.constraints_check(df,constraints, allColumns, allConstraints[0], allConstraints[1])
-    if (measuresToRun["I_D"]):
-        measurments1.append(meas.first_measurer_I_D(sdfc[0]))
-    if (measuresToRun["I_MI"]):
-        measurments2.append(meas.second_measurer_I_MI(sdfc[0]))
-    if (measuresToRun["I_P"]):
-        measurments3.append(meas.third_measurer_I_P(sdfc[1]))
-    if (measuresToRun["I_R"]):    
-        measurments4.append(meas.fourth_measurer_I_R(sdfc[0])[0])
-    if (measuresToRun["I_lin_R"]): 
-        measurments5.append(meas.fifth_measurer_I_lin_R(sdfc[0])[0])
-    if (measuresToRun["I_MC"]):
-        measurments6.append(meas.sixth_measurer_I_MC(fullPath, sdfc[0])[0])
+    tracing.set_iteration(0)
+    # the violations of the clean database are detected once in the live mode as well
+    baselineMode = 'blocked' if detectionMode == 'live' else detectionMode
+    if useBaselineCache:
+        with tracing.span('baseline') as record:
+            compute = lambda: meas.compute_measures(df, detectionConstraints, allConstraints, measuresToRun, fullPath, baselineMode, memoryBudget, withPairs=True)
+            values, pairs, record['cached'] = baselinecache.cached_baseline(database_name, measuresToRun, compute)
+    else:
+        values = meas.compute_measures(df, detectionConstraints, allConstraints, measuresToRun, fullPath, baselineMode, memoryBudget)
+    writer.append(0, values, tracing.iteration_times())
      
     # in case the user wishes to run the violations algorithm and introduce random violations in the database    
     if not singleIteration:    
+        if pipelined:
+            if snapshotWorkers:
+                stages = pipeline.SnapshotPool(df, detectionConstraints, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, writer.append, snapshotWorkers, queueSize, memoizeMeasures, sampleBudget)
+            else:
+                stages = pipeline.Pipeline(df, detectionConstraints, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, writer.append, measureWorkers, queueSize, memoizeMeasures, sampleBudget)
+        if detectionMode == 'live':
+            # from here on the violating pairs are updated with every changed tuple
+            live = liveindex.LiveMeasures(df, detectionConstraints, measuresToRun, fullPath, memoryBudget)
         for x in range(1, 100):
             global t1,t2
+            tracing.set_iteration(x)
             
-            # choose two tuples randomly
-            sample = df.sample(n=2)
-            t1 = sample.iloc[0]
-            t2 = sample.iloc[1]
+            with tracing.span('noise'):
+                # choose two tuples randomly
+                sample = df.sample(n=2)
+                t1 = sample.iloc[0]
+                t2 = sample.iloc[1]
         
-            # clean constraint from excessive chars
-            constraintSetRaw = random.choice(constraints)
-            constraintSet = constraintSetRaw[4:-1].split('&')
-            constraintSet = [re.split('(!=|>=|<=|>|<|=)', i) for i in constraintSet]
+                # clean constraint from excessive chars
+                constraintSetRaw = random.choice(constraints)
+                constraintSet = constraintSetRaw[4:-1].split('&')
+                constraintSet = [re.split('(!=|>=|<=|>|<|=)', i) for i in constraintSet]
             
-            # in case the constraint refers to a single tuple
-            if "t2" not in constraintSet:
-                t2 = t1
+                # in case the constraint refers to a single tuple
+                if "t2" not in constraintSet:
+                    t2 = t1
                 
-            # generate violations using the fittingViolationAlgorithm in ViolationsAlgorithm.py
-            t = vio.fittingViolationAlgorithm(constraintSet,df,t1,t2)
-            vio.updateTable(df,t[0],t[1],sample)
-
-            # calcuate the queries needed for the measures
-            sdfc = meas.constraints_check(df,constraints, allColumns, allConstraints[0], allConstraints[1])
-            exes.append(x)
-
-            if (measuresToRun["I_D"]):
-                measurments1.append(meas.first_measurer_I_D(sdfc[0]))
-
-            if (measuresToRun["I_MI"]):
-                measurments2.append(meas.second_measurer_I_MI(sdfc[0]))
-                sum2 += sdfc[2]
-
-            if (measuresToRun["I_P"]):
-                measurments3.append(meas.third_measurer_I_P(sdfc[1]))
-                sum3 += sdfc[3]
-
-            if (measuresToRun["I_R"]):    
-                res1 = meas.fourth_measurer_I_R(sdfc[0])
-                measurments4.append(res1[0])
-                sum4 += res1[1]
-
-            if (measuresToRun["I_lin_R"]): 
-                res2 = meas.fifth_measurer_I_lin_R(sdfc[0])
-                measurments5.append(res2[0])
-                sum5 += res2[1]
-
-            if (measuresToRun["I_MC"]):
-                res3 = meas.sixth_measurer_I_MC(fullPath, sdfc[0])
-                measurments6.append(res3[0])
-                sum6 += res3[1]
+                # generate violations using the fittingViolationAlgorithm in ViolationsAlgorithm.py
+                t = vio.fittingViolationAlgorithm(constraintSet,df,t1,t2)
+                vio.updateTable(df,t[0],t[1],sample)
+
+            # at the intermediate checkpoints the measures may be estimated from samples
+            estimated = estimateCheckpoints and x < 99 and detectionMode != 'live'
+            if pipelined or detectionMode == 'live':
+                # the two updated tuples are handed over cell by cell
+                changes = [(row, column, df.at[row, column]) for row in sample.index for column in df.columns]
+            if pipelined:
+                stages.submit(x, changes, tracing.iteration_times(), estimated)
+            elif detectionMode == 'live':
+                with tracing.span('detection', mode='live'):
+                    live.apply(changes)
+                values = live.measures()
+                writer.append(x, values, tracing.iteration_times())
+            elif estimated:
+                values, intervals = meas.estimate_checkpoint(df, detectionConstraints, measuresToRun, sampleBudget)
+                writer.append(x, values, tracing.iteration_times(), intervals)
+            else:
+                values = meas.compute_measures(df, detectionConstraints, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, memo=memo)
+                writer.append(x, values, tracing.iteration_times())
+        if pipelined:
+            # waits for the measures of the last iterations
+            stages.close()
     
     # messages at finish
     print('Test '+database_name+' : runTime = ' + str(time.time()))
     print('Test '+database_name+' finished, preparing the results.')
     
-    f_times   = open(runningTimesFileName, "a+")
-    f_results = open(allResultsFileName,"a+")
-    
-    if (measuresToRun["I_D"]):
-        plt.scatter(exes, measurments1, c='r')
-        plt.title('Drastic inconsistency value I_D:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_D.jpg', dpi=300)
-        plt.clf()
-
-    if (measuresToRun["I_MI"]):
-        plt.scatter(exes, measurments2, c='b')
-        plt.title('Minimal inconsistent subsets of D I_MI:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_MI.jpg', dpi=300) 
-        f_times.write("AVG for I_MI: ")
-        f_times.write(str(float(sum2/timesToRunTheTest)))
-        f_results.write("I_MI results: ")
-        f_results.write(str(measurments2))
-        plt.clf()
-
-    if (measuresToRun["I_P"]):
-        plt.scatter(exes, measurments3, c='g')
-        plt.title('Problematic facts I_P:')
-        plt.ylabel('results')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_P.jpg', dpi=300)
-        f_times.write("\nAVG for I_P: ")
-        f_times.write(str(float(sum3/timesToRunTheTest))) 
-        f_results.write("\nI_P results: ")
-        f_results.write(str(measurments3))
-        plt.clf()
-
-    if (measuresToRun["I_R"]):
-        plt.scatter(exes, measurments4, c='y')
-        plt.title('Minimal cost of a sequence of operations that repairs the database I_R:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_R.jpg', dpi=300)  
-        f_times.write("\nAVG for I_R: ")
-        f_times.write(str(float((sum4+sum2)/timesToRunTheTest)))
-        f_results.write("\nI_R results: ")
-        f_results.write(str(measurments4))
-        plt.clf()
-
-    if (measuresToRun["I_lin_R"]):
-        plt.scatter(exes, measurments5, c='pink')
-        plt.title('Linear relaxation of the fourth measurer I_lin_R:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_lin_R.jpg', dpi=300)  
-        f_times.write("\nAVG for I_lin_R: ")
-        f_times.write(str(float((sum5+sum2)/timesToRunTheTest)))
-        f_results.write("\nI_lin_R results: ")
-        f_results.write(str(measurments5))
-        plt.clf()
-
-    if (measuresToRun["I_MC"]):
-        plt.scatter(exes, measurments6, c='purple')
-        plt.title('Maximal cliques I_MC:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_MC.jpg', dpi=300)  
-        f_times.write("\nAVG for I_MC: ")
-        f_times.write(str(float((sum6+sum2)/timesToRunTheTest)))
-        f_results.write("\nI_MC results: ")
-        f_results.write(str(measurments6))
-        plt.clf()
+    tracing.set_iteration(None)
+    with tracing.span('output'):
+        writer.close()
 
+    # the average running time of every phase, from the trace
     end = time.time()
-    f_times.write("\ntotal time ")
+    f_times = open(runningTimesFileName, "a+")
+    for phase, totals in sorted(tracer.summary().items()):
+        f_times.write("AVG for " + phase + ": " + str(totals['wall']) + " (cpu " + str(totals['cpu']) + ", " + str(totals['count']) + " spans)\n")
+    f_times.write("total time ")
     f_times.write(str(end - start))
-
     f_times.write("\n---\n")
-    f_results.write("\n---\n")
-
     f_times.close()
-    f_results.close()
+    tracer.close()
+    tracing.activate(None)
 
     print('End of test '+database_name + '; total time = ' + str(end - start))
     print('\033[1m'+"Computation finished, outputs can be found in "+'Data/'+ database_name + resultsDirectoryPath +'\n \033[0m')
+    return resultsFileName
 
 insertViolationsExp('Airport')
@@ -0,0 +1,198 @@
+import pandas as pd
+import numpy as numpy
+import hashlib
+import math
+import conflictgraph as cg
+import measurments as meas
+import mcapprox
+import dynamiccover
+import treedecomp
+
+# the measures that are computed per connected component of the conflict graph, I_MC_log_var is the variance
+# of the estimate of I_MC_log
+COMPONENT_MEASURES = ["I_R", "I_lin_R", "I_MC", "I_MC_log", "I_MC_log_var"]
+
+def _fingerprint(pairs):
+    return hashlib.blake2b(numpy.ascontiguousarray(pairs, dtype=numpy.int64).tobytes(), digest_size=16).hexdigest()
+
+def canonical_pairs(uniquePairs):
+    """
+    canonical_pairs - the violating pairs as a sorted (n,2) array of int64, so that the same conflict graph
+    always has the same fingerprint whatever the order the pairs were found in.
+    """
+    pairs = numpy.asarray(uniquePairs, dtype=numpy.int64).reshape(-1, 2)
+    return pairs[numpy.lexsort((pairs[:,1], pairs[:,0]))]
+
+def pair_changes(before, after):
+    """
+    pair_changes - the violating pairs added and removed between two evaluations.
+
+    Parameters
+    ----------
+    before, after : (n,2) arrays of int
+        the violating pairs, as returned by canonical_pairs
+
+    Returns
+    -------
+    list of two (k,2) arrays of int, the added pairs and the removed pairs
+    """
+    codes = lambda pairs: (pairs[:,0] << 32) | pairs[:,1]
+    beforeCodes, afterCodes = codes(before), codes(after)
+    return after[~numpy.isin(afterCodes, beforeCodes)], before[~numpy.isin(beforeCodes, afterCodes)]
+
+def component_edges(pairs):
+    """
+    component_edges - splits the violating pairs by the connected components of the conflict graph.
+
+    Parameters
+    ----------
+    pairs : (n,2) array of int
+        the violating pairs, as returned by canonical_pairs
+
+    Returns
+    -------
+    list of (k,2) arrays of int, the sorted pairs of every component
+    """
+    if len(pairs) == 0:
+        return []
+    nodes, labels = cg.connected_components(pairs)
+    edgeLabels = labels[numpy.searchsorted(nodes, pairs[:,0])]
+    order = numpy.argsort(edgeLabels, kind='stable')
+    bounds = numpy.flatnonzero(numpy.diff(edgeLabels[order])) + 1
+    return numpy.split(pairs[order], bounds)
+
+def component_measures(edges, measures, fullPath):
+    """
+    component_measures - computes I_R, I_lin_R, I_MC and I_MC_log on a single connected component of the
+    conflict graph.
+    A single pair (i,j) and a single tuple that violates a constraint on its own (the pair (i,i)) have closed
+    forms. Components with a tree decomposition of width at most treedecomp.MAX_WIDTH get the exact I_R, I_MC
+    and I_MC_log by dynamic programming over the decomposition (the tuples that violate a constraint on their
+    own are in every cover and in no consistent subset). Other components are solved with the measurers of
+    measurments.py, and for I_MC the tuples of the component are renumbered, so the complement graph only spans
+    the component. I_lin_R is always solved by fifth_measurer_I_lin_R, and I_MC_log and its variance are
+    otherwise computed by mcapprox.component_log_count.
+
+    Parameters
+    ----------
+    edges : (k,2) array of int
+        the violating pairs of the component
+    measures : list of strings
+        the measures to compute, from COMPONENT_MEASURES
+    fullPath : string
+        the directory where the graph of I_MC is generated
+
+    Returns
+    -------
+    dictionary from the measures to their values on the component
+    """
+    values = {}
+    if len(edges) == 1:
+        selfLoop = edges[0][0] == edges[0][1]
+        closedForms = {"I_R": 1, "I_lin_R": 0.5 if selfLoop else 1.0, "I_MC": 1 if selfLoop else 2,
+                       "I_MC_log": 0.0 if selfLoop else math.log(2), "I_MC_log_var": 0.0}
+        for measure in measures:
+            values[measure] = closedForms[measure]
+        return values
+    logMeasures = "I_MC_log" in measures or "I_MC_log_var" in measures
+    decomposition = None
+    if "I_R" in measures or "I_MC" in measures or logMeasures:
+        neighbors = mcapprox.component_graph(edges)
+        decomposition = treedecomp.tree_decomposition(neighbors)
+    if decomposition is not None:
+        if "I_R" in measures:
+            loops = int(numpy.count_nonzero(edges[:,0] == edges[:,1]))
+            values["I_R"] = loops + treedecomp.min_vertex_cover(neighbors, decomposition)
+        if "I_MC" in measures or logMeasures:
+            count = treedecomp.count_maximal_independent_sets(neighbors, decomposition)
+            values["I_MC"], values["I_MC_log"], values["I_MC_log_var"] = count, math.log(count), 0.0
+    pairsDf = pd.DataFrame(edges, columns=['id1', 'id2'])
+    if "I_R" in measures and "I_R" not in values:
+        values["I_R"] = meas.fourth_measurer_I_R(pairsDf)[0]
+    if "I_lin_R" in measures:
+        values["I_lin_R"] = meas.fifth_measurer_I_lin_R(pairsDf)[0]
+    if "I_MC" in measures and "I_MC" not in values:
+        nodes = numpy.unique(edges)
+        localDf = pd.DataFrame(numpy.searchsorted(nodes, edges) + 1, columns=['id1', 'id2'])
+        values["I_MC"] = meas.sixth_measurer_I_MC(fullPath, localDf, len(nodes))[0]
+    if logMeasures and "I_MC_log" not in values:
+        logValue, logVariance = mcapprox.component_log_count(edges, decompose=False)
+        values["I_MC_log"], values["I_MC_log_var"] = logValue, logVariance
+    return dict((measure, values[measure]) for measure in measures)
+
+class MeasureMemo(object):
+    """
+    MeasureMemo - remembers the values of I_R, I_lin_R and I_MC on the conflict graph of the last evaluation and
+    on each of its connected components, so that a snapshot whose conflict graph did not change since the last
+    evaluation is not measured again, and after a change only the changed components are measured.
+
+    The measures decompose over the components: I_R and I_lin_R are the sums of their values on the components
+    (the ILP and the LP are separable), and I_MC is the product of the numbers of maximal independent sets of
+    the components (tuples that do not participate in any violation belong to all of them), so I_MC_log and
+    the variance of its estimate are sums as well.
+    Components are identified by a fingerprint of their pairs, so a component is reused only when it has exactly
+    the same tuples and pairs. I_R is maintained by a DynamicCover from the pairs added and removed since the last
+    evaluation, so a changed component is solved again from its previous cover.
+    """
+
+    def __init__(self):
+        self.fingerprint = None
+        self.values = {}
+        self.components = {}
+        self.lastComputed = 0
+        self.lastReused = 0
+        self.pairs = numpy.zeros((0, 2), dtype=numpy.int64)
+        self.cover = dynamiccover.DynamicCover()
+
+    def evaluate(self, uniquePairs, measures, fullPath):
+        """
+        evaluate - the values of the measures on the conflict graph of the given violating pairs.
+
+        Parameters
+        ----------
+        uniquePairs : (n,2) array of int
+            the pairs of ids of tuples that jointly violate a constraint
+        measures : list of strings
+            the measures to compute, from COMPONENT_MEASURES
+        fullPath : string
+            the directory where the graph of I_MC is generated
+
+        Returns
+        -------
+        dictionary from the measures to their values
+        """
+        pairs = canonical_pairs(uniquePairs)
+        fingerprint = (_fingerprint(pairs), tuple(measures))
+        self.lastComputed = self.lastReused = 0
+        if fingerprint == self.fingerprint:
+            return dict(self.values)
+
+        totals = dict((measure, 1 if measure == "I_MC" else 0) for measure in measures)
+        if "I_R" in measures:
+            added, removed = pair_changes(self.pairs, pairs)
+            totals["I_R"] = self.cover.update(added, removed)
+            self.pairs = pairs
+        componentMeasures = [measure for measure in measures if measure != "I_R"]
+        components = {}
+        for edges in component_edges(pairs if componentMeasures else pairs[:0]):
+            key = _fingerprint(edges)
+            values = self.components.get(key, {})
+            missing = [measure for measure in componentMeasures if measure not in values]
+            if missing:
+                values = dict(values)
+                values.update(component_measures(edges, missing, fullPath))
+                self.lastComputed += 1
+            else:
+                self.lastReused += 1
+            components[key] = values
+            for measure in componentMeasures:
+                if measure == "I_MC":
+                    totals[measure] *= values[measure]
+                else:
+                    totals[measure] += values[measure]
+
+        # only the components of the current graph are kept
+        self.components = components
+        self.fingerprint = fingerprint
+        self.values = totals
+        return dict(totals)
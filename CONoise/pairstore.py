@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as numpy
+import os
+import shutil
+
+class PairStore(object):
+    """
+    PairStore - an on-disk set of pairs (id1,id2) of ids of tuples that jointly violate the constraints.
+    Pairs are appended in chunks and routed into bucket files by id1, so that duplicates always land in the
+    same bucket and can be removed one bucket at a time by finalize().
+
+    The store exposes the same interface the measures use on the result of constraints_check:
+    len(store) is the number of pairs and store.values is an (n,2) array of the pairs, so the measures
+    in measurments.py run over a store unchanged. chunks() and tuples() read the store bucket by bucket
+    for the measures that do not need all the pairs in memory at once.
+
+    With maskBytes, every pair also carries a bitmask of the constraints it violates (see
+    detection.Attribution), kept in a second file per bucket in the order of the pairs. The masks of duplicate
+    pairs are merged by finalize().
+
+    Parameters
+    ----------
+    directory : string
+        the directory of the store, any previous content is removed
+    buckets : int
+        the number of bucket files
+    maskBytes : int
+        the number of bytes of the bitmask of every pair, 0 to store the pairs only
+    """
+
+    def __init__(self, directory, buckets=64, maskBytes=0):
+        self.directory = directory
+        self.buckets = buckets
+        self.maskBytes = maskBytes
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        self.count = None
+
+    def _bucket_file_name(self, bucket):
+        return os.path.join(self.directory, 'bucket_' + str(bucket) + '.bin')
+
+    def _mask_file_name(self, bucket):
+        return os.path.join(self.directory, 'bucket_' + str(bucket) + '.dcs')
+
+    def append(self, id1, id2, masks=None):
+        """
+        append - adds a chunk of pairs to the store.
+
+        Parameters
+        ----------
+        id1, id2 : arrays of int
+            the ids of the tuples of each pair, id1 <= id2
+        masks : (n,maskBytes) array of uint8
+            the bitmasks of the constraints violated by each pair, when the store has maskBytes
+        """
+        if len(id1) == 0:
+            return
+        pairs = numpy.empty((len(id1), 2), dtype=numpy.int64)
+        pairs[:,0] = id1
+        pairs[:,1] = id2
+        bucketOfPair = pairs[:,0] % self.buckets
+        order = numpy.argsort(bucketOfPair, kind='stable')
+        pairs = pairs[order]
+        if self.maskBytes:
+            masks = numpy.asarray(masks, dtype=numpy.uint8).reshape(-1, self.maskBytes)[order]
+        bounds = numpy.searchsorted(bucketOfPair[order], numpy.arange(self.buckets + 1))
+        for bucket in range(self.buckets):
+            if bounds[bucket] < bounds[bucket+1]:
+                with open(self._bucket_file_name(bucket), 'ab') as f:
+                    pairs[bounds[bucket]:bounds[bucket+1]].tofile(f)
+                if self.maskBytes:
+                    with open(self._mask_file_name(bucket), 'ab') as f:
+                        masks[bounds[bucket]:bounds[bucket+1]].tofile(f)
+        self.count = None
+
+    def finalize(self):
+        """
+        finalize - removes duplicate pairs, one bucket at a time. The bitmasks of a duplicate pair are merged.
+        """
+        count = 0
+        for bucket in range(self.buckets):
+            bucketFileName = self._bucket_file_name(bucket)
+            if not os.path.exists(bucketFileName):
+                continue
+            pairs = numpy.fromfile(bucketFileName, dtype=numpy.int64).reshape(-1, 2)
+            if self.maskBytes:
+                masks = numpy.fromfile(self._mask_file_name(bucket), dtype=numpy.uint8).reshape(-1, self.maskBytes)
+                order = numpy.lexsort((pairs[:,1], pairs[:,0]))
+                pairs, masks = pairs[order], masks[order]
+                starts = numpy.flatnonzero(numpy.r_[True, (pairs[1:] != pairs[:-1]).any(axis=1)])
+                pairs = pairs[starts]
+                numpy.bitwise_or.reduceat(masks, starts, axis=0).tofile(self._mask_file_name(bucket))
+            else:
+                pairs = numpy.unique(pairs, axis=0)
+            pairs.tofile(bucketFileName)
+            count += len(pairs)
+        self.count = count
+        return self
+
+    def chunks(self):
+        """
+        chunks - iterates over the pairs of the store, one bucket at a time.
+
+        Returns
+        -------
+        generator of (n,2) arrays of int
+        """
+        for bucket in range(self.buckets):
+            bucketFileName = self._bucket_file_name(bucket)
+            if os.path.exists(bucketFileName) and os.path.getsize(bucketFileName):
+                yield numpy.memmap(bucketFileName, dtype=numpy.int64, mode='r').reshape(-1, 2)
+
+    def mask_chunks(self):
+        """
+        mask_chunks - iterates over the bitmasks of the pairs, one bucket at a time, in the order of chunks().
+
+        Returns
+        -------
+        generator of (n,maskBytes) arrays of uint8
+        """
+        for bucket in range(self.buckets):
+            bucketFileName = self._bucket_file_name(bucket)
+            if os.path.exists(bucketFileName) and os.path.getsize(bucketFileName):
+                yield numpy.memmap(self._mask_file_name(bucket), dtype=numpy.uint8, mode='r').reshape(-1, self.maskBytes)
+
+    def __len__(self):
+        if self.count is None:
+            self.finalize()
+        return self.count
+
+    @property
+    def values(self):
+        chunks = [numpy.asarray(chunk) for chunk in self.chunks()]
+        if not chunks:
+            return numpy.empty((0, 2), dtype=numpy.int64)
+        return numpy.concatenate(chunks)
+
+    @property
+    def masks(self):
+        chunks = [numpy.asarray(chunk) for chunk in self.mask_chunks()]
+        if not chunks:
+            return numpy.empty((0, self.maskBytes), dtype=numpy.uint8)
+        return numpy.concatenate(chunks)
+
+    def tuples(self):
+        """
+        tuples - the ids of the tuples that participate in a violation, computed bucket by bucket.
+
+        Returns
+        -------
+        array of int
+        """
+        ids = numpy.empty(0, dtype=numpy.int64)
+        for chunk in self.chunks():
+            ids = numpy.union1d(ids, numpy.unique(chunk))
+        return ids
+
+    def to_frame(self):
+        """
+        to_frame - loads the store into a dataframe with the columns id1,id2, like the result of constraints_check.
+        """
+        return pd.DataFrame(self.values, columns=['id1', 'id2'])
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,355 @@
+import pandas as pd
+import multiprocessing
+import multiprocessing.util
+import os
+import queue
+import sys
+import threading
+import measurememo
+import measurments as meas
+import tracing
+
+# the end of the stream of checkpoints
+_DONE = object()
+
+class PipelineError(Exception):
+    pass
+
+class Pipeline(object):
+    """
+    Pipeline - computes the measures of the checkpoints of a noise simulation while the simulation goes on.
+    The work of a checkpoint is split in three stages, connected by bounded queues:
+
+    1. the simulation (the thread of the caller) changes the database and submits the cells it changed since
+       the previous checkpoint.
+    2. the detection thread applies the changes to its own copy of the database, so the simulation never waits
+       for it, detects the violations and computes I_D, I_MI and I_P (or the estimates, see
+       meas.estimate_checkpoint).
+    3. measureWorkers threads compute I_R, I_lin_R and I_MC from the violating pairs (see meas.pair_measures),
+       each with its own memo and its own directory for the graph of I_MC.
+
+    The results are handed to onResult in the order of the checkpoints, from the thread that finished them.
+    Threads are used instead of processes because the long phases (the sqlite queries, the solver and the
+    enumeration of I_MC) run outside the interpreter, and the stages share the violating pairs without copies.
+    When a queue is full the previous stage waits, so at most queueSize checkpoints are waiting at every stage.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database at the last submitted checkpoint (the pipeline keeps a copy)
+    constraintSets, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget :
+        the parameters of meas.compute_measures
+    onResult : function
+        called with the iteration, the values of the measures, the running times of the phases and the
+        intervals of the estimates (or None), for example ResultsWriter.append
+    measureWorkers : int
+        the number of threads of the third stage
+    queueSize : int
+        the number of checkpoints a stage may hold before the previous stage waits
+    memoize : bool
+        true to give every worker of the third stage a MeasureMemo (see measurememo.py)
+    sampleBudget : int
+        the number of sampled pairs for the estimated checkpoints
+    """
+
+    def __init__(self, df, constraintSets, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, onResult, measureWorkers=1, queueSize=4, memoize=True, sampleBudget=10000):
+        self.df = df.copy()
+        self.constraintSets = constraintSets
+        self.allConstraints = allConstraints
+        self.measuresToRun = measuresToRun
+        self.fullPath = fullPath
+        self.detectionMode = detectionMode
+        self.memoryBudget = memoryBudget
+        self.onResult = onResult
+        self.sampleBudget = sampleBudget
+        self.changesQueue = queue.Queue(queueSize)
+        self.pairsQueue = queue.Queue(queueSize)
+        self.error = None
+        self.submitted = 0
+        # the results that wait for the results of earlier checkpoints, from their order to their arguments
+        self.finished = {}
+        self.nextResult = 0
+        self.resultsLock = threading.Lock()
+
+        self.threads = [threading.Thread(target=self._run, args=(self._detect,), name='detection', daemon=True)]
+        for k in range(max(1, measureWorkers)):
+            workDir = os.path.join(fullPath, 'measures_' + str(k))
+            if not os.path.exists(workDir):
+                os.makedirs(workDir)
+            memo = measurememo.MeasureMemo() if memoize else None
+            self.threads.append(threading.Thread(target=self._run, args=(self._measure, workDir, memo), name='measures_' + str(k), daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self, stage, *args):
+        try:
+            stage(*args)
+        except BaseException:
+            if self.error is None:
+                self.error = sys.exc_info()
+
+    def _put(self, q, item):
+        # waits for room in the queue, unless another stage failed
+        while self.error is None:
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while self.error is None:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _raise(self):
+        if self.error is not None:
+            raise PipelineError('a stage of the pipeline failed') from self.error[1]
+
+    def submit(self, iteration, changes, timings=None, estimated=False):
+        """
+        submit - hands a checkpoint to the pipeline, waits when the detection stage is queueSize checkpoints behind.
+
+        Parameters
+        ----------
+        iteration : int
+            the number of changes made to the database so far
+        changes : list of (row, column, value)
+            the cells changed since the previous checkpoint, row is the index label, in the order they were changed
+        timings : dictionary
+            the running times of the phases of the simulation in this iteration (see tracing.iteration_times)
+        estimated : bool
+            true to estimate the measures of this checkpoint from samples
+        """
+        self._raise()
+        self._put(self.changesQueue, (self.submitted, iteration, list(changes), dict(timings or {}), estimated))
+        self.submitted += 1
+        self._raise()
+
+    def close(self):
+        """
+        close - waits until the results of all the submitted checkpoints were handed to onResult.
+        """
+        self._put(self.changesQueue, _DONE)
+        for thread in self.threads:
+            thread.join()
+        self._raise()
+
+    def _detect(self):
+        while True:
+            item = self._get(self.changesQueue)
+            if item is _DONE:
+                for k in range(len(self.threads) - 1):
+                    self._put(self.pairsQueue, _DONE)
+                return
+            order, iteration, changes, timings, estimated = item
+            tracing.set_iteration(iteration)
+            for row, column, value in changes:
+                self.df.at[row, column] = value
+            if estimated:
+                values, intervals = meas.estimate_checkpoint(self.df, self.constraintSets, self.measuresToRun, self.sampleBudget)
+                timings.update(tracing.iteration_times())
+                self._finish(order, iteration, values, timings, intervals)
+                continue
+            values, sdfc = meas.violation_measures(self.df, self.constraintSets, self.allConstraints, self.measuresToRun, self.fullPath, self.detectionMode, self.memoryBudget)
+            timings.update(tracing.iteration_times())
+            # the pairs are read by the next stage while the next checkpoint is detected
+            pairs = None
+            if sdfc is not None and any(self.measuresToRun.get(m, False) for m in measurememo.COMPONENT_MEASURES):
+                pairs = pd.DataFrame(sdfc[0].values, columns=['id1', 'id2'])
+            if not self._put(self.pairsQueue, (order, iteration, values, timings, pairs, len(self.df.index))):
+                return
+
+    def _measure(self, workDir, memo):
+        while True:
+            item = self._get(self.pairsQueue)
+            if item is _DONE:
+                return
+            order, iteration, values, timings, pairs, numOfRows = item
+            tracing.set_iteration(iteration)
+            if pairs is not None:
+                values.update(meas.pair_measures(pairs, self.measuresToRun, workDir, numOfRows, memo))
+                timings.update(tracing.iteration_times())
+            self._finish(order, iteration, values, timings, None)
+
+    def _finish(self, order, iteration, values, timings, intervals):
+        # the results are handed over in the order of the checkpoints
+        with self.resultsLock:
+            self.finished[order] = (iteration, values, timings, intervals)
+            while self.nextResult in self.finished:
+                self.onResult(*self.finished.pop(self.nextResult))
+                self.nextResult += 1
+
+# the state of a worker process of a SnapshotPool
+_snapshot = {}
+
+def _snapshot_init(df, settings, context):
+    # the base table is inherited from the simulation when the workers are forked, and copied once otherwise
+    _snapshot.update(settings)
+    _snapshot['base'] = df
+    _snapshot['table'] = df.copy()
+    _snapshot['overlay'] = {}
+    _snapshot['memo'] = measurememo.MeasureMemo() if settings['memoize'] else None
+    _snapshot['workDir'] = os.path.join(settings['fullPath'], 'snapshot_' + str(os.getpid()))
+    if not os.path.exists(_snapshot['workDir']):
+        os.makedirs(_snapshot['workDir'])
+    # the spans of every worker go to a trace file of its own, which is closed when the worker exits
+    tracer = None
+    if context is not None:
+        tracer = tracing.Tracer(os.path.join(settings['fullPath'], 'trace_' + str(os.getpid()) + '.jsonl'), **context)
+        multiprocessing.util.Finalize(tracer, tracer.close, exitpriority=10)
+    tracing.activate(tracer)
+
+def snapshot_table(base, table, before, after):
+    """
+    snapshot_table - turns a copy of the base table with the overlay before into the snapshot with the overlay
+    after, in place. Only the cells of the two overlays are written: the cells of before that are not in after
+    get their base values back, and the cells of after get their values.
+
+    Parameters
+    ----------
+    base : dataframe
+        the table the overlays apply to
+    table : dataframe
+        a copy of the base table, with the overlay before applied
+    before, after : dictionaries
+        the overlays, from (row, column) to the value of the cell, row is the index label
+
+    Returns
+    -------
+    dataframe, table
+    """
+    for row, column in before:
+        if (row, column) not in after:
+            table.at[row, column] = base.at[row, column]
+    for (row, column), value in after.items():
+        table.at[row, column] = value
+    return table
+
+def _snapshot_task(task):
+    order, iteration, overlay, timings, estimated = task
+    tracing.set_iteration(iteration)
+    table = snapshot_table(_snapshot['base'], _snapshot['table'], _snapshot['overlay'], overlay)
+    _snapshot['overlay'] = overlay
+    intervals = None
+    if estimated:
+        values, intervals = meas.estimate_checkpoint(table, _snapshot['constraintSets'], _snapshot['measuresToRun'], _snapshot['sampleBudget'])
+    else:
+        values = meas.compute_measures(table, _snapshot['constraintSets'], _snapshot['allConstraints'], _snapshot['measuresToRun'], _snapshot['workDir'], _snapshot['detectionMode'], _snapshot['memoryBudget'], memo=_snapshot['memo'])
+    timings.update(tracing.iteration_times())
+    return order, iteration, values, timings, intervals
+
+class SnapshotPool(object):
+    """
+    SnapshotPool - computes the measures of the checkpoints of a noise simulation on a pool of processes, while
+    the simulation goes on. Once the changes of a checkpoint are made, its measures do not depend on the other
+    checkpoints, so every checkpoint is detected and measured as a whole by a worker, and many checkpoints are
+    measured at once. Unlike Pipeline, where a single thread detects the violations of all the checkpoints, the
+    detection scales with the number of workers.
+
+    A checkpoint is sent as a snapshot of the database: the table at the start of the pool, which every worker
+    holds (the workers are forked, so the table is shared until a worker writes to it), and the overlay of the
+    cells changed since then, with their last values. A worker keeps its copy of the table at the snapshot it
+    measured last and moves it to the next snapshot by writing only the cells of the two overlays (see
+    snapshot_table), so a snapshot costs the size of the overlay rather than the size of the database.
+
+    The results are handed to onResult in the order of the checkpoints. When queueSize checkpoints per worker
+    are waiting, the simulation waits for the workers. Every worker writes its spans to a trace file
+    trace_<pid>.jsonl of its own, and generates the graph of I_MC in a directory snapshot_<pid>.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database at the last submitted checkpoint (the pool keeps a copy)
+    constraintSets, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget :
+        the parameters of meas.compute_measures, the 'parallel' detection mode is not supported since the
+        workers cannot start processes of their own
+    onResult : function
+        called with the iteration, the values of the measures, the running times of the phases and the
+        intervals of the estimates (or None), for example ResultsWriter.append
+    workers : int
+        the number of processes
+    queueSize : int
+        the number of checkpoints per worker that may wait before the simulation waits
+    memoize : bool
+        true to give every worker a MeasureMemo (see measurememo.py)
+    sampleBudget : int
+        the number of sampled pairs for the estimated checkpoints
+    """
+
+    def __init__(self, df, constraintSets, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, onResult, workers=2, queueSize=4, memoize=True, sampleBudget=10000):
+        if detectionMode == 'parallel':
+            raise ValueError('the parallel detection mode is not supported in a SnapshotPool')
+        self.onResult = onResult
+        self.overlay = {}
+        self.error = None
+        self.submitted = 0
+        self.finished = {}
+        self.nextResult = 0
+        self.resultsLock = threading.Lock()
+        self.pending = threading.BoundedSemaphore(max(1, workers) * max(1, queueSize))
+        settings = {'constraintSets': constraintSets, 'allConstraints': allConstraints, 'measuresToRun': measuresToRun, 'fullPath': fullPath,
+                    'detectionMode': detectionMode, 'memoryBudget': memoryBudget, 'memoize': memoize, 'sampleBudget': sampleBudget}
+        context = tracing.ACTIVE.context if tracing.ACTIVE is not None else None
+        # like sweep.py, the workers are forked so that the scripts of the experiments are not imported again
+        processes = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+        self.pool = processes.Pool(max(1, workers), _snapshot_init, (df.copy(), settings, context))
+
+    def _raise(self):
+        if self.error is not None:
+            raise PipelineError('a worker of the snapshot pool failed') from self.error
+
+    def _failed(self, error):
+        if self.error is None:
+            self.error = error
+        self.pending.release()
+
+    def submit(self, iteration, changes, timings=None, estimated=False):
+        """
+        submit - hands a checkpoint to the pool, waits when queueSize checkpoints per worker are waiting.
+
+        Parameters
+        ----------
+        iteration : int
+            the number of changes made to the database so far
+        changes : list of (row, column, value)
+            the cells changed since the previous checkpoint, row is the index label, in the order they were changed
+        timings : dictionary
+            the running times of the phases of the simulation in this iteration (see tracing.iteration_times)
+        estimated : bool
+            true to estimate the measures of this checkpoint from samples
+        """
+        self._raise()
+        for row, column, value in changes:
+            self.overlay[(row, column)] = value
+        self.pending.acquire()
+        self.pool.apply_async(_snapshot_task, ((self.submitted, iteration, dict(self.overlay), dict(timings or {}), estimated),), callback=self._finish, error_callback=self._failed)
+        self.submitted += 1
+
+    def close(self):
+        """
+        close - waits until the results of all the submitted checkpoints were handed to onResult.
+        """
+        self.pool.close()
+        self.pool.join()
+        self._raise()
+
+    def _finish(self, result):
+        # the results are handed over in the order of the checkpoints
+        order, iteration, values, timings, intervals = result
+        try:
+            with self.resultsLock:
+                self.finished[order] = (iteration, values, timings, intervals)
+                while self.nextResult in self.finished:
+                    self.onResult(*self.finished.pop(self.nextResult))
+                    self.nextResult += 1
+        except BaseException as error:
+            # the callbacks run in a thread of the pool, the error is raised in the simulation
+            if self.error is None:
+                self.error = error
+        finally:
+            self.pending.release()
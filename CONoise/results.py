@@ -0,0 +1,203 @@
+import pandas as pd
+import numpy as numpy
+import argparse
+import glob
+import os
+import uuid
+import measurments as meas
+
+# the phases whose running times are recorded with every result, the nested phases are only in the trace
+TIMED_PHASES = ['noise', 'detection', 'graph', 'estimation'] + meas.MEASURES
+# the measures that are estimated from samples, with a confidence interval (see estimators.py)
+ESTIMATED_MEASURES = ["I_MI", "I_P", "I_R"]
+
+def result_columns(configColumns):
+    """
+    result_columns - the columns of a results file, in order: the run, the configuration, the iteration, every
+    measure, the confidence intervals of the estimated measures and the running time of every phase.
+    All the measures are always present (nan when a measure was not computed), so that files of different runs
+    share the same schema and can be read together.
+    """
+    columns = ['run_id'] + list(configColumns) + ['iteration', 'estimated'] + meas.MEASURES
+    columns += [m + suffix for m in ESTIMATED_MEASURES for suffix in ('_low', '_high')]
+    # the standard error of the approximate logarithm of I_MC (see mcapprox.py)
+    columns += ['I_MC_log_err']
+    columns += ['time_' + phase for phase in TIMED_PHASES]
+    return columns
+
+class ResultsWriter(object):
+    """
+    ResultsWriter - appends the results of a run, one row per computed iteration, to a columnar file.
+    Rows are buffered and written in batches of batchSize rows, so the file can be read while the run goes on
+    and at most one batch is lost if the run is interrupted.
+    The format follows the extension of the file: '.parquet' writes a row group per batch (this requires
+    pyarrow), any other extension writes csv.
+
+    Parameters
+    ----------
+    fileName : string
+        the path of the results file, rows are appended to an existing csv file
+    config : dictionary
+        the configuration of the run (database, parameters, seed...), repeated in every row
+    batchSize : int
+        the number of rows written at once
+    runId : string
+        the identifier of the run, a random one by default
+    """
+
+    def __init__(self, fileName, config, batchSize=100, runId=None):
+        self.fileName = fileName
+        self.config = dict(config)
+        self.batchSize = batchSize
+        self.runId = runId if runId is not None else uuid.uuid4().hex
+        self.columns = result_columns(self.config)
+        self.rows = []
+        self.parquetWriter = None
+
+    def append(self, iteration, values, timings=None, intervals=None):
+        """
+        append - adds the results of one iteration.
+
+        Parameters
+        ----------
+        iteration : int
+            the number of changes made to the database so far
+        values : dictionary
+            from the names of the computed measures to their values
+        timings : dictionary
+            from the phases to their running times in this iteration, in seconds (see tracing.iteration_times)
+        intervals : dictionary
+            from the estimated measures to tuples (estimate, low, high), when the measures were estimated
+        """
+        row = dict.fromkeys(self.columns, numpy.nan)
+        row.update(self.config)
+        row.update({'run_id': self.runId, 'iteration': iteration, 'estimated': intervals is not None})
+        for measure, value in values.items():
+            try:
+                row[measure] = float(value)
+            except OverflowError:
+                # an exact I_MC beyond the range of a float, its logarithm is I_MC_log
+                row[measure] = numpy.inf
+        for measure, interval in (intervals or {}).items():
+            row[measure + '_low'] = interval[1]
+            row[measure + '_high'] = interval[2]
+        for phase, seconds in (timings or {}).items():
+            if phase in TIMED_PHASES:
+                row['time_' + phase] = seconds
+        self.rows.append(row)
+        if len(self.rows) >= self.batchSize:
+            self.flush()
+
+    def restore(self, lastIteration):
+        """
+        restore - continues the results file of an interrupted run. The rows of iterations after lastIteration
+        (written after the last checkpoint) are dropped, and the file is rewritten by the next flush.
+        """
+        if not os.path.exists(self.fileName):
+            return
+        previous = load_results([self.fileName])
+        previous = previous[previous['iteration'] <= lastIteration].reindex(columns=self.columns)
+        self.rows = previous.to_dict('records') + self.rows
+        os.remove(self.fileName)
+
+    def flush(self):
+        """
+        flush - writes the buffered rows to the file.
+        """
+        if not self.rows:
+            return
+        batch = pd.DataFrame(self.rows, columns=self.columns)
+        self.rows = []
+        if self.fileName.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if self.parquetWriter is None:
+                self.parquetWriter = pq.ParquetWriter(self.fileName, table.schema)
+            self.parquetWriter.write_table(table)
+        else:
+            batch.to_csv(self.fileName, mode='a', header=not os.path.exists(self.fileName), index=False)
+
+    def close(self):
+        self.flush()
+        if self.parquetWriter is not None:
+            self.parquetWriter.close()
+            self.parquetWriter = None
+
+def load_results(fileNames):
+    """
+    load_results - reads the results files of many runs into one dataframe.
+
+    Parameters
+    ----------
+    fileNames : list of strings
+        paths or glob patterns of csv and parquet results files
+
+    Returns
+    -------
+    dataframe with the columns of result_columns, a row per computed iteration of every run
+    """
+    paths = sorted(set(path for pattern in fileNames for path in (glob.glob(pattern) or [pattern])))
+    frames = [pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path) for path in paths]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def plot_results(results, outputDir, measures=meas.MEASURES, groupBy='run_id', dpi=100):
+    """
+    plot_results - draws a chart for each measure, where the y axis is the value of the measure and the x axis
+    is the iteration number, with one series for every value of groupBy (every run by default).
+    This is a separate step that runs after the experiments, on the results of any number of runs.
+
+    Parameters
+    ----------
+    results : dataframe
+        the results, as returned by load_results
+    outputDir : string
+        the directory of the charts, <measure>.png
+    measures : list of strings
+        the measures to draw, measures that were not computed in any run are skipped
+    groupBy : string or list of strings
+        the columns that define a series
+    dpi : int
+        the resolution of the charts
+
+    Returns
+    -------
+    list of strings, the paths of the charts
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir)
+    chartFileNames = []
+    for measure in measures:
+        if measure not in results or results[measure].isnull().all():
+            continue
+        figure, axes = plt.subplots()
+        for name, series in results.sort_values('iteration').groupby(groupBy):
+            axes.scatter(series['iteration'], series[measure], s=8, label=str(name))
+        axes.set_title(measure)
+        axes.set_ylabel('results')
+        axes.set_xlabel('number of changes')
+        if results.groupby(groupBy).ngroups <= 10:
+            axes.legend(fontsize='small')
+        chartFileName = os.path.join(outputDir, measure + '.png')
+        figure.savefig(chartFileName, dpi=dpi)
+        plt.close(figure)
+        chartFileNames.append(chartFileName)
+    return chartFileNames
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Draws the charts of the measures from the results files of many runs.')
+    parser.add_argument('results', nargs='+', help='results files or glob patterns, for example "Data/*/*_results/results.csv"')
+    parser.add_argument('--output', default='plots')
+    parser.add_argument('--measures', nargs='+', default=meas.MEASURES)
+    parser.add_argument('--group-by', nargs='+', default=['run_id'])
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args()
+    groupBy = args.group_by[0] if len(args.group_by) == 1 else args.group_by
+    for chartFileName in plot_results(load_results(args.results), args.output, args.measures, groupBy, args.dpi):
+        print(chartFileName)
@@ -0,0 +1,156 @@
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+# the tracer used by span(), None when the run is not traced
+ACTIVE = None
+
+class Tracer(object):
+    """
+    Tracer - records a span for every phase of every iteration of a run (noise generation, violation detection,
+    graph build, each measure, solver build and solve, output) as JSON lines.
+
+    Every span records the phase, the iteration, the wall time and the cpu time of the phase, the peak resident
+    memory of the process so far and any count added by the traced code (pairs, components, variables...).
+    With trackMemory, the peak of the memory allocated by Python during the phase is recorded as well (this
+    slows the run down). The phases listed in profilePhases are also run under cProfile, and their profiles are
+    written to profileDir as <phase>_<iteration>.prof.
+
+    Parameters
+    ----------
+    traceFileName : string
+        the path of the JSON lines file, the spans are appended to it
+    profilePhases : list of strings
+        the phases to profile
+    profileDir : string
+        the directory of the profiles (the directory of the trace file by default)
+    trackMemory : bool
+        true to record the peak memory allocated during every phase
+    context :
+        values added to every span, for example the name of the database
+    """
+
+    def __init__(self, traceFileName, profilePhases=(), profileDir=None, trackMemory=False, **context):
+        self.traceFile = open(traceFileName, 'a')
+        self.profilePhases = set(profilePhases)
+        self.profileDir = profileDir if profileDir is not None else os.path.dirname(os.path.abspath(traceFileName))
+        self.trackMemory = trackMemory
+        self.context = context
+        # the iteration and its times are kept per thread, for the stages of a pipelined run
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.totals = defaultdict(lambda: {'count': 0, 'wall': 0.0, 'cpu': 0.0})
+        if trackMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def span(self, phase, **counts):
+        """
+        span - a context manager that records a span of the given phase for the current iteration.
+        The context manager yields the record of the span, so the traced code can add counts to it.
+        """
+        record = dict(self.context)
+        record.update({'phase': phase, 'iteration': self.iteration})
+        record.update(counts)
+        profiler = cProfile.Profile() if phase in self.profilePhases else None
+        if self.trackMemory:
+            tracemalloc.reset_peak()
+        record['start'] = time.time()
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profileDir, phase + '_' + str(self.iteration) + '.prof'))
+            record['wall'] = time.perf_counter() - wallStart
+            record['cpu'] = time.process_time() - cpuStart
+            record['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if self.trackMemory:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            self.iterationTimes[phase] = self.iterationTimes.get(phase, 0.0) + record['wall']
+            with self.lock:
+                self.traceFile.write(json.dumps(record, default=_to_json) + '\n')
+                totals = self.totals[phase]
+                totals['count'] += 1
+                totals['wall'] += record['wall']
+                totals['cpu'] += record['cpu']
+
+    @property
+    def iteration(self):
+        return getattr(self.local, 'iteration', None)
+
+    @iteration.setter
+    def iteration(self, iteration):
+        self.local.iteration = iteration
+
+    @property
+    def iterationTimes(self):
+        if not hasattr(self.local, 'iterationTimes'):
+            self.local.iterationTimes = {}
+        return self.local.iterationTimes
+
+    @iterationTimes.setter
+    def iterationTimes(self, iterationTimes):
+        self.local.iterationTimes = iterationTimes
+
+    def summary(self):
+        """
+        summary - the number of spans and the average wall and cpu times of every phase.
+
+        Returns
+        -------
+        dictionary from a phase to a dictionary with the keys count, wall and cpu
+        """
+        return dict((phase, {'count': t['count'], 'wall': t['wall'] / t['count'], 'cpu': t['cpu'] / t['count']}) for phase, t in self.totals.items())
+
+    def close(self):
+        self.traceFile.close()
+
+def _to_json(value):
+    # numpy scalars and other values that json does not know
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def activate(tracer):
+    """
+    activate - makes the tracer the one used by span(), None to stop tracing.
+    """
+    global ACTIVE
+    ACTIVE = tracer
+    return tracer
+
+def span(phase, **counts):
+    """
+    span - a span of the given phase in the active tracer, or a context manager that records nothing when no
+    tracer is active. Either way the context manager yields a dictionary the traced code can add counts to.
+    """
+    if ACTIVE is None:
+        return contextlib.nullcontext({})
+    return ACTIVE.span(phase, **counts)
+
+def set_iteration(iteration):
+    """
+    set_iteration - sets the iteration recorded by the following spans of the active tracer in this thread.
+    """
+    if ACTIVE is not None:
+        ACTIVE.iteration = iteration
+        ACTIVE.iterationTimes = {}
+
+def iteration_times():
+    """
+    iteration_times - the wall time of every phase traced since the last set_iteration, in seconds.
+    """
+    if ACTIVE is None:
+        return {}
+    return dict(ACTIVE.iterationTimes)
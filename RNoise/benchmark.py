@@ -0,0 +1,190 @@
+import pandas as pd
+import numpy as numpy
+import argparse
+import json
+import platform
+import tempfile
+import time
+import measurments as meas
+
+# the measures that are timed by default, I_MC needs the parallel_enum build and is only timed on request
+DEFAULT_MEASURES = ["I_D", "I_MI", "I_P", "I_R", "I_lin_R"]
+
+def generate_database(rows, cardinality=100, fdDcs=1, orderDcs=0, singleDcs=0, violationRate=0.01, seed=0):
+    """
+    generate_database - generates a synthetic database together with denial constraints, for benchmarks.
+
+    - Every FD-like constraint not(t1.K=t2.K&t1.V!=t2.V) gets a key column K with `cardinality` distinct values
+      and a column V that is a function of K.
+    - Every order constraint not(t1.G=t2.G&t1.S<t2.S&t1.E>t2.E) gets a group column G with `cardinality`
+      distinct values and columns S and E, where E increases with S.
+    - Every single-tuple constraint not(t1.L>t1.H) gets columns L and H, where L is at most H.
+    A fraction violationRate of the tuples is then corrupted for every constraint (V, E or L is replaced by a
+    random value), which controls the density of the violations.
+
+    Parameters
+    ----------
+    rows : int
+        the number of tuples
+    cardinality : int
+        the number of distinct values of the key and group columns
+    fdDcs, orderDcs, singleDcs : int
+        the number of constraints of each type
+    violationRate : float
+        the fraction of the tuples corrupted for every constraint
+    seed : int
+        the seed of the random generator
+
+    Returns
+    -------
+    list of a dataframe and a list of strings:
+        the database frame and the constraints, in the format of dcs.txt
+    """
+    rng = numpy.random.default_rng(seed)
+    columns = {}
+    constraints = []
+
+    for k in range(fdDcs):
+        key = rng.integers(0, cardinality, rows)
+        value = key * 7 + 3
+        noisy = rng.random(rows) < violationRate
+        value[noisy] = rng.integers(0, cardinality * 7, noisy.sum())
+        columns['K' + str(k)] = key
+        columns['V' + str(k)] = value
+        constraints.append('not(t1.K' + str(k) + '=t2.K' + str(k) + '&t1.V' + str(k) + '!=t2.V' + str(k) + ')')
+
+    for k in range(orderDcs):
+        group = rng.integers(0, cardinality, rows)
+        start = rng.random(rows) * 1000.0
+        end = start * 2.0 + 1.0
+        noisy = rng.random(rows) < violationRate
+        end[noisy] = rng.random(noisy.sum()) * 3000.0
+        columns['G' + str(k)] = group
+        columns['S' + str(k)] = start
+        columns['E' + str(k)] = end
+        constraints.append('not(t1.G' + str(k) + '=t2.G' + str(k) + '&t1.S' + str(k) + '<t2.S' + str(k) + '&t1.E' + str(k) + '>t2.E' + str(k) + ')')
+
+    for k in range(singleDcs):
+        low = rng.integers(0, 1000, rows)
+        high = low + rng.integers(0, 1000, rows)
+        noisy = rng.random(rows) < violationRate
+        low[noisy] = high[noisy] + 1
+        columns['L' + str(k)] = low
+        columns['H' + str(k)] = high
+        constraints.append('not(t1.L' + str(k) + '>t1.H' + str(k) + ')')
+
+    return pd.DataFrame(columns), constraints
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    cpuStart = time.process_time()
+    result = function(*args)
+    return result, time.perf_counter() - start, time.process_time() - cpuStart
+
+def run_benchmark(rows, cardinality=100, fdDcs=1, orderDcs=0, singleDcs=0, violationRate=0.01, detectionModes=('sql',), measures=DEFAULT_MEASURES, seed=0):
+    """
+    run_benchmark - times build_dynamic_queries, constraints_check and every selected measure on a synthetic
+    database generated by generate_database.
+
+    Parameters
+    ----------
+    rows, cardinality, fdDcs, orderDcs, singleDcs, violationRate, seed :
+        the parameters of generate_database
+    detectionModes : list of strings
+        the modes of constraints_check to time ('sql', 'blocked', 'parallel', 'partitioned' or 'count')
+    measures : list of strings
+        the measures to time, computed on the result of the first mode that returns the violating pairs
+
+    Returns
+    -------
+    list of dictionaries, one per timed function, with the configuration, the function name, the mode,
+    the wall and cpu times in seconds and the size of the result
+    """
+    df, constraints = generate_database(rows, cardinality, fdDcs, orderDcs, singleDcs, violationRate, seed)
+    config = {'rows': rows, 'cardinality': cardinality, 'fd_dcs': fdDcs, 'order_dcs': orderDcs, 'single_dcs': singleDcs, 'violation_rate': violationRate, 'seed': seed}
+    records = []
+
+    def record(function, mode, wall, cpu, size=None):
+        entry = dict(config)
+        entry.update({'function': function, 'mode': mode, 'wall': wall, 'cpu': cpu, 'size': size})
+        records.append(entry)
+
+    allConstraints, wall, cpu = _timed(meas.build_dynamic_queries, constraints, df)
+    record('build_dynamic_queries', None, wall, cpu)
+
+    sdfc = None
+    workDir = tempfile.mkdtemp(prefix='benchmark_')
+    for mode in detectionModes:
+        result, wall, cpu = _timed(meas.constraints_check, df, constraints, allConstraints[2], allConstraints[0], allConstraints[1], mode, 1<<30, workDir)
+        record('constraints_check', mode, wall, cpu, len(result[0]))
+        if sdfc is None and mode != 'count':
+            sdfc = result
+
+    if sdfc is None:
+        return records
+    if "I_D" in measures:
+        value, wall, cpu = _timed(meas.first_measurer_I_D, sdfc[0])
+        record('first_measurer_I_D', None, wall, cpu, value)
+        value, wall, cpu = _timed(meas.first_measurer_I_D_lazy, df, constraints)
+        record('first_measurer_I_D_lazy', None, wall, cpu, value)
+    if "I_MI" in measures:
+        value, wall, cpu = _timed(meas.second_measurer_I_MI, sdfc[0])
+        record('second_measurer_I_MI', None, wall, cpu, value)
+    if "I_P" in measures:
+        value, wall, cpu = _timed(meas.third_measurer_I_P, sdfc[1])
+        record('third_measurer_I_P', None, wall, cpu, value)
+    if "I_R" in measures:
+        value, wall, cpu = _timed(meas.fourth_measurer_I_R, sdfc[0])
+        record('fourth_measurer_I_R', None, wall, cpu, value[0])
+    if "I_lin_R" in measures:
+        value, wall, cpu = _timed(meas.fifth_measurer_I_lin_R, sdfc[0])
+        record('fifth_measurer_I_lin_R', None, wall, cpu, value[0])
+    if "I_MC" in measures:
+        value, wall, cpu = _timed(meas.sixth_measurer_I_MC, workDir, sdfc[0], len(df.index))
+        record('sixth_measurer_I_MC', None, wall, cpu, value[0])
+    return records
+
+def run_suite(scales, outputFileName, **kwargs):
+    """
+    run_suite - runs run_benchmark for every number of tuples in scales and appends the results to a JSON lines
+    file, one record per timed function, tagged with the host and the time of the run.
+
+    Parameters
+    ----------
+    scales : list of int
+        the numbers of tuples
+    outputFileName : string
+        the path of the JSON lines file
+    kwargs :
+        the other parameters of run_benchmark
+
+    Returns
+    -------
+    list of dictionaries, all the records of the suite
+    """
+    runTag = {'host': platform.node(), 'python': platform.python_version(), 'started': time.time()}
+    allRecords = []
+    with open(outputFileName, 'a') as f:
+        for rows in scales:
+            for entry in run_benchmark(rows, **kwargs):
+                entry.update(runTag)
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                allRecords.append(entry)
+                print(entry['function'], entry['mode'] or '', rows, round(entry['wall'], 4))
+    return allRecords
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the violation detection and the inconsistency measures.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--cardinality', type=int, default=100)
+    parser.add_argument('--fd', type=int, default=1, help='number of FD-like constraints')
+    parser.add_argument('--order', type=int, default=0, help='number of order constraints')
+    parser.add_argument('--single', type=int, default=0, help='number of single-tuple constraints')
+    parser.add_argument('--violation-rate', type=float, default=0.01)
+    parser.add_argument('--modes', nargs='+', default=['sql', 'blocked'])
+    parser.add_argument('--measures', nargs='+', default=DEFAULT_MEASURES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.jsonl')
+    args = parser.parse_args()
+    run_suite(args.rows, args.output, cardinality=args.cardinality, fdDcs=args.fd, orderDcs=args.order, singleDcs=args.single, violationRate=args.violation_rate, detectionModes=args.modes, measures=args.measures, seed=args.seed)
@@ -0,0 +1,127 @@
+import pandas as pd
+import numpy as numpy
+import datetime
+import json
+import os
+import pickle
+import random
+
+CHECKPOINT_FILE_NAME = 'checkpoint.pkl'
+MUTATIONS_FILE_NAME = 'mutations.jsonl'
+
+def _to_json(value):
+    # numpy scalars and dates
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+class MutationLog(object):
+    """
+    MutationLog - an append-only log of the changes made to the database during a noise simulation, one JSON
+    line [row, column, value] per change. Together with the clean database, the log is enough to rebuild the
+    changed database, so a checkpoint only has to write the changes made since the previous checkpoint.
+
+    Parameters
+    ----------
+    fileName : string
+        the path of the log, changes are appended to an existing log
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.lines = []
+
+    def append(self, row, column, value):
+        """
+        append - records that the cell (row, column) of the database was set to value, row is the index label.
+        """
+        self.lines.append(json.dumps([int(row), column, value], default=_to_json))
+
+    def flush(self):
+        """
+        flush - writes the buffered changes to the log.
+
+        Returns
+        -------
+        int, the size of the log in bytes, the offset to replay up to
+        """
+        with open(self.fileName, 'a') as f:
+            if self.lines:
+                f.write('\n'.join(self.lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        self.lines = []
+        return offset
+
+def replay_mutations(df, logFileName, offset):
+    """
+    replay_mutations - applies the first offset bytes of a mutation log to the database, in place.
+    Changes written after the offset (after the last checkpoint) are removed from the log. Only the last value
+    of every cell is applied, the same way the noise algorithm applied it.
+
+    Parameters
+    ----------
+    df : dataframe
+        the clean database frame
+    logFileName : string
+        the path of the log
+    offset : int
+        the size of the log at the checkpoint
+
+    Returns
+    -------
+    int, the number of replayed changes
+    """
+    if not os.path.exists(logFileName):
+        return 0
+    with open(logFileName, 'r+') as f:
+        f.truncate(offset)
+        lines = f.read(offset).splitlines()
+    if not lines:
+        return 0
+    changes = pd.DataFrame([json.loads(line) for line in lines], columns=['row', 'column', 'value'])
+    lastChanges = changes.drop_duplicates(['row', 'column'], keep='last')
+    for column, cells in lastChanges.groupby('column'):
+        for row, value in zip(cells['row'].tolist(), cells['value'].tolist()):
+            df.at[row, column] = value
+    return len(changes)
+
+def save_checkpoint(directory, state):
+    """
+    save_checkpoint - writes the state of a run and of the random generators (random and numpy.random).
+    The previous checkpoint is replaced atomically, so an interrupted write leaves it intact.
+
+    Parameters
+    ----------
+    directory : string
+        the results directory of the run
+    state : dictionary
+        the progress of the run (iteration, offset of the mutation log...), any picklable values
+    """
+    state = dict(state)
+    state['random'] = random.getstate()
+    state['numpy'] = numpy.random.get_state()
+    checkpointFileName = os.path.join(directory, CHECKPOINT_FILE_NAME)
+    tmpFileName = checkpointFileName + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpFileName, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpFileName, checkpointFileName)
+
+def load_checkpoint(directory):
+    """
+    load_checkpoint - reads the checkpoint written by save_checkpoint and restores the random generators.
+
+    Returns
+    -------
+    dictionary, the state of the run
+    """
+    with open(os.path.join(directory, CHECKPOINT_FILE_NAME), 'rb') as f:
+        state = pickle.load(f)
+    random.setstate(state.pop('random'))
+    numpy.random.set_state(state.pop('numpy'))
+    return state
@@ -0,0 +1,220 @@
+import numpy as numpy
+import detection as det
+
+# the orders between two values that satisfy each comparison operator (-1 smaller, 0 equal, 1 greater)
+RELATIONS = {'<': {-1}, '<=': {-1, 0}, '=': {0}, '!=': {-1, 1}, '>': {1}, '>=': {0, 1}}
+
+def _interval(op, value):
+    # the values x such that x op value, as (low, lowClosed, high, highClosed), None for '!='
+    return {'<': (None, False, value, False), '<=': (None, False, value, True), '=': (value, True, value, True),
+            '>': (value, False, None, False), '>=': (value, True, None, False)}.get(op)
+
+def _contains(interval, inner):
+    # true if the interval contains the interval inner
+    low, lowClosed, high, highClosed = interval
+    innerLow, innerLowClosed, innerHigh, innerHighClosed = inner
+    if low is not None:
+        if innerLow is None or innerLow < low or (innerLow == low and innerLowClosed and not lowClosed):
+            return False
+    if high is not None:
+        if innerHigh is None or innerHigh > high or (innerHigh == high and innerHighClosed and not highClosed):
+            return False
+    return True
+
+def _is_tautology(predicate):
+    left, op, right, value = predicate
+    return left == right and 0 in RELATIONS[op]
+
+def _implies(strong, weak):
+    # true if every pair of tuples that satisfies the condition strong satisfies the condition weak
+    if _is_tautology(weak) or strong == weak:
+        return True
+    (left, op, right, value), (weakLeft, weakOp, weakRight, weakValue) = strong, weak
+    if left != weakLeft or right != weakRight:
+        return False
+    if right is not None:
+        return RELATIONS[op] <= RELATIONS[weakOp]
+    try:
+        if op == '!=':
+            return weakOp == '!=' and value == weakValue
+        interval = _interval(op, value)
+        if weakOp == '!=':
+            return not _contains(interval, (weakValue, True, weakValue, True))
+        return _contains(_interval(weakOp, weakValue), interval)
+    except TypeError:
+        # a string compared with a number
+        return False
+
+def constraint_implies(general, specific):
+    """
+    constraint_implies - true if every violation of the constraint specific is a violation of the constraint
+    general, so that specific can be dropped from the detection when general is checked. This is the case when
+    every condition of general follows from a condition of specific, with the tuples of general in either order
+    (the violating pairs are unordered). The rule is sound but not complete.
+
+    Parameters
+    ----------
+    general, specific : strings
+        constraints from the dcs file
+
+    Returns
+    -------
+    bool
+    """
+    if ("t2" in general) != ("t2" in specific):
+        return False
+    specificPredicates = det.normalize_predicates(det.parse_constraint(specific))
+    for swap in (False, True):
+        generalPredicates = det.normalize_predicates(det.parse_constraint(general), swap)
+        if all(any(_implies(p, q) for p in specificPredicates) for q in generalPredicates):
+            return True
+    return False
+
+def is_unsatisfiable(con):
+    """
+    is_unsatisfiable - true if no tuple or pair of tuples can violate the constraint, because two of its
+    conditions contradict each other (for example t1.A<t2.A&t1.A>=t2.A, or t1.A>5&t1.A<3), or a condition
+    compares a value with itself (t1.A!=t1.A).
+
+    Parameters
+    ----------
+    con : string
+        a constraint from the dcs file
+
+    Returns
+    -------
+    bool
+    """
+    relations = {}
+    intervals = {}
+    excluded = {}
+    for left, op, right, value in det.normalize_predicates(det.parse_constraint(con)):
+        if right is not None:
+            relations[(left, right)] = relations.get((left, right), {-1, 0, 1}) & RELATIONS[op]
+            if not relations[(left, right)] or (left == right and 0 not in RELATIONS[op]):
+                return True
+        elif op == '!=':
+            excluded.setdefault(left, []).append(value)
+        else:
+            intervals.setdefault(left, []).append(_interval(op, value))
+    try:
+        for left, bounds in intervals.items():
+            low, lowClosed, high, highClosed = None, False, None, False
+            for boundLow, boundLowClosed, boundHigh, boundHighClosed in bounds:
+                if boundLow is not None and (low is None or boundLow > low or (boundLow == low and not boundLowClosed)):
+                    low, lowClosed = boundLow, boundLowClosed
+                if boundHigh is not None and (high is None or boundHigh < high or (boundHigh == high and not boundHighClosed)):
+                    high, highClosed = boundHigh, boundHighClosed
+            if low is not None and high is not None:
+                if low > high or (low == high and not (lowClosed and highClosed)):
+                    return True
+                if low == high and low in excluded.get(left, []):
+                    return True
+    except TypeError:
+        return False
+    return False
+
+def reduce_constraints(constraintSets):
+    """
+    reduce_constraints - removes from the detection the constraints that can never be violated and the
+    constraints implied by others (see constraint_implies). The violating pairs of the remaining constraints are
+    the same as the violating pairs of all the constraints, and every removed query saves a self-join of the
+    database. Of two equivalent constraints the first is kept. When no constraint can be violated, the first one
+    is kept so that the queries can still be built.
+
+    Parameters
+    ----------
+    constraintSets : list of strings
+        the constraints from the dcs file
+
+    Returns
+    -------
+    list of two values:
+        the constraints to check, in their original order
+        a dictionary from every removed constraint to the constraint that implies it, or None if it can never
+        be violated
+    """
+    constraintSets = list(dict.fromkeys(constraintSets))
+    removed = dict((con, None) for con in constraintSets if is_unsatisfiable(con))
+    candidates = [con for con in constraintSets if con not in removed]
+    for k, con in enumerate(candidates):
+        for j, other in enumerate(candidates):
+            if j != k and constraint_implies(other, con) and (j < k or not constraint_implies(con, other)):
+                removed[con] = other
+                break
+    # a constraint may have been removed in favour of a constraint that was removed as well
+    for con in removed:
+        while removed[con] in removed:
+            removed[con] = removed[removed[con]]
+    kept = [con for con in constraintSets if con not in removed]
+    if not kept and constraintSets:
+        kept = [constraintSets[0]]
+        del removed[constraintSets[0]]
+    return kept, removed
+
+def _derived_mask(df, con, pairs):
+    # the mask of the pairs that violate con, among the pairs that violate the constraint that implies it
+    compiled = det.compile_constraints([con], df)
+    dc = compiled['dcs'][0]
+    predicates = dc['predicates'] + [('t1', fieldA, '=', 't2', fieldB) for fieldA, fieldB in dc['keys']]
+    I, J = pairs[:,0] - 1, pairs[:,1] - 1
+    mask = compiled['valid'][I] & compiled['valid'][J]
+    if dc['single']:
+        mask &= det.evaluate_predicates(predicates, compiled['columns'], I, J)
+    else:
+        mask &= det.evaluate_predicates(predicates, compiled['columns'], I, J) | det.evaluate_predicates(predicates, compiled['columns'], J, I)
+    return mask
+
+def derived_pairs(df, con, pairs):
+    """
+    derived_pairs - the violating pairs of a removed constraint, from the violating pairs of the constraint that
+    implies it (see reduce_constraints), without checking the database again.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    con : string
+        the removed constraint
+    pairs : (n,2) array of int
+        the ids of the pairs of tuples that violate the constraint that implies con
+
+    Returns
+    -------
+    (k,2) array of int, the pairs that violate con
+    """
+    pairs = numpy.asarray(pairs, dtype=numpy.int64).reshape(-1, 2)
+    return pairs[_derived_mask(df, con, pairs)]
+
+def derived_attribution(df, attribution, removed):
+    """
+    derived_attribution - adds the constraints removed by reduce_constraints to the attribution of the
+    violating pairs of the constraints that were checked (see detection.Attribution). The bits of a removed
+    constraint are set on the pairs of the constraint that implies it that violate the removed constraint as
+    well, and never set for a constraint that can never be violated.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    attribution : detection.Attribution
+        the attribution of the checked constraints
+    removed : dictionary
+        the removed constraints, as returned by reduce_constraints
+
+    Returns
+    -------
+    detection.Attribution of the checked constraints followed by the removed ones
+    """
+    constraints = attribution.constraints + [con for con in removed if con not in attribution.constraints]
+    masks = numpy.zeros((len(attribution), det.mask_bytes(len(constraints))), dtype=numpy.uint8)
+    masks[:, :attribution.masks.shape[1]] = attribution.masks
+    for index in range(len(attribution.constraints), len(constraints)):
+        con = constraints[index]
+        if removed[con] is None:
+            continue
+        implier = attribution.violates(removed[con])
+        violated = numpy.zeros(len(attribution), dtype=bool)
+        violated[implier] = _derived_mask(df, con, attribution.pairs[implier])
+        masks[violated, index // 8] |= numpy.uint8(1 << (index % 8))
+    return det.Attribution(constraints, attribution.pairs, masks)
@@ -0,0 +1,203 @@
+import numpy as numpy
+import math
+from statistics import NormalDist
+import detection as det
+
+# the minimal number of tuples sampled for the estimation of I_P
+MIN_TUPLES = 100
+
+def _z_value(confidence):
+    return NormalDist().inv_cdf((1.0 + confidence) / 2.0)
+
+def _group_blocks(leftIdx, leftCodes, rightIdx, rightCodes):
+    # the blocks of candidate pairs of a group, in the layout used by detection.block_pairs
+    lo = numpy.argsort(leftCodes, kind='stable')
+    ro = numpy.argsort(rightCodes, kind='stable')
+    lu, ls, ln = numpy.unique(leftCodes[lo], return_index=True, return_counts=True)
+    ru, rs, rn = numpy.unique(rightCodes[ro], return_index=True, return_counts=True)
+    common, a, b = numpy.intersect1d(lu, ru, assume_unique=True, return_indices=True)
+    return {'left': leftIdx[lo], 'right': rightIdx[ro], 'ls': ls[a], 'ln': ln[a], 'rs': rs[b], 'rn': rn[b], 'sizes': (ln[a] * rn[b]).astype(numpy.int64)}
+
+def _violates(group, columns, positions, I, J):
+    # true for the pairs (I,J) of indices into positions that violate a constraint of the group with I as t1
+    mask = numpy.zeros(len(I), dtype=bool)
+    for dc in group['dcs']:
+        mask |= det.evaluate_predicates(dc['predicates'], columns, positions[I], positions[J])
+    return mask & (I != J)
+
+def _multiplicity(groups, columns, positions, I, J):
+    # the number of (group, orientation) combinations in which each unordered pair {I,J} is found violating
+    mult = numpy.zeros(len(I), dtype=numpy.int64)
+    for group in groups:
+        for A, B in ((I, J), (J, I)):
+            candidate = group['leftCodes'][A] == group['rightCodes'][B]
+            mult[candidate] += _violates(group, columns, positions, A[candidate], B[candidate])
+    return mult
+
+def estimate_I_MI(plan, groups, sampleBudget, confidence, rng, foundEdges):
+    """
+    estimate_I_MI - an unbiased estimate of the number of violating pairs, with a confidence interval.
+    Every group of constraints (see detection.group_constraints) defines a space of candidate pairs, the pairs
+    (i,j) whose values agree on the equality conditions of the group. The budget is split between the groups in
+    proportion to the sizes of their spaces (stratified sampling), and within a group a block is chosen with a
+    probability proportional to its number of pairs, so the pairs are sampled uniformly from the space.
+    A sampled pair that violates a constraint of its group counts 1/m, where m is the number of groups and
+    orientations in which the same unordered pair is violating, so that pairs found by several constraints are
+    counted once (the Karp-Luby estimator of the size of a union).
+    Groups whose space fits in their share of the budget are enumerated and contribute an exact count.
+    """
+    columns = plan['columns']
+    positions = plan['positions']
+    spaces = numpy.array([group['blocks']['sizes'].sum() for group in groups], dtype=numpy.float64)
+    total = spaces.sum()
+    estimate, variance = 0.0, 0.0
+    for group, space in zip(groups, spaces):
+        if space == 0:
+            continue
+        share = max(1, int(round(sampleBudget * space / total)))
+        blocks = group['blocks']
+        if space <= share:
+            # the whole space is checked
+            for I, J in det.block_pairs(group['leftIdx'], group['leftCodes'], group['rightIdx'], group['rightCodes'], max(share, 1)):
+                violating = _violates(group, columns, positions, I, J)
+                I, J = I[violating], J[violating]
+                estimate += (1.0 / _multiplicity(groups, columns, positions, I, J)).sum()
+                foundEdges.append((I, J))
+            continue
+        b = numpy.searchsorted(numpy.cumsum(blocks['sizes']), rng.integers(0, int(space), share), side='right')
+        I = blocks['left'][blocks['ls'][b] + rng.integers(0, blocks['ln'][b])]
+        J = blocks['right'][blocks['rs'][b] + rng.integers(0, blocks['rn'][b])]
+        violating = _violates(group, columns, positions, I, J)
+        x = numpy.zeros(share)
+        x[violating] = 1.0 / _multiplicity(groups, columns, positions, I[violating], J[violating])
+        foundEdges.append((I[violating], J[violating]))
+        estimate += space * x.mean()
+        variance += space * space * x.var(ddof=1) / share if share > 1 else 0.0
+    half = _z_value(confidence) * math.sqrt(variance)
+    return estimate, max(0.0, estimate - half), estimate + half
+
+def estimate_I_P(plan, groups, singleMask, sampleBudget, confidence, rng, foundEdges):
+    """
+    estimate_I_P - an unbiased estimate of the number of tuples that participate in a violation, with a
+    confidence interval. Tuples are sampled without replacement and each sampled tuple is checked against its
+    blocks in every group, as t1 and as t2. The number of sampled tuples is chosen so that the number of checked
+    pairs is about sampleBudget (and at least MIN_TUPLES tuples).
+    """
+    columns = plan['columns']
+    positions = plan['positions']
+    n = len(positions)
+    if n == 0:
+        return 0.0, 0.0, 0.0
+    checksPerTuple = 2.0 * sum(group['blocks']['sizes'].sum() for group in groups) / n
+    samples = int(min(n, max(MIN_TUPLES, sampleBudget / max(1.0, checksPerTuple))))
+    sampled = rng.choice(n, samples, replace=False)
+
+    participates = singleMask[sampled].copy()
+    for group in groups:
+        rightOrder = numpy.argsort(group['rightCodes'], kind='stable')
+        leftOrder = numpy.argsort(group['leftCodes'], kind='stable')
+        rightSorted = group['rightCodes'][rightOrder]
+        leftSorted = group['leftCodes'][leftOrder]
+        for k, t in enumerate(sampled):
+            # t as t1, then t as t2
+            J = rightOrder[numpy.searchsorted(rightSorted, group['leftCodes'][t], 'left'):numpy.searchsorted(rightSorted, group['leftCodes'][t], 'right')]
+            violating = _violates(group, columns, positions, numpy.full(len(J), t), J)
+            I = leftOrder[numpy.searchsorted(leftSorted, group['rightCodes'][t], 'left'):numpy.searchsorted(leftSorted, group['rightCodes'][t], 'right')]
+            violatingAsT2 = _violates(group, columns, positions, I, numpy.full(len(I), t))
+            if violating.any() or violatingAsT2.any():
+                participates[k] = True
+                foundEdges.append((numpy.full(int(violating.sum()), t), J[violating]))
+                foundEdges.append((I[violatingAsT2], numpy.full(int(violatingAsT2.sum()), t)))
+
+    p = participates.mean()
+    estimate = n * p
+    if samples >= n:
+        return estimate, estimate, estimate
+    half = _z_value(confidence) * n * math.sqrt(p * (1 - p) / samples * (n - samples) / float(n - 1))
+    return estimate, max(0.0, estimate - half), min(float(n), estimate + half)
+
+def _greedy_matching(I, J, excluded):
+    # a maximal matching of the edges (I,J) that do not touch the excluded vertices, and its vertices
+    matched = set(excluded)
+    size = 0
+    for i, j in zip(I.tolist(), J.tolist()):
+        if i != j and i not in matched and j not in matched:
+            matched.add(i)
+            matched.add(j)
+            size += 1
+    return size, matched
+
+def estimate_measures(df, constraintSets, sampleBudget=10000, confidence=0.95, seed=None):
+    """
+    estimate_measures - estimates the measures I_MI, I_P and I_R from samples of pairs and tuples, for databases
+    where the exact enumeration of the violations (constraints_check) is too expensive.
+
+    - I_MI is estimated by estimate_I_MI, sampling candidate pairs stratified by the groups of constraints
+      and by their equality blocks. The estimate is unbiased.
+    - I_P is estimated by estimate_I_P, sampling tuples. The estimate is unbiased.
+    - I_R is bounded: every violating pair found while sampling is an edge of the conflict graph, so a matching
+      of these edges, plus the tuples that violate a constraint on their own, is a lower bound of I_R. The upper
+      end of the interval of I_P is an upper bound, since removing all the problematic tuples repairs the
+      database. The point estimate scales the estimate of I_P by the ratio between the matching-based cover and
+      the vertices of the sampled conflict graph, clipped to the bounds.
+
+    The tuples that violate a constraint on their own (the pairs (i,i)) are found exactly, in one pass.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    sampleBudget : int
+        the number of candidate pairs sampled for I_MI, and the approximate number of pairs checked for I_P
+    confidence : float
+        the confidence level of the intervals
+    seed : int
+        the seed of the random generator
+
+    Returns
+    -------
+    dictionary from I_MI, I_P and I_R to tuples (estimate, low, high)
+    """
+    rng = numpy.random.default_rng(seed)
+    plan = det.compile_constraints(constraintSets, df)
+    columns = plan['columns']
+    positions = numpy.flatnonzero(plan['valid'])
+    plan['positions'] = positions
+    local = numpy.arange(len(positions))
+
+    singleMask = numpy.zeros(len(positions), dtype=bool)
+    groups = []
+    for group in plan['groups']:
+        if group['single']:
+            for dc in group['dcs']:
+                singleMask |= det.evaluate_predicates(dc['predicates'], columns, positions, positions)
+            continue
+        group = dict(group)
+        group['leftCodes'], group['rightCodes'] = det.key_codes(columns, group['keys'], positions)
+        group['leftIdx'] = group['rightIdx'] = local
+        group['blocks'] = _group_blocks(local, group['leftCodes'], local, group['rightCodes'])
+        groups.append(group)
+    forced = int(singleMask.sum())
+
+    foundEdges = []
+    miEstimate, miLow, miHigh = estimate_I_MI(plan, groups, sampleBudget, confidence, rng, foundEdges)
+    pEstimate, pLow, pHigh = estimate_I_P(plan, groups, singleMask, sampleBudget, confidence, rng, foundEdges)
+
+    I = numpy.concatenate([e[0] for e in foundEdges]) if foundEdges else numpy.empty(0, dtype=numpy.int64)
+    J = numpy.concatenate([e[1] for e in foundEdges]) if foundEdges else numpy.empty(0, dtype=numpy.int64)
+    forcedVertices = numpy.flatnonzero(singleMask)
+    matching, matched = _greedy_matching(I, J, forcedVertices.tolist())
+    sampledVertices = len(set(I.tolist()) | set(J.tolist()) - set(forcedVertices.tolist()))
+    # every violating pair found while sampling is a certain lower bound of I_MI
+    distinctFound = len(numpy.unique(numpy.minimum(I, J) * max(1, len(positions)) + numpy.maximum(I, J)))
+    miLow = max(miLow, float(distinctFound))
+    low = forced + matching
+    high = max(float(low), pHigh)
+    ratio = (2.0 * matching) / sampledVertices if sampledVertices else 0.0
+    rEstimate = min(high, max(float(low), forced + max(0.0, pEstimate - forced) * min(1.0, ratio)))
+
+    return {'I_MI': (float(miEstimate + forced), float(miLow + forced), float(miHigh + forced)),
+            'I_P': (float(pEstimate), float(pLow), float(pHigh)),
+            'I_R': (float(rEstimate), float(low), float(high))}
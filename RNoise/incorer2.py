@@ -10,13 +10,22 @@ import os
 from subprocess import PIPE, run
 import pandasql as psql
 import time
-import matplotlib.pyplot as plt
 import subprocess
+import tempfile
 import datetime
 from datetime import date
 from collections import defaultdict
 from itertools import repeat
 import measurments as meas
+import dataloader as loader
+import tracing
+import results
+import checkpoint
+import baselinecache
+import measurememo
+import pipeline
+import dcimplication
+import liveindex
 
 def calculate_all_probs(df,colomnsInConstraints,beta):
     """
@@ -141,15 +150,16 @@ def rand_vio_algorithm(df,colomnsInConstraints,all_probs,typo_prob):
         
     Returns
     -------
-    Generates a new value to be assign into the database
+    list of the row, the column and the new value of the changed cell
     
     """
-    rand_cell_row = random.randint(0, df.shape[0])
+    # the rows are 1..n, so that rand_cell_row-1 is always a tuple of the database
+    rand_cell_row = random.randint(1, df.shape[0])
     rand_cell_col = random.choice(colomnsInConstraints)                  
     rand_cell_data = df.iloc[rand_cell_row-1][rand_cell_col]
     
     while(pd.isnull(df.iloc[rand_cell_row-1][rand_cell_col])) :
-        rand_cell_row = random.randint(0, df.shape[0])
+        rand_cell_row = random.randint(1, df.shape[0])
         rand_cell_col = random.choice(colomnsInConstraints)                  
         rand_cell_data = df.iloc[rand_cell_row-1][rand_cell_col]
     
@@ -160,8 +170,88 @@ def rand_vio_algorithm(df,colomnsInConstraints,all_probs,typo_prob):
         new_val = replace_value(df,rand_cell_col,all_probs)
         
     df.at[rand_cell_row-1,rand_cell_col] = new_val
+    return rand_cell_row-1, rand_cell_col, new_val
+
+def _new_results_directory(database_name):
+    # a new folder for the results of a run, parallel runs never share a folder
+    while True:
+        fullPath = 'Data/'+ database_name + '/' + str(time.time()) + '_results'
+        try:
+            os.makedirs(fullPath)
+            return fullPath
+        except FileExistsError:
+            continue
+
+def prepare_database(database_name, measuresToRun, detectionMode='sql', memoryBudget=1<<30, skews=(0,), workDir=None, baseline=True, useBaselineCache=True):
+    """
+    prepare_database - loads a database and computes everything the runs on it share: the constraints (without
+    the ones implied by others or never violated, see dcimplication.py), the dynamic queries, the columns that are part of a constraint, the value propabilities of every skew and the
+    measures of the clean database (the first stage of runTestRand).
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database
+    measuresToRun : dictionary
+        the measures computed by the runs, in the form of runTestRand
+    detectionMode, memoryBudget :
+        the parameters of constraints_check
+    skews : list of float
+        the skews of the runs, the propabilities of the values are computed once for every skew
+    workDir : string
+        the directory where the measures of the clean database are computed (a temporary directory by default)
+    baseline : bool
+        false to skip the measures of the clean database
+    useBaselineCache : bool
+        true to read the measures of the clean database from the on-disk cache when the same database,
+        constraints and measures were computed before (see baselinecache.py)
 
-def runTestRand(database_name, err_rate=0.01, skew=0, typo_prob=0.5, measuresToRun={"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}):
+    Returns
+    -------
+    dictionary with the keys database, df, constraints, removedConstraints (the result of
+    dcimplication.reduce_constraints), allConstraints, columns, probs (from a skew to the result
+    of calculate_all_probs), baseline (from a measure to its value on the clean database), baselinePairs (the
+    violating pairs of the clean database, or None), measuresToRun and detectionMode
+    """
+    # the csv file is parsed once into a binary cache, later runs memory-map the cache
+    df = loader.load_database(database_name)
+    allConstraintSets = loader.load_constraints(database_name)
+
+    # constraints implied by other constraints add no violating pairs, they are not checked
+    constraints, removedConstraints = dcimplication.reduce_constraints(allConstraintSets)
+    for con, other in removedConstraints.items():
+        print('Constraint ' + con + (' is implied by ' + other if other else ' can never be violated') + ', it is not checked')
+
+    # construct the dynamic queries which will be used for detecting violations in the database
+    allConstraints = meas.build_dynamic_queries(constraints,df)
+    
+    # calculate all propabilities
+    listToStr = ' '.join([str(elem) for elem in allConstraintSets])
+    colomnsInConstraints = meas.col_in_constraints(listToStr,df)
+    probs = dict((skew, calculate_all_probs(df,colomnsInConstraints,skew)) for skew in skews)
+
+    # in case only I_D and I_MI are computed, the violating pairs are counted instead of enumerated
+    if detectionMode != 'live' and not any(measuresToRun.get(m, False) for m in ("I_P", "I_R", "I_lin_R", "I_MC", "I_MC_log")):
+        detectionMode = 'count'
+
+    values, pairs = {}, None
+    if baseline:
+        if workDir is None:
+            workDir = tempfile.mkdtemp(prefix='baseline_')
+        # the violations of the clean database are detected once in the live mode as well
+        baselineMode = 'blocked' if detectionMode == 'live' else detectionMode
+        compute = lambda: meas.compute_measures(df, constraints, allConstraints, measuresToRun, workDir, baselineMode, memoryBudget, withPairs=True)
+        if useBaselineCache:
+            with tracing.span('baseline') as record:
+                values, pairs, record['cached'] = baselinecache.cached_baseline(database_name, measuresToRun, compute)
+        else:
+            values, pairs = compute()
+
+    return {'database': database_name, 'df': df, 'constraints': constraints, 'removedConstraints': removedConstraints, 'allConstraints': allConstraints,
+            'columns': colomnsInConstraints, 'probs': probs, 'baseline': values, 'baselinePairs': pairs,
+            'measuresToRun': dict(measuresToRun), 'detectionMode': detectionMode}
+
+def runTestRand(database_name, err_rate=0.01, skew=0, typo_prob=0.5, measuresToRun={"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}, detectionMode='sql', memoryBudget=1<<30, estimateCheckpoints=False, sampleBudget=10000, profilePhases=(), trackMemory=False, seed=None, resultsFormat='csv', batchSize=100, checkpointEvery=0, resumeFrom=None, prepared=None, useBaselineCache=True, memoizeMeasures=True, pipelined=False, measureWorkers=1, queueSize=4, snapshotWorkers=0):
     """
     runTest - the main function that computes the measures specified by the user on the given database
 
@@ -175,193 +265,202 @@ def runTestRand(database_name, err_rate=0.01, skew=0, typo_prob=0.5, measuresToR
         a dictionary in which the measures are the keys and true/false are the values.
         The function will compute the measures for which the value is true.
         measuresToRun shoud be in the form : {"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}
+        "I_MC_log":True adds the logarithm of I_MC, approximated in a bounded time where I_MC cannot be
+        enumerated (see mcapprox.py).
+    detectionMode : string
+        'sql' to find the violations with the dynamic queries, 'blocked' to check the constraints in shared
+        blocks of tuples, 'parallel' to check them on a pool of processes, or 'partitioned' for databases whose
+        violating pairs do not fit in memory (see constraints_check). 'live' updates the violating pairs and the
+        measures with every change instead of detecting the violations at the checkpoints (see liveindex.py),
+        the checkpoints are then never estimated.
+    memoryBudget : int
+        the number of bytes available for the violation detection in the 'blocked' and 'partitioned' modes.
+    estimateCheckpoints : bool
+        true to estimate I_MI, I_P and I_R from samples at the intermediate checkpoints (see estimators.py),
+        and to compute the exact measures only on the final snapshot. I_lin_R and I_MC are not estimated and
+        are recorded as nan at the intermediate checkpoints.
+    sampleBudget : int
+        the number of sampled pairs for the estimations.
+    profilePhases : list of strings
+        the phases of the trace to run under cProfile, for example ['detection', 'I_R.build'] (see tracing.py).
+    trackMemory : bool
+        true to record the peak memory allocated by every phase in the trace.
+    seed : int
+        the seed of the random changes, a random seed by default. The seed is recorded with the results.
+    resultsFormat : string
+        'csv' or 'parquet', the format of the results file (see results.py).
+    batchSize : int
+        the number of computed iterations written to the results file at once.
+    checkpointEvery : int
+        the number of iterations between checkpoints, 0 for no checkpoints. A checkpoint appends the changes
+        made since the previous checkpoint to mutations.jsonl and writes the iteration and the state of the
+        random generators to checkpoint.pkl (see checkpoint.py).
+    resumeFrom : string
+        the results directory of an interrupted run with checkpoints. The run continues from its last
+        checkpoint, with the parameters of the interrupted run, and appends to its results.
+    prepared : dictionary
+        the result of prepare_database for this database and these measures, shared by many runs (see sweep.py).
+        The run changes a copy of the prepared database.
+    useBaselineCache : bool
+        true to read the measures of the clean database from the on-disk cache (see baselinecache.py).
+    memoizeMeasures : bool
+        true to compute I_R, I_lin_R and I_MC per connected component of the conflict graph, reusing the values
+        of the components that did not change since the previous checkpoint (see measurememo.py).
+    pipelined : bool
+        true to compute the measures of a checkpoint in other threads while the simulation makes the changes of
+        the next checkpoints (see pipeline.py). Not supported together with checkpointEvery.
+    measureWorkers : int
+        the number of threads computing I_R, I_lin_R and I_MC in a pipelined run.
+    queueSize : int
+        the number of checkpoints a stage of a pipelined run may hold before the previous stage waits.
+    snapshotWorkers : int
+        the number of processes of a pipelined run that detect and measure whole checkpoints at once, each on a
+        snapshot of the database (see pipeline.SnapshotPool), 0 to detect the checkpoints one after the other in
+        a single thread.
 
     Returns
     -------
-    Generate a chart for each measure where the y axis is the value of the measure and the x axis is the 
-    iteration number. The charts will be saved under the folder containing the database.
+    string, the path of the results file. The file has a row for every computed iteration, with the
+    configuration, the seed, the value of every measure and the running time of every phase.
+    Charts of many runs are drawn afterwards by results.plot_results (or python results.py).
     
-    The files "Running_Time.txt" and "All_results.txt" contain the average running time of each maasure and
-    all the results of the execution, respectively.
+    The file "Running_Time.txt" contains the average running time of each phase and the file "trace.jsonl"
+    contains a span for every phase of every iteration (see tracing.py).
     
     """
     global df
+    if pipelined and checkpointEvery:
+        raise ValueError('checkpointEvery is not supported in a pipelined run')
+    if pipelined and detectionMode == 'live':
+        raise ValueError('the live detection mode is not supported in a pipelined run')
 
     # constracting paths for the results     
-    resultsDirectoryPath = '/' + str(time.time()) + '_results'
-    fullPath = 'Data/'+ database_name + resultsDirectoryPath
-    if (not os.path.exists(fullPath)):
-        os.makedirs(fullPath);
+    if resumeFrom is None:
+        fullPath = _new_results_directory(database_name)
+    else:
+        fullPath = resumeFrom.rstrip('/')
     runningTimesFileName = fullPath +'/Running_Time.txt'
-    allResultsFileName = fullPath +'/All_results.txt'
+    resultsFileName = fullPath + '/results.' + resultsFormat
 
     start = time.time()
-    
-    # load the csv file and generate a list of constraints
-    df = pd.read_csv('Data/'+ database_name + '/' + "inputDB.csv", keep_default_na=False, na_values=['-1.#IND', '1.#QNAN', '1.#IND', '-1.#QNAN', '#N/A N/A', '#N/A', 'N/A', 'n/a','', '#NA', 'NULL','null', 'NaN', '-NaN', 'nan', '-nan', ''] , header=0)
-    constraints_raw = open('Data/'+ database_name+'/dcs.txt', 'r')
-    constraints = [line.strip() for line in constraints_raw.readlines()]
-    constraints = [x.replace(' ', '_') for x in constraints] #in case the columns names include spaces
-
     pd.options.mode.chained_assignment = None 
-            
-    # in case the column names include spaces
-    allColumns = {}
-    for col in df.columns: 
-        allColumns[col] = col.replace(' ','_')
-    df = df.rename(columns=allColumns)
     
     # initializations
-    exes,measurments1,measurments2,measurments3,measurments4,measurments5,measurments6 = [],[],[],[],[],[],[]
-    sum2,sum3,sum4,sum5,sum6 = 0,0,0,0,0
-    
-    # construct the dynamic queries which will be used for detecting violations in the database
-    allConstraints = meas.build_dynamic_queries(constraints,df)
-    allColumns = allConstraints[2]  
+    if resumeFrom is None:
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        random.seed(seed)
+        numpy.random.seed(seed)
+        config = {'database': database_name, 'err_rate': err_rate, 'skew': skew, 'typo_prob': typo_prob, 'detection_mode': detectionMode, 'seed': seed}
+        writer = results.ResultsWriter(resultsFileName, config, batchSize)
+        firstIteration = 1
+    else:
+        # the interrupted run is continued with its own parameters and random generators
+        state = checkpoint.load_checkpoint(fullPath)
+        config = state['config']
+        err_rate, skew, typo_prob, detectionMode, seed = config['err_rate'], config['skew'], config['typo_prob'], config['detection_mode'], config['seed']
+        resultsFileName = state['resultsFileName']
+        writer = results.ResultsWriter(resultsFileName, config, batchSize, state['runId'])
+        writer.restore(state['iteration'])
+        firstIteration = state['iteration'] + 1
+    memo = measurememo.MeasureMemo() if memoizeMeasures else None
+    mutations = checkpoint.MutationLog(fullPath + '/' + checkpoint.MUTATIONS_FILE_NAME)
+    tracer = tracing.activate(tracing.Tracer(fullPath + '/trace.jsonl', profilePhases, trackMemory=trackMemory, database=database_name, run_id=writer.runId))
     
-    # calculate all propabilities
-    listToStr = ' '.join([str(elem) for elem in constraints])
-    colomnsInConstraints = meas.col_in_constraints(listToStr,df)
-    all_probs = calculate_all_probs(df,colomnsInConstraints,skew)
-    
-    # calculations for the first stage - the database should be consistent
-    exes.append(0)
-    sdfc = meas.constraints_check(df,constraints, allColumns, allConstraints[0], allConstraints[1])
-    if (measuresToRun["I_D"]):
-        measurments1.append(meas.first_measurer_I_D(sdfc[0]))
-    if (measuresToRun["I_MI"]):
-        measurments2.append(meas.second_measurer_I_MI(sdfc[0]))
-    if (measuresToRun["I_P"]):
-        measurments3.append(meas.third_measurer_I_P(sdfc[1]))
-    if (measuresToRun["I_R"]):    
-        measurments4.append(meas.fourth_measurer_I_R(sdfc[0])[0])
-    if (measuresToRun["I_lin_R"]): 
-        measurments5.append(meas.fifth_measurer_I_lin_R(sdfc[0])[0])
-    if (measuresToRun["I_MC"]):
-        measurments6.append(meas.sixth_measurer_I_MC(fullPath, sdfc[0])[0])
+    # load the database, the constraints and the queries, and compute the measures of the clean database
+    tracing.set_iteration(0)
+    if prepared is None:
+        prepared = prepare_database(database_name, measuresToRun, detectionMode, memoryBudget, [skew], fullPath, resumeFrom is None, useBaselineCache)
+        df = prepared['df']
+    else:
+        # the prepared database is shared with other runs
+        df = prepared['df'].copy()
+    constraints = prepared['constraints']
+    allConstraints = prepared['allConstraints']
+    colomnsInConstraints = prepared['columns']
+    detectionMode = prepared['detectionMode']
+    all_probs = prepared['probs'][skew] if skew in prepared['probs'] else calculate_all_probs(df,colomnsInConstraints,skew)
+
+    if resumeFrom is None:
+        # the first stage - the database should be consistent
+        writer.append(0, prepared['baseline'], tracing.iteration_times())
      
     cells_count = len(df.columns) * df.shape[0]
     iterations = int(err_rate * cells_count)
+    lastCheckpoint = ((iterations - 1) // 10) * 10
+
+    if resumeFrom is not None:
+        # the changes made until the checkpoint are applied to the clean database
+        checkpoint.replay_mutations(df, mutations.fileName, state['mutationsOffset'])
+
+    if detectionMode == 'live':
+        # from here on the violating pairs are updated with every change
+        live = liveindex.LiveMeasures(df, constraints, measuresToRun, fullPath, memoryBudget)
 
     print('Test '+database_name+' : running ' + str(iterations) + ' iterations; startTime:' + str(time.time()))
-    for x in range(1, iterations):
-        rand_vio_algorithm(df,colomnsInConstraints,all_probs,typo_prob) 
+    if pipelined:
+        if snapshotWorkers:
+            stages = pipeline.SnapshotPool(df, constraints, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, writer.append, snapshotWorkers, queueSize, memoizeMeasures, sampleBudget)
+        else:
+            stages = pipeline.Pipeline(df, constraints, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, writer.append, measureWorkers, queueSize, memoizeMeasures, sampleBudget)
+        changes = []
+    for x in range(firstIteration, iterations):
+        tracing.set_iteration(x)
+        with tracing.span('noise'):
+            change = rand_vio_algorithm(df,colomnsInConstraints,all_probs,typo_prob)
+            if checkpointEvery:
+                mutations.append(*change)
+            if pipelined:
+                changes.append(change)
+        if detectionMode == 'live':
+            with tracing.span('detection', mode='live'):
+                live.apply([change])
         
         #calculate the measurments every 10 iterations
         if (x%10 == 0):
-            # calcuate the queries needed for the measures
-            sdfc = meas.constraints_check(df,constraints, allColumns, allConstraints[0], allConstraints[1])
-            exes.append(x)
-
-            if (measuresToRun["I_D"]):
-                measurments1.append(meas.first_measurer_I_D(sdfc[0]))
-
-            if (measuresToRun["I_MI"]):
-                measurments2.append(meas.second_measurer_I_MI(sdfc[0]))
-                sum2 += sdfc[2]
-
-            if (measuresToRun["I_P"]):
-                measurments3.append(meas.third_measurer_I_P(sdfc[1]))
-                sum3 += sdfc[3]
-
-            if (measuresToRun["I_R"]):    
-                res1 = meas.fourth_measurer_I_R(sdfc[0])
-                measurments4.append(res1[0])
-                sum4 += res1[1]
-
-            if (measuresToRun["I_lin_R"]): 
-                res2 = meas.fifth_measurer_I_lin_R(sdfc[0])
-                measurments5.append(res2[0])
-                sum5 += res2[1]
-
-            if (measuresToRun["I_MC"]):
-                res3 = meas.sixth_measurer_I_MC(fullPath, sdfc[0])
-                measurments6.append(res3[0])
-                sum6 += res3[1]
+            # at the intermediate checkpoints the measures may be estimated from samples
+            estimated = estimateCheckpoints and x < lastCheckpoint and detectionMode != 'live'
+            if pipelined:
+                stages.submit(x, changes, tracing.iteration_times(), estimated)
+                changes = []
+            elif detectionMode == 'live':
+                values = live.measures()
+                writer.append(x, values, tracing.iteration_times())
+            elif estimated:
+                values, intervals = meas.estimate_checkpoint(df, constraints, measuresToRun, sampleBudget)
+                writer.append(x, values, tracing.iteration_times(), intervals)
+            else:
+                values = meas.compute_measures(df, constraints, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget, memo=memo)
+                writer.append(x, values, tracing.iteration_times())
+
+        if checkpointEvery and x % checkpointEvery == 0:
+            with tracing.span('checkpoint'):
+                writer.flush()
+                checkpoint.save_checkpoint(fullPath, {'iteration': x, 'mutationsOffset': mutations.flush(), 'config': config, 'runId': writer.runId, 'resultsFileName': resultsFileName})
+    if pipelined:
+        # waits for the measures of the last checkpoints
+        stages.close()
     
     # messages at finish
     print('Test '+database_name+' : runTime = ' + str(time.time()))
     print('Test '+database_name+' finished, preparing the results.')
     
-    f_times   = open(runningTimesFileName, "a+")
-    f_results = open(allResultsFileName,"a+")
-    
-    if (measuresToRun["I_D"]):
-        plt.scatter(exes, measurments1, c='r')
-        plt.title('Drastic inconsistency value I_D:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_D.jpg', dpi=300)
-        plt.clf()
-
-    if (measuresToRun["I_MI"]):
-        plt.scatter(exes, measurments2, c='b')
-        plt.title('Minimal inconsistent subsets of D I_MI:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_MI.jpg', dpi=300) 
-        f_times.write("AVG for I_MI: ")
-        f_times.write(str(float(sum2/iterations)))
-        f_results.write("I_MI results: ")
-        f_results.write(str(measurments2))
-        plt.clf()
-
-    if (measuresToRun["I_P"]):
-        plt.scatter(exes, measurments3, c='g')
-        plt.title('Problematic facts I_P:')
-        plt.ylabel('results')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_P.jpg', dpi=300)
-        f_times.write("\nAVG for I_P: ")
-        f_times.write(str(float(sum3/iterations))) 
-        f_results.write("\nI_P results: ")
-        f_results.write(str(measurments3))
-        plt.clf()
-
-    if (measuresToRun["I_R"]):
-        plt.scatter(exes, measurments4, c='y')
-        plt.title('Minimal cost of a sequence of operations that repairs the database I_R:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_R.jpg', dpi=300)  
-        f_times.write("\nAVG for I_R: ")
-        f_times.write(str(float((sum4+sum2)/iterations)))
-        f_results.write("\nI_R results: ")
-        f_results.write(str(measurments4))
-        plt.clf()
-
-    if (measuresToRun["I_lin_R"]):
-        plt.scatter(exes, measurments5, c='pink')
-        plt.title('Linear relaxation of the fourth measurer I_lin_R:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_lin_R.jpg', dpi=300)  
-        f_times.write("\nAVG for I_lin_R: ")
-        f_times.write(str(float((sum5+sum2)/iterations)))
-        f_results.write("\nI_lin_R results: ")
-        f_results.write(str(measurments5))
-        plt.clf()
-
-    if (measuresToRun["I_MC"]):
-        plt.scatter(exes, measurments6, c='purple')
-        plt.title('Maximal cliques I_MC:')
-        plt.ylabel('results')
-        plt.xlabel('number of changes')
-        plt.savefig('Data/'+ database_name + resultsDirectoryPath + '/I_MC.jpg', dpi=300)  
-        f_times.write("\nAVG for I_MC: ")
-        f_times.write(str(float((sum6+sum2)/iterations)))
-        f_results.write("\nI_MC results: ")
-        f_results.write(str(measurments6))
-        plt.clf()
+    tracing.set_iteration(None)
+    with tracing.span('output'):
+        writer.close()
 
+    # the average running time of every phase, from the trace
     end = time.time()
-    f_times.write("\ntotal time ")
+    f_times = open(runningTimesFileName, "a+")
+    for phase, totals in sorted(tracer.summary().items()):
+        f_times.write("AVG for " + phase + ": " + str(totals['wall']) + " (cpu " + str(totals['cpu']) + ", " + str(totals['count']) + " spans)\n")
+    f_times.write("total time ")
     f_times.write(str(end - start))
-
     f_times.write("\n---\n")
-    f_results.write("\n---\n")
-
     f_times.close()
-    f_results.close()
+    tracer.close()
+    tracing.activate(None)
 
     print('End of test '+database_name + '; total time = ' + str(end - start))
-    print('\033[1m'+"Computation finished, outputs can be found in "+'Data/'+ database_name + resultsDirectoryPath +'\n \033[0m')
+    print('\033[1m'+"Computation finished, outputs can be found in "+ fullPath +'\n \033[0m')
+    return resultsFileName
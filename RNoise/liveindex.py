@@ -0,0 +1,451 @@
+import pandas as pd
+import numpy as numpy
+import math
+import detection as det
+import dynamiccover
+import measurememo
+import measurments as meas
+import tracing
+
+def _is_null(value):
+    return value is None or (not isinstance(value, str) and bool(pd.isna(value)))
+
+def _grow(array, size):
+    # the array with room for size elements, the capacity is doubled so that inserting a tuple is amortized O(1)
+    if size <= len(array):
+        return array
+    grown = numpy.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _constant_text(value):
+    # a numeric constant compared with a string column, as it was written in the dcs file
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+class LiveViolations(object):
+    """
+    LiveViolations - the violating pairs of a database that changes one cell, one inserted tuple or one deleted
+    tuple at a time, kept up to date after every change without running the detection again.
+    A change only affects the pairs of the changed tuple, so the tuple is checked again against its candidate
+    partners, and only for the constraints that read the changed column (all of them when the tuple gains or
+    loses a missing value). The candidates of a constraint with equality conditions t1.fieldA=t2.fieldB are
+    found in hash indexes from the values of the conditions to the tuples, which are updated with the tuples;
+    the candidates of a constraint without equality conditions are all the tuples.
+    Every violating pair keeps the bitmask of the constraints it violates (like detection.Attribution), so a
+    pair disappears only when none of its constraints holds any more.
+
+    The values are compared as they are, without the vocabulary encoding of detection.compile_constraints: a
+    string column compared with a number (in another column) is never equal to it and never ordered. The
+    violating pairs of the initial database are found by blocked_constraints_check.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame, with the default index: the tuple at the position i has the id i+1 in the pairs
+    constraintSets : list of strings
+        the constraints from the dcs file
+    memoryBudget : int
+        the number of bytes the detection of the initial violations may use
+    """
+
+    def __init__(self, df, constraintSets, memoryBudget=1<<30):
+        self.columns = list(df.columns)
+        self.dcs = [det.split_conditions(con, index) for index, con in enumerate(constraintSets)]
+        self.constraints = [dc['constraint'] for dc in self.dcs]
+        self.groups = det.group_constraints(self.dcs)
+        self.allBits = (1 << len(self.dcs)) - 1
+        self.maskType = numpy.int64 if len(self.dcs) < 63 else object
+
+        # the constraints that read every column
+        self.columnBits = {}
+        for dc in self.dcs:
+            dc['bit'] = 1 << dc['index']
+            fields = [f for key in dc['keys'] for f in key]
+            for rowA, fieldA, op, rowB, fieldB in dc['predicates']:
+                fields += [fieldA] if rowB is None else [fieldA, fieldB]
+            for field in fields:
+                self.columnBits[field] = self.columnBits.get(field, 0) | dc['bit']
+
+        n = len(df.index)
+        self.size = n
+        self.numeric = set(col for col in self.columnBits if df[col].dtype.kind in 'biuf')
+        self.values = {}
+        for col in self.columnBits:
+            if col in self.numeric:
+                self.values[col] = df[col].to_numpy(dtype=numpy.float64).copy()
+            else:
+                values = df[col].to_numpy(dtype=object).copy()
+                notNull = df[col].notna().to_numpy()
+                values[notNull] = values[notNull].astype(str)
+                self.values[col] = values
+        for dc in self.dcs:
+            dc['predicates'] = [(rowA, fieldA, op, rowB, _constant_text(fieldB) if rowB is None and fieldA not in self.numeric and not isinstance(fieldB, str) else fieldB)
+                                for rowA, fieldA, op, rowB, fieldB in dc['predicates']]
+        self.nulls = dict((col, df[col].isna().to_numpy().copy()) for col in self.columns)
+        self.missing = df.isna().sum(axis=1).to_numpy(dtype=numpy.int64).copy()
+        self.deleted = numpy.zeros(n, dtype=bool)
+
+        # the hash indexes of the groups of constraints with equality conditions
+        self.keyedGroups = [group for group in self.groups if group['keys']]
+        validRows = self.valid_rows()
+        for group in self.groups:
+            group['bits'] = sum(dc['bit'] for dc in group['dcs'])
+        for group in self.keyedGroups:
+            group['left'] = [fieldA for fieldA, fieldB in group['keys']]
+            group['right'] = [fieldB for fieldA, fieldB in group['keys']]
+            group['keyFields'] = set(group['left'] + group['right'])
+            group['leftIndex'] = {}
+            group['rightIndex'] = group['leftIndex'] if group['left'] == group['right'] else {}
+            for side, index in (('left', group['leftIndex']), ('right', group['rightIndex'])):
+                keys = zip(*(self.values[field][validRows].tolist() for field in group[side]))
+                for row, key in zip(validRows.tolist(), keys):
+                    index.setdefault(key, set()).add(row)
+                if index is group['rightIndex']:
+                    break
+
+        # the violating pairs, from a tuple to its partners and the bitmasks of the pairs
+        self.partners = {}
+        self.pairCount = 0
+        self.constraintPairs = [0] * len(self.dcs)
+        self.pending = {}
+        if n and self.dcs:
+            attribution = det.blocked_constraints_check(df, self.constraints, memoryBudget, attribution=True)[4]
+            for (id1, id2), mask in zip(attribution.pairs.tolist(), attribution.masks):
+                bits = int.from_bytes(mask.tobytes(), 'little')
+                self.partners.setdefault(id1 - 1, {})[id2 - 1] = bits
+                self.partners.setdefault(id2 - 1, {})[id1 - 1] = bits
+            self.pairCount = len(attribution)
+            self.constraintPairs = [int(count) for count in attribution.measures()['I_MI']]
+
+    def __len__(self):
+        return self.pairCount
+
+    def valid_rows(self):
+        """
+        valid_rows - the positions of the tuples that are checked: the tuples that were not deleted and have
+        no missing values.
+        """
+        return numpy.flatnonzero(~self.deleted[:self.size] & (self.missing[:self.size] == 0))
+
+    def tuple_count(self):
+        """
+        tuple_count - the number of tuples that participate in a violation.
+        """
+        return len(self.partners)
+
+    def pairs(self):
+        """
+        pairs - the violating pairs, as an (n,2) array of ids, id1 <= id2, sorted.
+        """
+        pairs = [(row + 1, other + 1) for row, others in self.partners.items() for other in others if other >= row]
+        return numpy.array(sorted(pairs), dtype=numpy.int64).reshape(-1, 2)
+
+    def pop_changes(self):
+        """
+        pop_changes - the pairs that started or stopped violating the constraints since the previous call. A
+        pair that was added and removed again in between is in neither.
+
+        Returns
+        -------
+        two (n,2) arrays of ids, the added pairs and the removed pairs
+        """
+        added = [pair for pair, present in self.pending.items() if present]
+        removed = [pair for pair, present in self.pending.items() if not present]
+        self.pending = {}
+        return numpy.array(added, dtype=numpy.int64).reshape(-1, 2), numpy.array(removed, dtype=numpy.int64).reshape(-1, 2)
+
+    def apply(self, changes):
+        """
+        apply - applies changes of cells, in the form returned by rand_vio_algorithm and written to the
+        mutations file (see checkpoint.py).
+
+        Parameters
+        ----------
+        changes : iterable of (row, column, value)
+        """
+        for row, column, value in changes:
+            self.update(row, column, value)
+
+    def update(self, row, column, value):
+        """
+        update - changes the value of a cell and updates the violating pairs of its tuple.
+
+        Parameters
+        ----------
+        row : int
+            the position of the tuple
+        column : string
+            the name of the column
+        value : object
+            the new value, None or nan for a missing value
+        """
+        self._check_row(row)
+        if self.deleted[row]:
+            raise ValueError('tuple ' + str(row) + ' was deleted')
+        null = _is_null(value)
+        stored = None
+        if column in self.values and not null:
+            stored = float(value) if column in self.numeric else str(value)
+        if null == self.nulls[column][row] and (null or column not in self.values or stored == self.values[column][row]):
+            return
+        missing = self.missing[row] + int(null) - int(self.nulls[column][row])
+        wasValid, isValid = self.missing[row] == 0, missing == 0
+        bits = self.allBits if wasValid != isValid else self.columnBits.get(column, 0)
+        groups = [group for group in self.keyedGroups if wasValid != isValid or column in group['keyFields']]
+        if wasValid:
+            self._unindex(row, groups)
+        self.nulls[column][row] = null
+        self.missing[row] = missing
+        if column in self.values:
+            self.values[column][row] = (numpy.nan if column in self.numeric else None) if null else stored
+        if isValid:
+            self._index(row, groups)
+        if bits:
+            self._recheck(row, bits, isValid)
+
+    def insert(self, values):
+        """
+        insert - adds a tuple and its violating pairs.
+
+        Parameters
+        ----------
+        values : dictionary or series
+            the values of the tuple, from a column to its value, the missing columns are missing values
+
+        Returns
+        -------
+        int, the position of the new tuple (its id is the position plus one)
+        """
+        row = self.size
+        self.size += 1
+        for col in self.values:
+            self.values[col] = _grow(self.values[col], self.size)
+        for col in self.columns:
+            self.nulls[col] = _grow(self.nulls[col], self.size)
+            value = values.get(col)
+            self.nulls[col][row] = _is_null(value)
+            if col in self.values:
+                if self.nulls[col][row]:
+                    self.values[col][row] = numpy.nan if col in self.numeric else None
+                else:
+                    self.values[col][row] = float(value) if col in self.numeric else str(value)
+        self.missing = _grow(self.missing, self.size)
+        self.missing[row] = sum(int(self.nulls[col][row]) for col in self.columns)
+        self.deleted = _grow(self.deleted, self.size)
+        self.deleted[row] = False
+        if self.missing[row] == 0:
+            self._index(row, self.keyedGroups)
+            self._recheck(row, self.allBits, True)
+        return row
+
+    def delete(self, row):
+        """
+        delete - removes a tuple and its violating pairs. The positions of the other tuples do not change.
+
+        Parameters
+        ----------
+        row : int
+            the position of the tuple
+        """
+        self._check_row(row)
+        if self.deleted[row]:
+            return
+        if self.missing[row] == 0:
+            self._unindex(row, self.keyedGroups)
+        self.deleted[row] = True
+        self._recheck(row, self.allBits, False)
+
+    def _check_row(self, row):
+        # the arrays have room for the inserted tuples, and a negative position would be counted from their end
+        if row < 0 or row >= self.size:
+            raise IndexError('no tuple at position ' + str(row) + ', the positions are 0..' + str(self.size - 1))
+
+    def _key(self, fields, row):
+        return tuple(self.values[field][row] for field in fields)
+
+    def _index(self, row, groups):
+        for group in groups:
+            group['leftIndex'].setdefault(self._key(group['left'], row), set()).add(row)
+            if group['rightIndex'] is not group['leftIndex']:
+                group['rightIndex'].setdefault(self._key(group['right'], row), set()).add(row)
+
+    def _unindex(self, row, groups):
+        for group in groups:
+            for side, index in (('left', group['leftIndex']), ('right', group['rightIndex'])):
+                key = self._key(group[side], row)
+                rows = index.get(key)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del index[key]
+                if index is group['rightIndex']:
+                    break
+
+    def _candidates(self, index, fields, row):
+        rows = index.get(self._key(fields, row), ())
+        return numpy.fromiter(rows, dtype=numpy.int64, count=len(rows))
+
+    def _evaluate(self, predicates, I, J):
+        mask = numpy.ones(len(I), dtype=bool)
+        for rowA, fieldA, op, rowB, fieldB in predicates:
+            left = self.values[fieldA][I if rowA == 't1' else J]
+            right = fieldB if rowB is None else self.values[fieldB][I if rowB == 't1' else J]
+            try:
+                mask &= det.OPERATORS[op](left, right)
+            except TypeError:
+                # a string compared with a number
+                mask[:] = False
+        return mask
+
+    def _violated(self, dcs, I, J):
+        # the bitmasks of the constraints violated by the pairs (I[k], J[k])
+        bits = numpy.zeros(len(I), dtype=self.maskType)
+        for dc in dcs:
+            bits[self._evaluate(dc['predicates'], I, J)] |= dc['bit']
+        return bits
+
+    def _row_violations(self, row, bits):
+        # the partners of the tuple and the bitmasks of the pairs, for the constraints of bits
+        violations = {}
+        for group in self.groups:
+            dcs = [dc for dc in group['dcs'] if dc['bit'] & bits]
+            if not dcs:
+                continue
+            if group['single']:
+                rows = numpy.array([row])
+                mask = int(self._violated(dcs, rows, rows)[0])
+                if mask:
+                    violations[row] = violations.get(row, 0) | mask
+                continue
+            # the tuple as t1, and as t2 for the constraints whose tuples are not interchangeable
+            for asFirst in (True, False):
+                sideDcs = dcs if asFirst else [dc for dc in dcs if not dc['symmetric']]
+                if not sideDcs:
+                    continue
+                if group['keys']:
+                    others = self._candidates(group['rightIndex'], group['left'], row) if asFirst else self._candidates(group['leftIndex'], group['right'], row)
+                else:
+                    others = self.valid_rows()
+                others = others[others != row]
+                rows = numpy.full(len(others), row)
+                masks = self._violated(sideDcs, rows, others) if asFirst else self._violated(sideDcs, others, rows)
+                violated = numpy.flatnonzero(masks)
+                for other, mask in zip(others[violated].tolist(), masks[violated].tolist()):
+                    violations[other] = violations.get(other, 0) | mask
+        return violations
+
+    def _recheck(self, row, bits, valid):
+        # checks the tuple again for the constraints of bits and records the pairs that changed
+        before = self.partners.get(row, {})
+        after = dict((other, mask & ~bits) for other, mask in before.items() if mask & ~bits)
+        if valid:
+            for other, mask in self._row_violations(row, bits).items():
+                after[other] = after.get(other, 0) | mask
+        for other in set(before) | set(after):
+            old, new = before.get(other, 0), after.get(other, 0)
+            if old == new:
+                continue
+            if other != row:
+                if new:
+                    self.partners.setdefault(other, {})[row] = new
+                else:
+                    del self.partners[other][row]
+                    if not self.partners[other]:
+                        del self.partners[other]
+            changed = old ^ new
+            for index in range(len(self.dcs)):
+                if changed >> index & 1:
+                    self.constraintPairs[index] += 1 if new >> index & 1 else -1
+            if not old or not new:
+                pair = (min(row, other) + 1, max(row, other) + 1)
+                self.pairCount += 1 if new else -1
+                if self.pending.get(pair) == (not new):
+                    del self.pending[pair]
+                else:
+                    self.pending[pair] = bool(new)
+        if after:
+            self.partners[row] = after
+        else:
+            self.partners.pop(row, None)
+
+class LiveMeasures(object):
+    """
+    LiveMeasures - the measures of a database under a stream of changes, updated in the time of the changes
+    rather than in the time of the database. The violating pairs are kept by a LiveViolations, I_D, I_MI and I_P
+    are read from its counts, I_R is maintained by a DynamicCover from the pairs that changed since the previous
+    measures, and I_lin_R and I_MC reuse the values of the components that did not change (see measurememo.py).
+    The simulations feed it the changes of their cells, and the monitor (see monitor.py) the changes of a log.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame, see LiveViolations
+    constraintSets : list of strings
+        the constraints from the dcs file
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    fullPath : string
+        the directory where the graph of I_MC is generated
+    memoryBudget : int
+        see LiveViolations
+    """
+
+    def __init__(self, df, constraintSets, measuresToRun, fullPath, memoryBudget=1<<30):
+        self.violations = LiveViolations(df, constraintSets, memoryBudget)
+        self.measuresToRun = dict(measuresToRun)
+        self.fullPath = fullPath
+        self.cover = dynamiccover.DynamicCover()
+        if self.measuresToRun.get("I_R"):
+            self.cover.update(self.violations.pairs(), numpy.zeros((0, 2), dtype=numpy.int64))
+        self.memo = measurememo.MeasureMemo()
+
+    def apply(self, changes):
+        """
+        apply - applies changes of cells (row, column, value), see LiveViolations.apply.
+        """
+        self.violations.apply(changes)
+
+    def insert(self, values):
+        """
+        insert - adds a tuple, see LiveViolations.insert.
+        """
+        return self.violations.insert(values)
+
+    def delete(self, row):
+        """
+        delete - removes a tuple, see LiveViolations.delete.
+        """
+        self.violations.delete(row)
+
+    def measures(self):
+        """
+        measures - the values of the selected measures after the changes applied so far.
+
+        Returns
+        -------
+        dictionary from the names of the selected measures to their values, like compute_measures
+        """
+        added, removed = self.violations.pop_changes()
+        if self.measuresToRun.get("I_R"):
+            with tracing.span('I_R'):
+                self.cover.update(added, removed)
+        values = {}
+        if self.measuresToRun.get("I_D"):
+            values["I_D"] = meas.first_measurer_I_D(det.PairCount(len(self.violations)))
+        if self.measuresToRun.get("I_MI"):
+            values["I_MI"] = meas.second_measurer_I_MI(det.PairCount(len(self.violations)))
+        if self.measuresToRun.get("I_P"):
+            values["I_P"] = meas.third_measurer_I_P(det.PairCount(self.violations.tuple_count()))
+        if self.measuresToRun.get("I_R"):
+            values["I_R"] = self.cover.value
+        memoMeasures = [m for m in ("I_lin_R", "I_MC") if self.measuresToRun.get(m)]
+        if self.measuresToRun.get("I_MC_log"):
+            memoMeasures += ["I_MC_log", "I_MC_log_var"]
+        if memoMeasures:
+            with tracing.span('memo') as record:
+                values.update(self.memo.evaluate(self.violations.pairs(), memoMeasures, self.fullPath))
+                record['computed'] = self.memo.lastComputed
+                record['reused'] = self.memo.lastReused
+        if "I_MC_log_var" in values:
+            values["I_MC_log_err"] = math.sqrt(values.pop("I_MC_log_var"))
+        return values
@@ -0,0 +1,345 @@
+import numpy as numpy
+import math
+import random
+import time
+import conflictgraph as cg
+import treedecomp
+
+# components with at most this many tuples are counted exactly, unless the enumeration takes more than MAX_EXACT_STEPS
+EXACT_COMPONENT_SIZE = 64
+MAX_EXACT_STEPS = 1<<16
+# the number of random paths of the estimator, and the time they may take on a component
+ESTIMATOR_SAMPLES = 1000
+ESTIMATOR_SECONDS = 1.0
+# the number of vertices of P and X considered for the pivot of every step
+PIVOT_CANDIDATES = 32
+
+def _bits(mask):
+    # the positions of the bits of a set, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+def _branches(P, X, adjacency):
+    # the vertices to branch on (P minus the non-neighbours of a pivot u in the conflict graph), see count_maximal_independent_sets
+    best = None
+    for k, u in enumerate(_bits(P | X)):
+        if k == PIVOT_CANDIDATES:
+            break
+        candidates = P & (adjacency[u] | (1 << u))
+        if best is None or _popcount(candidates) < _popcount(best):
+            best = candidates
+            if not best:
+                break
+    return list(_bits(best))
+
+def component_graph(edges):
+    """
+    component_graph - the conflict graph of a component as lists of neighbours, without the tuples that violate
+    a constraint on their own (the pairs (i,i)). Such tuples are in no consistent subset, so they do not change
+    the number of maximal consistent subsets.
+
+    Parameters
+    ----------
+    edges : (k,2) array of int
+        the violating pairs of the component
+
+    Returns
+    -------
+    list of lists of int, the neighbours of every remaining tuple (numbered from 0)
+    """
+    edges = numpy.asarray(edges, dtype=numpy.int64).reshape(-1, 2)
+    nodes = numpy.unique(edges)
+    local = numpy.searchsorted(nodes, edges)
+    loops = numpy.zeros(len(nodes), dtype=bool)
+    loops[local[local[:,0] == local[:,1], 0]] = True
+    keep = numpy.cumsum(~loops) - 1
+    neighbors = [[] for v in range(int((~loops).sum()))]
+    for a, b in keep[local[~loops[local[:,0]] & ~loops[local[:,1]]]].tolist():
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    return neighbors
+
+def _bitsets(neighbors):
+    adjacency = []
+    for nb in neighbors:
+        mask = 0
+        for u in nb:
+            mask |= 1 << u
+        adjacency.append(mask)
+    return adjacency
+
+def count_maximal_independent_sets(neighbors, maxSteps=MAX_EXACT_STEPS):
+    """
+    count_maximal_independent_sets - counts the maximal independent sets of a graph, which are the maximal
+    cliques of its complement, with the Bron-Kerbosch algorithm with pivoting (the algorithm of text_ui).
+    A branch adds a vertex v to the set, P holds the vertices that may still be added and X the vertices that
+    were excluded, the neighbours of v in the complement are the vertices that are not adjacent to v.
+
+    Parameters
+    ----------
+    neighbors : list of lists of int
+        the neighbours of every vertex, see component_graph
+    maxSteps : int
+        the number of nodes of the search tree after which the enumeration stops
+
+    Returns
+    -------
+    list of two int:
+        the number of maximal independent sets (None if the enumeration stopped) and the number of sets found
+    """
+    adjacency = _bitsets(neighbors)
+    count, steps = 0, 0
+    stack = [((1 << len(adjacency)) - 1, 0)]
+    while stack:
+        P, X = stack.pop()
+        steps += 1
+        if steps > maxSteps:
+            return None, count
+        if not P:
+            if not X:
+                count += 1
+            continue
+        for v in _branches(P, X, adjacency):
+            stack.append((P & ~adjacency[v] & ~(1 << v), X & ~adjacency[v] & ~(1 << v)))
+            P &= ~(1 << v)
+            X |= 1 << v
+    return count, count
+
+def _bfs_order(neighbors):
+    order, seen = [], [False] * len(neighbors)
+    for root in range(len(neighbors)):
+        if seen[root]:
+            continue
+        seen[root] = True
+        queue = [root]
+        for v in queue:
+            for u in neighbors[v]:
+                if not seen[u]:
+                    seen[u] = True
+                    queue.append(u)
+        order += queue
+    return order
+
+def _sample_path(neighbors, neighborSets, order, rng):
+    # one random path of the search tree of estimate_maximal_independent_sets, returns its weight (0 at a dead end)
+    n = len(neighbors)
+    state = [0] * n
+    dominated = [False] * n
+    # hope[u] - the neighbours of u that may still join the set (undecided and without a neighbour in the set)
+    hope = [len(nb) for nb in neighbors]
+    # the last hopes of excluded tuples are decided first, before other choices take them
+    forced = []
+    position = 0
+    weight = 1
+    while True:
+        v = None
+        while forced and v is None:
+            w = forced.pop()
+            if state[w] == 0:
+                v = w
+        if v is None:
+            while position < n and state[order[position]] != 0:
+                position += 1
+            if position == n:
+                return weight
+            v = order[position]
+        if dominated[v]:
+            state[v] = 2
+            continue
+        # v may join the set, unless it takes the last hope of an excluded tuple that is not dominated yet
+        leaving = [v] + [w for w in neighbors[v] if state[w] == 0 and not dominated[w]]
+        lost = {}
+        for x in leaving:
+            for u in neighbors[x]:
+                if state[u] == 2 and not dominated[u] and u not in neighborSets[v]:
+                    lost[u] = lost.get(u, 0) + 1
+        canInclude = all(hope[u] > k for u, k in lost.items())
+        # v may be excluded if it may still be dominated, and it is not the last hope of an excluded tuple
+        canExclude = hope[v] > 0 and all(hope[u] > 1 for u in neighbors[v] if state[u] == 2 and not dominated[u])
+        if not canInclude and not canExclude:
+            return 0
+        if canInclude and canExclude:
+            include = rng.random() < 0.5
+            weight *= 2
+        else:
+            include = canInclude
+        if include:
+            state[v] = 1
+            for w in neighbors[v]:
+                dominated[w] = True
+            changed = list(lost)
+            for x in leaving:
+                for u in neighbors[x]:
+                    hope[u] -= 1
+        else:
+            state[v] = 2
+            changed = [v] + neighbors[v]
+            for u in neighbors[v]:
+                hope[u] -= 1
+        for u in changed:
+            if state[u] == 2 and not dominated[u] and hope[u] == 1:
+                forced.append(next(w for w in neighbors[u] if state[w] == 0 and not dominated[w]))
+
+def estimate_maximal_independent_sets(neighbors, samples=ESTIMATOR_SAMPLES, seconds=ESTIMATOR_SECONDS, rng=None):
+    """
+    estimate_maximal_independent_sets - Knuth's estimator of the number of maximal independent sets.
+    The search tree decides the tuples one at a time in BFS order, each joins the set or is excluded, and a
+    choice is pruned when it leaves an excluded tuple without any neighbour that may still dominate it. Every
+    leaf of the tree is a maximal independent set and every set is a leaf. A sample follows a random path
+    from the root, choosing a branch uniformly, and its estimate is the product of the numbers of branches
+    along the path (0 when the path reaches a tuple with no valid choice). The estimate is unbiased.
+
+    Parameters
+    ----------
+    neighbors : list of lists of int
+        the neighbours of every vertex, see component_graph
+    samples : int
+        the number of paths
+    seconds : float
+        the time after which no more paths are started
+    rng : random.Random
+        the random generator, a separate one so that the generators of the simulation are not used
+
+    Returns
+    -------
+    list of two float:
+        the natural logarithm of the mean of the estimates and the relative standard error of the mean, or
+        None, None when no path reached a leaf
+    """
+    rng = rng if rng is not None else random.Random(0)
+    deadline = time.time() + seconds
+    order = _bfs_order(neighbors)
+    neighborSets = [set(nb) for nb in neighbors]
+    weights = []
+    for sample in range(samples):
+        weights.append(_sample_path(neighbors, neighborSets, order, rng))
+        if time.time() > deadline:
+            break
+    positive = [w for w in weights if w]
+    if not positive:
+        return None, None
+    # the weights may not fit in a float, they are scaled by the largest one
+    logMax = max(math.log(w) for w in positive)
+    scaled = numpy.array([math.exp(math.log(w) - logMax) if w else 0.0 for w in weights])
+    mean = scaled.mean()
+    relativeError = scaled.std(ddof=1) / math.sqrt(len(scaled)) / mean if len(scaled) > 1 else 1.0
+    return logMax + math.log(mean), float(relativeError)
+
+def log_bounds(neighbors):
+    """
+    log_bounds - cheap bounds on the natural logarithm of the number of maximal independent sets.
+    - lower: an induced matching of k edges gives 2^k sets, one endpoint of every edge is chosen and extended
+      to a maximal set, which contains no other endpoint of the matching.
+    - upper: a maximal set S is determined by its intersection with a vertex cover C (the other tuples are in
+      S exactly when they have no neighbour in S), so there are at most 2^|C| sets, where C is the complement
+      of a greedy independent set. The bound of Moon and Moser is used when it is lower.
+    """
+    n = len(neighbors)
+    blocked = [False] * n
+    matching = 0
+    for v in sorted(range(n), key=lambda v: len(neighbors[v])):
+        if blocked[v]:
+            continue
+        free = [u for u in neighbors[v] if not blocked[u]]
+        if not free:
+            continue
+        u = min(free, key=lambda u: len(neighbors[u]))
+        matching += 1
+        for x in (v, u):
+            blocked[x] = True
+            for y in neighbors[x]:
+                blocked[y] = True
+    covered = [False] * n
+    independent = 0
+    for v in sorted(range(n), key=lambda v: len(neighbors[v])):
+        if not covered[v]:
+            independent += 1
+            covered[v] = True
+            for u in neighbors[v]:
+                covered[u] = True
+    return matching * math.log(2), min(moon_moser_log_bound(n), (n - independent) * math.log(2))
+
+def moon_moser_log_bound(n):
+    """
+    moon_moser_log_bound - the natural logarithm of the largest number of maximal independent sets of a graph
+    with n vertices (Moon and Moser): 3^(n/3), 4*3^((n-4)/3) or 2*3^((n-2)/3) depending on n mod 3.
+    """
+    if n < 2:
+        return 0.0
+    if n % 3 == 0:
+        return n / 3 * math.log(3)
+    if n % 3 == 1:
+        return math.log(4) + (n - 4) / 3 * math.log(3)
+    return math.log(2) + (n - 2) / 3 * math.log(3)
+
+def component_log_count(edges, exactSize=EXACT_COMPONENT_SIZE, maxSteps=MAX_EXACT_STEPS, samples=ESTIMATOR_SAMPLES, seconds=ESTIMATOR_SECONDS, seed=0, decompose=True):
+    """
+    component_log_count - the natural logarithm of the number of maximal consistent subsets of a connected
+    component of the conflict graph, and the variance of the logarithm.
+
+    - Components of at most exactSize tuples are counted exactly (variance 0), unless the enumeration stops
+      after maxSteps steps.
+    - Larger components with a tree decomposition of width at most treedecomp.MAX_WIDTH are counted exactly
+      by dynamic programming (unless decompose is false).
+    - Other components are estimated by estimate_maximal_independent_sets, and the variance of the logarithm
+      is the square of the relative standard error (the delta method). The estimate is clipped to log_bounds.
+    - When no path reached a leaf in time, the value is the middle of the bounds and the standard deviation
+      is half of their distance.
+
+    Returns
+    -------
+    list of two float, the logarithm and its variance
+    """
+    neighbors = component_graph(edges)
+    found = 0
+    if len(neighbors) <= exactSize:
+        count, found = count_maximal_independent_sets(neighbors, maxSteps)
+        if count is not None:
+            return math.log(count), 0.0
+    decomposition = treedecomp.tree_decomposition(neighbors) if decompose else None
+    if decomposition is not None:
+        return math.log(treedecomp.count_maximal_independent_sets(neighbors, decomposition)), 0.0
+    logLow, logHigh = log_bounds(neighbors)
+    logLow = max(logLow, math.log(max(1, found)))
+    logMean, relativeError = estimate_maximal_independent_sets(neighbors, samples, seconds, random.Random(seed))
+    if logMean is None:
+        return (logLow + logHigh) / 2, ((logHigh - logLow) / 2) ** 2
+    return min(max(logMean, logLow), logHigh), relativeError ** 2
+
+def log_count_I_MC(uniquePairs, **kwargs):
+    """
+    log_count_I_MC - approximates the measure I_MC in log space, for conflict graphs where the enumeration of
+    sixth_measurer_I_MC does not finish. I_MC is the product of the numbers of maximal consistent subsets of
+    the connected components of the conflict graph (tuples without violations are in all of them), so its
+    logarithm is the sum of the logarithms of the components (see component_log_count), and the variances of
+    the independent estimates add up.
+
+    Parameters
+    ----------
+    uniquePairs : (n,2) array of int
+        the pairs of ids of tuples that jointly violate a constraint
+    kwargs :
+        the parameters of component_log_count
+
+    Returns
+    -------
+    list of two float, the natural logarithm of I_MC and its standard error
+    """
+    pairs = numpy.asarray(uniquePairs, dtype=numpy.int64).reshape(-1, 2)
+    if len(pairs) == 0:
+        return 0.0, 0.0
+    nodes, labels = cg.connected_components(pairs)
+    edgeLabels = labels[numpy.searchsorted(nodes, pairs[:,0])]
+    order = numpy.argsort(edgeLabels, kind='stable')
+    bounds = numpy.flatnonzero(numpy.diff(edgeLabels[order])) + 1
+    logCount, variance = 0.0, 0.0
+    for edges in numpy.split(pairs[order], bounds):
+        logValue, logVariance = component_log_count(edges, **kwargs)
+        logCount += logValue
+        variance += logVariance
+    return logCount, math.sqrt(variance)
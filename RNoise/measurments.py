@@ -7,6 +7,7 @@ from gurobipy import GRB
 import random
 import re
 import os
+import threading
 from subprocess import PIPE, run
 import pandasql as psql
 import time
@@ -16,6 +17,14 @@ import datetime
 from datetime import date
 from collections import defaultdict
 from itertools import repeat
+import detection as det
+import conflictgraph as cg
+import tracing
+import estimators
+import mcapprox
+
+# the inconsistency measures, in the order of the charts and the results files
+MEASURES = ["I_D", "I_MI", "I_P", "I_R", "I_lin_R", "I_MC", "I_MC_log"]
 
 def col_in_constraints(constraintSet,df):
     allColomns = []
@@ -31,6 +40,10 @@ def build_dynamic_queries(constraintSets,df):
     1. unionOfAllTuples - returns the ids of the tuples participating in a violation of the constraints.
     2. unionOfAllPairs - returns pairs (i1,i2) of ids of tuples that jointly violate the constraints.
     
+    The pairs are canonical (i1 <= i2), so the UNION of the queries of the constraints is enough to remove the
+    duplicates. A constraint that does not change when t1 and t2 are swapped (see detection.is_symmetric) is only
+    joined on t1.ROWID<t2.ROWID, the other constraints are joined in both orders and the ids are sorted.
+    
     Parameters
     ----------
     constraintSets : set of strings
@@ -60,11 +73,16 @@ def build_dynamic_queries(constraintSets,df):
 
     count = 0
     for con in constraintSets: 
+        symmetric = "t2" not in con or det.is_symmetric(det.parse_constraint(con))
+        if symmetric:
+            selectPair = "t1.rowid as t1ctid ,t2.rowid as t2ctid"
+        else:
+            selectPair = "CASE WHEN t1.rowid <= t2.rowid THEN t1.rowid ELSE t2.rowid END as t1ctid ,CASE WHEN t1.rowid <= t2.rowid THEN t2.rowid ELSE t1.rowid END as t2ctid"
         if count == 0:
-            unionOfAllPairs = " SELECT t1.rowid as t1ctid ,t2.rowid as t2ctid FROM df t1,df t2 WHERE "
+            unionOfAllPairs = " SELECT DISTINCT "+selectPair+" FROM df t1,df t2 WHERE "
             unionOfAllTuples = " SELECT * FROM df t1,df t2 WHERE " 
         else : 
-            unionOfAllPairs += " UNION SELECT t1.rowid as t1ctid ,t2.rowid as t2ctid FROM df t1,df t2 WHERE "
+            unionOfAllPairs += " UNION SELECT "+selectPair+" FROM df t1,df t2 WHERE "
             unionOfAllTuples += " UNION SELECT * FROM df t1,df t2 WHERE "
             
         rep = {" ": "_", "&": " and ","not(":"",")":""} 
@@ -78,19 +96,32 @@ def build_dynamic_queries(constraintSets,df):
             unionOfAllPairs += con1 +" and t1.ROWID==t2.ROWID and ("+columnsT1+")"
             unionOfAllTuples += con1 +" and t1.ROWID==t2.ROWID and ("+columnsT1+")"
         else:
-            unionOfAllPairs += con1 +" and t1.ROWID!=t2.ROWID and ("+columnsT1+" and "+columnsT2+")"
-            unionOfAllTuples += con1 +" and t1.ROWID!=t2.ROWID and ("+columnsT1+" and "+columnsT2+")"
+            rowids = " and t1.ROWID<t2.ROWID and (" if symmetric else " and t1.ROWID!=t2.ROWID and ("
+            unionOfAllPairs += con1 +rowids+columnsT1+" and "+columnsT2+")"
+            unionOfAllTuples += con1 +rowids+columnsT1+" and "+columnsT2+")"
         count+=1
         
     return unionOfAllTuples,unionOfAllPairs,allColumns
 
-def constraints_check(df,constraintSets, allColumns, unionOfAllTuples, unionOfAllPairs):
+def constraints_check(df,constraintSets, allColumns, unionOfAllTuples, unionOfAllPairs, mode='sql', memoryBudget=1<<30, workDir=None, attribution=False):
     """
     constraints_check - runs the dynamic queries that have been generated on the database.
     This function will run two queries:
     1. unionOfAllTuples - returns the ids of the tuples participating in a violation of the constraints.
     2. unionOfAllPairs - returns pairs (i1,i2) of ids of tuples that jointly violate the constraints.
     
+    In the 'blocked' and 'partitioned' modes the queries are not used. The constraints are grouped by their
+    equality conditions and each group is checked in one pass over shared blocks of tuples (see detection.py).
+    The 'blocked' mode keeps everything in memory, while the 'partitioned' mode processes the database in
+    partitions that fit in memoryBudget and writes the violating pairs to an on-disk PairStore under workDir.
+    All the measures accept the store instead of a dataframe.
+    The 'parallel' mode checks the same groups on a pool of processes that read the columns from shared memory,
+    in tiles of rows and partitions of the blocks (see parallel_constraints_check).
+    The 'count' mode only finds the number of violating pairs (see count_constraints_check), which is all that
+    first_measurer_I_D and second_measurer_I_MI need. The tuples are not computed in this mode.
+    With attribution, the 'blocked', 'parallel' and 'partitioned' modes also find the constraints violated by
+    every pair, in the same pass (see detection.Attribution), for the measures of every constraint.
+    
     Parameters
     ----------
     constraintSets : set of strings
@@ -99,6 +130,17 @@ def constraints_check(df,constraintSets, allColumns, unionOfAllTuples, unionOfAl
     unionOfAllPairs : string    
     df : dataframe
         the database frame
+    mode : string
+        'sql' to run the queries, 'blocked' for the in-memory detection of detection.py, 'parallel' for the
+        detection on a pool of processes, 'partitioned' for databases whose violations do not fit in memory,
+        or 'count' to count the violating pairs
+    memoryBudget : int
+        the number of bytes available for the candidate pairs of a partition (not used in the 'sql' mode)
+    workDir : string
+        the directory of the spilled partitions and the pair store (in the 'partitioned' mode), or of the chunks
+        of pairs (in the 'parallel' mode)
+    attribution : bool
+        true to append the detection.Attribution of the pairs to the result (not in the 'sql' and 'count' modes)
         
     Returns
     -------
@@ -107,9 +149,21 @@ def constraints_check(df,constraintSets, allColumns, unionOfAllTuples, unionOfAl
         end1-start, end2-start2 are the running times the queries.
     """    
     
+    if attribution and mode not in ('blocked', 'parallel', 'partitioned'):
+        raise ValueError("the constraints of the pairs are only found in the 'blocked', 'parallel' and 'partitioned' modes")
+    if mode == 'count':
+        return det.count_constraints_check(df, constraintSets, memoryBudget)
+    if mode == 'blocked':
+        return det.blocked_constraints_check(df, constraintSets, memoryBudget, attribution)
+    if mode == 'parallel':
+        return det.parallel_constraints_check(df, constraintSets, memoryBudget, workDir, attribution=attribution)
+    if mode == 'partitioned':
+        return det.partitioned_constraints_check(df, constraintSets, memoryBudget, workDir, attribution)
+
     # finds the pairs of tuples that jointly violate a constraint
     start = time.time()    
-    violatingPairs =  psql.sqldf("SELECT DISTINCT * FROM (SELECT CASE WHEN t1ctid <= t2ctid THEN t1ctid ELSE t2ctid END AS id1,CASE WHEN t1ctid <= t2ctid THEN t2ctid ELSE t1ctid END AS id2 FROM ("+unionOfAllPairs+")AS A)AS B")
+    # the pairs of the queries are canonical and distinct (see build_dynamic_queries)
+    violatingPairs =  psql.sqldf("SELECT t1ctid AS id1,t2ctid AS id2 FROM ("+unionOfAllPairs+")AS A")
     end1 = time.time()
     
     # finds the tuples that participate in a violation
@@ -131,7 +185,7 @@ def first_measurer_I_D(uniquePairsDf):
     
     Parameters
     ----------
-    uniquePairsDf : dataframe
+    uniquePairsDf : dataframe or PairStore
         the result of the query that finds all pairs of tuples that jointly violate a constraint.
         
     Returns
@@ -143,13 +197,36 @@ def first_measurer_I_D(uniquePairsDf):
         return 1
     return 0
 
+def first_measurer_I_D_lazy(df, constraintSets):
+    """
+    first_measurer_I_D_lazy: computes the drastic inconsistency measure I_d without materializing the violating pairs.
+    The constraints are checked by is_consistent in detection.py, which stops at the first violation.
+    
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+        
+    Returns
+    -------
+    int
+        0 if database is consistent, and 1 otherwise
+    """  
+    if det.is_consistent(df, constraintSets):
+        return 0
+    return 1
+
 def second_measurer_I_MI(uniquePairsDf):
     """
     second_measurer_I_MI: computes the measure I_MI that counts the minimal inconsistent subsets of the database.
+    When the violating pairs were only counted (the 'count' mode of constraints_check), uniquePairsDf is a
+    PairCount and the pairs are never enumerated.
     
     Parameters
     ----------
-    uniquePairsDf : dataframe
+    uniquePairsDf : dataframe, PairStore or PairCount
         the result of the query that finds all pairs of tuples that jointly violate a constraint.
         
     Returns
@@ -178,7 +255,21 @@ def third_measurer_I_P(uniqueTuplesDf):
     
     return len(uniqueTuplesDf)
 
-def fourth_measurer_I_R(uniquePairsDf):
+# the gurobi environments of the threads of a pipelined simulation (see pipeline.py), an environment must not
+# be used by two threads at once
+_solverEnvs = threading.local()
+
+def _solver_env():
+    if threading.current_thread() is threading.main_thread():
+        return None
+    if not hasattr(_solverEnvs, 'env'):
+        env = gp.Env(empty=True)
+        env.setParam('OutputFlag', 0)
+        env.start()
+        _solverEnvs.env = env
+    return _solverEnvs.env
+
+def fourth_measurer_I_R(uniquePairsDf, start=None, lowerBound=None, withCover=False):
     """
     fourth_measurer_I_R: computes the measure I_R that is based on the minimal number of tuples that should
     be removed from the database for the constraints to hold.
@@ -190,40 +281,58 @@ def fourth_measurer_I_R(uniquePairsDf):
     
     Parameters
     ----------
-    uniquePairsDf : dataframe
+    uniquePairsDf : dataframe or PairStore
         the result of the query that finds all pairs of tuples that jointly violate a constraint.
+    start : set of int
+        the ids of a known cover of the pairs, given to the solver as a starting solution
+    lowerBound : int
+        a known lower bound of the measure, the solver stops as soon as it finds a cover of this size
+    withCover : bool
+        true to return the ids of the tuples of the optimal cover as well
         
     Returns
     -------
     list of two int variables:
         database_measurer.objVal is the minimal number of tuples that should be removed for the constraints to hold.
         end1 - start is the running time of the function.
+    and the set of the ids of the cover when withCover is true
     """ 
     
-    start = time.time()
-    rows_violations = uniquePairsDf.values
-    varsDict2 = {}
-    database_measurer = gp.Model('Minimal deletions of tuples')
-    database_measurer.setParam('OutputFlag', 0)  # do not show any comments on the screen 
-    
-    # variables
-    for i in rows_violations :
-        varsDict2[i[0]] = database_measurer.addVar(vtype=GRB.BINARY, name="x")
-        varsDict2[i[1]] = database_measurer.addVar(vtype=GRB.BINARY, name="x")
-    
-    # constraints
-    for i in rows_violations :
-        database_measurer.addConstr(varsDict2[i[0]]+varsDict2[i[1]]>=1, name='con')
-    vars= []
-    for i in varsDict2:
-        vars.append(varsDict2[i])
+    startTime = time.time()
+    with tracing.span('I_R.build') as record:
+        rows_violations = uniquePairsDf.values
+        varsDict2 = {}
+        database_measurer = gp.Model('Minimal deletions of tuples', env=_solver_env())
+        database_measurer.setParam('OutputFlag', 0)  # do not show any comments on the screen 
         
-    # objective function    
-    database_measurer.setObjective(sum(vars), GRB.MINIMIZE)
-    
-    opt = database_measurer.optimize()
+        # variables
+        for i in rows_violations :
+            varsDict2[i[0]] = database_measurer.addVar(vtype=GRB.BINARY, name="x")
+            varsDict2[i[1]] = database_measurer.addVar(vtype=GRB.BINARY, name="x")
+        
+        # constraints
+        for i in rows_violations :
+            database_measurer.addConstr(varsDict2[i[0]]+varsDict2[i[1]]>=1, name='con')
+        vars= []
+        for i in varsDict2:
+            vars.append(varsDict2[i])
+            
+        # objective function    
+        database_measurer.setObjective(sum(vars), GRB.MINIMIZE)
+        if start is not None:
+            for i in varsDict2:
+                varsDict2[i].Start = 1 if i in start else 0
+        if lowerBound is not None:
+            database_measurer.setParam('BestObjStop', lowerBound)
+        record['variables'] = len(varsDict2)
+        record['constraints'] = len(rows_violations)
+    
+    with tracing.span('I_R.solve'):
+        opt = database_measurer.optimize()
     end1 = time.time()
-    return database_measurer.objVal , end1 - start
+    if withCover:
+        return database_measurer.objVal , end1 - startTime, set(i for i in varsDict2 if varsDict2[i].X > 0.5)
+    return database_measurer.objVal , end1 - startTime
 
 def fifth_measurer_I_lin_R(uniquePairsDf):
     """
@@ -236,7 +345,7 @@ def fifth_measurer_I_lin_R(uniquePairsDf):
     
     Parameters
     ----------
-    uniquePairsDf : dataframe
+    uniquePairsDf : dataframe or PairStore
         the result of the query that finds all pairs of tuples that jointly violate a constraint.
         
     Returns
@@ -247,31 +356,35 @@ def fifth_measurer_I_lin_R(uniquePairsDf):
     """ 
     
     start = time.time()
-    rows_violations = uniquePairsDf.values
-    varsDict2 = {}
-    database_measurer = gp.Model('Minimal deletions of tuples relaxed')
-    database_measurer.setParam('OutputFlag', 0)  # do not show any comments on the screen 
-    
-    # variables
-    for i in rows_violations :
-        varsDict2[i[0]] = database_measurer.addVar(lb=0, ub=1, vtype=GRB.CONTINUOUS, name="x")
-        varsDict2[i[1]] = database_measurer.addVar(lb=0, ub=1, vtype=GRB.CONTINUOUS, name="x")
-    
-    # constraints
-    for i in rows_violations :
-        database_measurer.addConstr(varsDict2[i[0]]+varsDict2[i[1]]>=1, name='con')
-    vars= []
-    for i in varsDict2:
-        vars.append(varsDict2[i])
-    
-    # objective function
-    database_measurer.setObjective(sum(vars), GRB.MINIMIZE)
-    
-    opt = database_measurer.optimize()
+    with tracing.span('I_lin_R.build') as record:
+        rows_violations = uniquePairsDf.values
+        varsDict2 = {}
+        database_measurer = gp.Model('Minimal deletions of tuples relaxed', env=_solver_env())
+        database_measurer.setParam('OutputFlag', 0)  # do not show any comments on the screen 
+        
+        # variables
+        for i in rows_violations :
+            varsDict2[i[0]] = database_measurer.addVar(lb=0, ub=1, vtype=GRB.CONTINUOUS, name="x")
+            varsDict2[i[1]] = database_measurer.addVar(lb=0, ub=1, vtype=GRB.CONTINUOUS, name="x")
+        
+        # constraints
+        for i in rows_violations :
+            database_measurer.addConstr(varsDict2[i[0]]+varsDict2[i[1]]>=1, name='con')
+        vars= []
+        for i in varsDict2:
+            vars.append(varsDict2[i])
+        
+        # objective function
+        database_measurer.setObjective(sum(vars), GRB.MINIMIZE)
+        record['variables'] = len(varsDict2)
+        record['constraints'] = len(rows_violations)
+    
+    with tracing.span('I_lin_R.solve'):
+        opt = database_measurer.optimize()
     end2 = time.time()
     return database_measurer.objVal , end2 -start
 
-def sixth_measurer_I_MC(fullPath, uniquePairsDf):
+def sixth_measurer_I_MC(fullPath, uniquePairsDf, numOfRows=None):
     """
     sixth_measurer_I_MC: computes the measure I_MC that counts the maximal consistent subsets (i.e., repairs),
     which are also the maximal independent sets of the conflict graph wherein nodes represent tuples
@@ -283,8 +396,10 @@ def sixth_measurer_I_MC(fullPath, uniquePairsDf):
     ----------
     fullPath : string
         the path of the directory where the graph will be generated
-    uniquePairsDf : dataframe
+    uniquePairsDf : dataframe or PairStore
          the result of the query that finds all pairs of tuples that jointly violate a constraint.
+    numOfRows : int
+        the number of tuples in the database (by default, the number of rows of the global df)
         
     Returns
     -------
@@ -294,57 +409,221 @@ def sixth_measurer_I_MC(fullPath, uniquePairsDf):
     """
     
     start = time.time()
-    rows_violations = uniquePairsDf.values
-    num_of_rows = len(df.index)
-
-    varsDict = {}
-    for i in range(num_of_rows):
-        varsDict[i] = num_of_rows - 1 - numpy.count_nonzero(rows_violations == i+1) 
-    
-    # cart_prod contains all possible edges in the graph
-    all_rows1 = list(range(0, num_of_rows)) 
-    all_rows2 = list(range(0, num_of_rows)) 
-    cart_prod = [(a,b,1) for a in all_rows1 for b in all_rows2]
-    rows_violations = rows_violations - 1
-    
-    # for each pair that violates the constraints turn off the valid bit
-    for i in rows_violations:
-        lst = list(cart_prod[i[0]*num_of_rows+i[1]])
-        lst[2] = 0
-        cart_prod[i[0]*num_of_rows+i[1]] = tuple(lst)
-        lst = list(cart_prod[i[1]*num_of_rows+i[0]])
-        lst[2] = 0
-        cart_prod[i[1]*num_of_rows+i[0]] = tuple(lst)
-    
-    graphFileName = fullPath + '/graph.nde'
-
-    f = open(graphFileName, "w+")
-    
-    # construct the nodes with their degrees [degree = number of rows - 1 - number of appereances in rows_vioalations]
-    f.write(str(num_of_rows))
-    for k, v in varsDict.items():
-        f.write('\n'+ str(k) + ' '+ str(v))
-    
-    # construct the edges 
-    for i in cart_prod:
-        if i[2] and i[0]!=i[1]:
-            f.write('\n'+str(i[0]) + ' '+ str(i[1]))
+    with tracing.span('I_MC.graph') as record:
+        rows_violations = uniquePairsDf.values
+        num_of_rows = len(df.index) if numOfRows is None else numOfRows
+
+        varsDict = {}
+        for i in range(num_of_rows):
+            varsDict[i] = num_of_rows - 1 - numpy.count_nonzero(rows_violations == i+1) 
+    
+        # cart_prod contains all possible edges in the graph
+        all_rows1 = list(range(0, num_of_rows)) 
+        all_rows2 = list(range(0, num_of_rows)) 
+        cart_prod = [(a,b,1) for a in all_rows1 for b in all_rows2]
+        rows_violations = rows_violations - 1
+    
+        # for each pair that violates the constraints turn off the valid bit
+        for i in rows_violations:
+            lst = list(cart_prod[i[0]*num_of_rows+i[1]])
+            lst[2] = 0
+            cart_prod[i[0]*num_of_rows+i[1]] = tuple(lst)
             lst = list(cart_prod[i[1]*num_of_rows+i[0]])
             lst[2] = 0
             cart_prod[i[1]*num_of_rows+i[0]] = tuple(lst)
     
-    f.close()    
-    
-    # locate the full path to the graph and text_ui
-    buildFullPath = os.path.abspath("parallel_enum/build/text_ui")
-    graphFullPath = os.path.abspath(graphFileName)
-    
-    # invoke the algorithm for enumerating maximal cliques with the graph as a parameter
-    result = run(buildFullPath+' -system="clique" '+ graphFullPath,shell=True,capture_output=True)
-    results = ""
-    results = result.stdout
-    result_output = int((str(results.split()[14]).replace('b',"").replace("'","")))
+        graphFileName = fullPath + '/graph.nde'
+
+        f = open(graphFileName, "w+")
+    
+        # construct the nodes with their degrees [degree = number of rows - 1 - number of appereances in rows_vioalations]
+        f.write(str(num_of_rows))
+        for k, v in varsDict.items():
+            f.write('\n'+ str(k) + ' '+ str(v))
+    
+        # construct the edges 
+        for i in cart_prod:
+            if i[2] and i[0]!=i[1]:
+                f.write('\n'+str(i[0]) + ' '+ str(i[1]))
+                lst = list(cart_prod[i[1]*num_of_rows+i[0]])
+                lst[2] = 0
+                cart_prod[i[1]*num_of_rows+i[0]] = tuple(lst)
+    
+        f.close()    
+        record['nodes'] = num_of_rows
+        record['conflicts'] = len(rows_violations)
+    
+    with tracing.span('I_MC.enumerate') as record:
+        # locate the full path to the graph and text_ui
+        buildFullPath = os.path.abspath("parallel_enum/build/text_ui")
+        graphFullPath = os.path.abspath(graphFileName)
+    
+        # invoke the algorithm for enumerating maximal cliques with the graph as a parameter
+        result = run(buildFullPath+' -system="clique" '+ graphFullPath,shell=True,capture_output=True)
+        results = ""
+        results = result.stdout
+        result_output = int((str(results.split()[14]).replace('b',"").replace("'","")))
+        record['cliques'] = result_output
     
     end = time.time()
     return result_output, end - start 
 
+
+def violation_measures(df, constraintSets, allConstraints, measuresToRun, fullPath, detectionMode='sql', memoryBudget=1<<30):
+    """
+    violation_measures: detects the violations of the constraints in the database and computes the measures
+    that are read directly from the violations, I_D, I_MI and I_P.
+    The detection, the conflict graph and each measure are recorded as spans of the active tracer.
+    In case only I_D is computed, the violating pairs are not materialized (see first_measurer_I_D_lazy).
+
+    Parameters
+    ----------
+    see compute_measures
+
+    Returns
+    -------
+    dictionary from I_D, I_MI and I_P (the selected ones) to their values, and the result of constraints_check
+    (None when the violations were not detected)
+    """
+    values = {}
+    onlyDrastic = measuresToRun["I_D"] and not any(measuresToRun[m] for m in measuresToRun if m != "I_D")
+    if onlyDrastic:
+        with tracing.span('I_D'):
+            values["I_D"] = first_measurer_I_D_lazy(df, constraintSets)
+        return values, None
+
+    with tracing.span('detection', mode=detectionMode) as record:
+        sdfc = constraints_check(df, constraintSets, allConstraints[2], allConstraints[0], allConstraints[1], detectionMode, memoryBudget, fullPath)
+        record['pairs'] = len(sdfc[0])
+        if sdfc[1] is not None:
+            record['tuples'] = len(sdfc[1])
+
+    # the components are only counted for the trace
+    if tracing.ACTIVE is not None and detectionMode != 'count':
+        with tracing.span('graph') as record:
+            nodes, labels = cg.connected_components(sdfc[0].values)
+            record['nodes'] = len(nodes)
+            record['components'] = int(labels.max()) + 1 if len(labels) else 0
+
+    if (measuresToRun["I_D"]):
+        with tracing.span('I_D'):
+            values["I_D"] = first_measurer_I_D(sdfc[0])
+    if (measuresToRun["I_MI"]):
+        with tracing.span('I_MI'):
+            values["I_MI"] = second_measurer_I_MI(sdfc[0])
+    if (measuresToRun["I_P"]):
+        with tracing.span('I_P'):
+            values["I_P"] = third_measurer_I_P(sdfc[1])
+    return values, sdfc
+
+def pair_measures(uniquePairsDf, measuresToRun, fullPath, numOfRows, memo=None):
+    """
+    pair_measures: computes the measures that are solved on the conflict graph, I_R, I_lin_R and I_MC, from the
+    violating pairs found by violation_measures. Each measure is recorded as a span of the active tracer.
+    I_MC_log is the natural logarithm of I_MC, counted exactly on small components of the conflict graph and
+    estimated on the others, so that it takes a bounded time (see mcapprox.py). Its standard error is returned
+    as I_MC_log_err.
+
+    Parameters
+    ----------
+    uniquePairsDf : dataframe
+        the pairs of ids of tuples that jointly violate a constraint
+    measuresToRun : dictionary
+        the measures to compute, from the names in MEASURES to bool
+    fullPath : string
+        the directory where the graph of I_MC is generated
+    numOfRows : int
+        the number of tuples in the database
+    memo : MeasureMemo
+        see compute_measures
+
+    Returns
+    -------
+    dictionary from I_R, I_lin_R, I_MC and I_MC_log (the selected ones) to their values
+    """
+    values = {}
+    approximateMC = measuresToRun.get("I_MC_log", False)
+    memoMeasures = [m for m in ("I_R", "I_lin_R", "I_MC") if measuresToRun[m]]
+    if approximateMC:
+        memoMeasures += ["I_MC_log", "I_MC_log_var"]
+    if memo is not None and memoMeasures:
+        with tracing.span('memo') as record:
+            values.update(memo.evaluate(uniquePairsDf.values, memoMeasures, fullPath))
+            record['computed'] = memo.lastComputed
+            record['reused'] = memo.lastReused
+    if (measuresToRun["I_R"]) and "I_R" not in values:
+        with tracing.span('I_R'):
+            values["I_R"] = fourth_measurer_I_R(uniquePairsDf)[0]
+    if (measuresToRun["I_lin_R"]) and "I_lin_R" not in values:
+        with tracing.span('I_lin_R'):
+            values["I_lin_R"] = fifth_measurer_I_lin_R(uniquePairsDf)[0]
+    if (measuresToRun["I_MC"]) and "I_MC" not in values:
+        with tracing.span('I_MC'):
+            values["I_MC"] = sixth_measurer_I_MC(fullPath, uniquePairsDf, numOfRows)[0]
+    if approximateMC and "I_MC_log" not in values:
+        with tracing.span('I_MC_log'):
+            values["I_MC_log"], values["I_MC_log_err"] = mcapprox.log_count_I_MC(uniquePairsDf.values)
+    if "I_MC_log_var" in values:
+        values["I_MC_log_err"] = math.sqrt(values.pop("I_MC_log_var"))
+    return values
+
+def compute_measures(df, constraintSets, allConstraints, measuresToRun, fullPath, detectionMode='sql', memoryBudget=1<<30, withPairs=False, memo=None):
+    """
+    compute_measures: detects the violations of the constraints in the database and computes the selected measures.
+    Every phase (the violation detection, the conflict graph and each measure) is recorded as a span of the active
+    tracer (see tracing.py), together with the number of violating pairs, tuples and connected components.
+    In case only I_D is computed, the violating pairs are not materialized (see first_measurer_I_D_lazy).
+    The work is split between violation_measures and pair_measures, which the pipelined simulations run in
+    different threads (see pipeline.py).
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : set of strings
+        each string represents a constraint from the dcs file
+    allConstraints : list of three strings
+        the result of build_dynamic_queries
+    measuresToRun : dictionary
+        the measures to compute, from the names in MEASURES to bool
+    fullPath : string
+        the directory of the results, where the graph of I_MC and the pair store are generated
+    detectionMode, memoryBudget :
+        the parameters of constraints_check
+    withPairs : bool
+        true to return the violating pairs as well
+    memo : MeasureMemo
+        when given, I_R, I_lin_R and I_MC are computed per connected component of the conflict graph and reuse
+        the values of the components that did not change since the previous call (see measurememo.py)
+
+    Returns
+    -------
+    dictionary from the names of the selected measures to their values, and with withPairs the (n,2) array of
+    the violating pairs (None when the pairs were not enumerated)
+    """
+    values, sdfc = violation_measures(df, constraintSets, allConstraints, measuresToRun, fullPath, detectionMode, memoryBudget)
+    if sdfc is None:
+        return (values, None) if withPairs else values
+    values.update(pair_measures(sdfc[0], measuresToRun, fullPath, len(df.index), memo))
+    if withPairs:
+        return values, (sdfc[0].values if detectionMode != 'count' else None)
+    return values
+
+def estimate_checkpoint(df, constraintSets, measuresToRun, sampleBudget=10000):
+    """
+    estimate_checkpoint: the values of the selected measures at an intermediate checkpoint of a simulation, where
+    I_MI, I_P and I_R are estimated from samples (see estimators.py) and I_D is computed exactly.
+    I_lin_R and I_MC are not estimated.
+
+    Returns
+    -------
+    dictionary from the measures to their values, and dictionary from the estimated measures to tuples
+    (estimate, low, high)
+    """
+    with tracing.span('estimation'):
+        estimated = estimators.estimate_measures(df, constraintSets, sampleBudget)
+    intervals = dict((m, estimated[m]) for m in estimated if measuresToRun[m])
+    values = dict((m, intervals[m][0]) for m in intervals)
+    if (measuresToRun["I_D"]):
+        values["I_D"] = first_measurer_I_D_lazy(df, constraintSets)
+    return values, intervals
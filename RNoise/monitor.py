@@ -0,0 +1,258 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import dataloader as loader
+import dcimplication
+import liveindex
+
+DEFAULT_MEASURES = {"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":False, "I_MC":False, "I_MC_log":False}
+
+def _to_json(value):
+    # numpy scalars and other values that json does not know
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def parse_change(line):
+    """
+    parse_change - reads a change of the change log. A line is either a change of a cell [row, column, value],
+    the format of the mutation log of the simulations (see checkpoint.py), or an object with an op:
+    {"op": "update", "row": ..., "column": ..., "value": ...}, {"op": "insert", "values": {column: value, ...}}
+    or {"op": "delete", "row": ...}. The rows are the positions of the tuples in the loaded database, the
+    inserted tuples follow the last one.
+
+    Parameters
+    ----------
+    line : string
+        a JSON line of the change log
+
+    Returns
+    -------
+    tuple (op, row, column, value), with the values of the tuple as value for an insert, or None for an empty
+    line
+    """
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    if isinstance(record, list):
+        row, column, value = record
+        return ('update', int(row), column, value)
+    op = record.get('op', 'update')
+    if op == 'update':
+        return (op, int(record['row']), record['column'], record.get('value'))
+    if op == 'insert':
+        return (op, None, None, record['values'])
+    if op == 'delete':
+        return (op, int(record['row']), None, None)
+    raise ValueError('unknown change ' + line)
+
+def read_changes(source, follow=False, pollInterval=0.05):
+    """
+    read_changes - the changes of a change log, read as they are appended.
+
+    Parameters
+    ----------
+    source : string or file
+        the path of the log, '-' for the standard input
+    follow : bool
+        true to keep reading the lines appended to the file after its end (like tail -f) instead of stopping
+    pollInterval : float
+        the number of seconds between two reads at the end of a followed file
+
+    Returns
+    -------
+    generator of changes, as returned by parse_change, and of None while a followed file has no new lines
+    """
+    if isinstance(source, str):
+        f = sys.stdin if source == '-' else open(source, 'r')
+    else:
+        f = source
+    try:
+        partial = ''
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    break
+                yield None
+                time.sleep(pollInterval)
+                continue
+            if not line.endswith('\n') and follow:
+                # the line is still being written
+                partial += line
+                continue
+            change = parse_change(partial + line)
+            partial = ''
+            if change is not None:
+                yield change
+        if partial:
+            change = parse_change(partial)
+            if change is not None:
+                yield change
+    finally:
+        if f is not source and f is not sys.stdin:
+            f.close()
+
+class Monitor(object):
+    """
+    Monitor - keeps the measures of a database up to date while a change log is applied to it, and writes a
+    snapshot of the measures after every change, or at most every interval milliseconds. The violating pairs
+    and the measures are updated by liveindex.LiveMeasures, the same updates the simulations make in their
+    'live' detection mode, so the update of a single tuple takes a time that depends on the tuples that share
+    its equality conditions rather than on the size of the database.
+
+    Every snapshot is a JSON line with the number of changes applied, the time, the mean and the maximal time of
+    the updates since the previous snapshot (in milliseconds), the number of tuples and the values of the
+    measures.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame, see liveindex.LiveViolations
+    constraintSets : list of strings
+        the constraints from the dcs file, the constraints implied by others are not checked (see
+        dcimplication.reduce_constraints)
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    output : file
+        the file the snapshots are written to
+    interval : float
+        the minimal number of milliseconds between two snapshots, 0 for a snapshot after every change
+    fullPath : string
+        the directory where the graph of I_MC is generated
+    memoryBudget : int
+        the number of bytes the detection of the initial violations may use
+    """
+
+    def __init__(self, df, constraintSets, measuresToRun, output, interval=0, fullPath='.', memoryBudget=1<<30):
+        constraints = dcimplication.reduce_constraints(constraintSets)[0]
+        self.live = liveindex.LiveMeasures(df, constraints, measuresToRun, fullPath, memoryBudget)
+        # the objects of the indexes live as long as the monitor, they are moved out of the generations of the
+        # garbage collector so that its full collections do not stall the updates
+        gc.freeze()
+        self.output = output
+        self.interval = interval / 1000.0
+        self.changes = 0
+        self.tuples = len(df.index)
+        self.updateTimes = []
+        self.lastSnapshot = None
+
+    def apply(self, change):
+        """
+        apply - applies a change, as returned by parse_change.
+        """
+        op, row, column, value = change
+        start = time.perf_counter()
+        if op == 'update':
+            self.live.apply([(row, column, value)])
+        elif op == 'insert':
+            self.live.insert(value)
+            self.tuples += 1
+        elif not self.live.violations.deleted[row]:
+            self.live.delete(row)
+            self.tuples -= 1
+        self.updateTimes.append(time.perf_counter() - start)
+        self.changes += 1
+
+    def due(self):
+        """
+        due - true if there are changes since the last snapshot and the interval has passed.
+        """
+        if self.lastSnapshot is not None and not self.updateTimes:
+            return False
+        return self.lastSnapshot is None or time.time() - self.lastSnapshot >= self.interval
+
+    def snapshot(self):
+        """
+        snapshot - writes the measures after the changes applied so far.
+
+        Returns
+        -------
+        dictionary, the snapshot
+        """
+        record = {'changes': self.changes, 'time': time.time(), 'tuples': self.tuples}
+        if self.updateTimes:
+            record['update_ms'] = 1000 * sum(self.updateTimes) / len(self.updateTimes)
+            record['max_update_ms'] = 1000 * max(self.updateTimes)
+        record.update(self.live.measures())
+        self.output.write(json.dumps(record, default=_to_json) + '\n')
+        self.output.flush()
+        self.updateTimes = []
+        self.lastSnapshot = record['time']
+        return record
+
+    def run(self, changes):
+        """
+        run - applies the changes and writes the snapshots, and a last snapshot of the changes that were not
+        written yet when the changes end.
+
+        Parameters
+        ----------
+        changes : iterable of changes
+            as returned by read_changes, a None is a pause where a due snapshot is written
+
+        Returns
+        -------
+        int, the number of applied changes
+        """
+        self.snapshot()
+        for change in changes:
+            if change is not None:
+                self.apply(change)
+            if self.due():
+                self.snapshot()
+        if self.updateTimes:
+            self.snapshot()
+        return self.changes
+
+def run_monitor(database_name, changeLog='-', measuresToRun=DEFAULT_MEASURES, interval=0, output=None, follow=False, memoryBudget=1<<30):
+    """
+    run_monitor - monitors the measures of a database while the changes of a change log are applied to it
+    (see Monitor and parse_change).
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database and its dcs.txt
+    changeLog : string
+        the path of the change log, '-' for the standard input. The mutation log of a simulation
+        (mutations.jsonl) replays the simulation.
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    interval : float
+        the minimal number of milliseconds between two snapshots, 0 for a snapshot after every change
+    output : string
+        the path of the file the snapshots are appended to, the standard output by default
+    follow : bool
+        true to wait for the changes appended to the change log instead of stopping at its end
+    memoryBudget : int
+        the number of bytes the detection of the initial violations may use
+
+    Returns
+    -------
+    int, the number of applied changes
+    """
+    df = loader.load_database(database_name)
+    f = sys.stdout if output is None else open(output, 'a')
+    try:
+        fullPath = os.path.dirname(os.path.abspath(output)) if output is not None else '.'
+        monitor = Monitor(df, loader.load_constraints(database_name), measuresToRun, f, interval, fullPath, memoryBudget)
+        return monitor.run(read_changes(changeLog, follow))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monitors the measures of a database while a change log is applied to it.')
+    parser.add_argument('database')
+    parser.add_argument('--log', default='-', help="the change log, '-' for the standard input")
+    parser.add_argument('--interval', type=float, default=0, help='the minimal number of milliseconds between two snapshots')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--follow', action='store_true')
+    parser.add_argument('--measures', nargs='+', default=[m for m in DEFAULT_MEASURES if DEFAULT_MEASURES[m]])
+    args = parser.parse_args()
+    run_monitor(args.database, args.log, dict((m, m in args.measures) for m in DEFAULT_MEASURES), args.interval, args.output, args.follow)
@@ -0,0 +1,172 @@
+import pandas as pd
+import numpy as numpy
+import argparse
+import math
+import os
+import time
+import dataloader as loader
+import dcimplication
+import detection as det
+import dynamiccover
+import measurememo
+import measurments as meas
+import results
+import tracing
+
+DEFAULT_MEASURES = {"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":False, "I_MC":False, "I_MC_log":False}
+
+class StreamingMeasures(object):
+    """
+    StreamingMeasures - the measures of a database that grows by appending chunks of tuples (daily batches, a
+    chunked csv file...), updated after every chunk without checking the old tuples against each other again.
+    The violating pairs of a chunk are found by an AppendIndex (see detection.py), which matches the new tuples
+    with the old ones through sort indexes of the equality conditions that persist across chunks. Appending
+    tuples only adds violating pairs, so I_D, I_MI and I_P are updated from the new pairs, I_R is maintained by a
+    DynamicCover and I_lin_R and I_MC reuse the values of the components that did not change (see
+    measurememo.py).
+
+    Parameters
+    ----------
+    constraintSets : list of strings
+        the constraints from the dcs file, the constraints implied by others are not checked (see
+        dcimplication.reduce_constraints)
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    fullPath : string
+        the directory where the graph of I_MC is generated
+    memoryBudget : int
+        the number of bytes that the candidate pairs may use at once
+    """
+
+    def __init__(self, constraintSets, measuresToRun, fullPath, memoryBudget=1<<30):
+        self.constraints, self.removedConstraints = dcimplication.reduce_constraints(constraintSets)
+        self.measuresToRun = dict(measuresToRun)
+        self.fullPath = fullPath
+        self.maxPairs = max(1, memoryBudget // det.PAIR_BYTES)
+        self.df = None
+        self.index = det.AppendIndex()
+        self.pairs = numpy.zeros((0, 2), dtype=numpy.int64)
+        self.tuples = numpy.zeros(0, dtype=numpy.int64)
+        self.cover = dynamiccover.DynamicCover()
+        self.memo = measurememo.MeasureMemo()
+
+    def append(self, chunk):
+        """
+        append - adds a chunk of tuples to the database and returns the measures of the whole database.
+        The tuples of the chunk get the ids that follow the ids of the tuples appended before.
+
+        Parameters
+        ----------
+        chunk : dataframe
+            the new tuples, with the columns of the database
+
+        Returns
+        -------
+        dictionary from the names of the selected measures to their values
+        """
+        self.df = chunk.reset_index(drop=True) if self.df is None else pd.concat([self.df, chunk], ignore_index=True)
+        with tracing.span('detection', mode='append') as record:
+            plan = det.compile_constraints(self.constraints, self.df)
+            chunks = []
+            self.index.append_violations(self.df, plan, lambda id1, id2: chunks.append((id1, id2)), self.maxPairs)
+            newPairs = det.unique_pairs(chunks)
+            self.pairs = numpy.concatenate([self.pairs, newPairs])
+            self.tuples = numpy.union1d(self.tuples, newPairs)
+            record['pairs'] = len(self.pairs)
+            record['new_pairs'] = len(newPairs)
+
+        values = {}
+        if self.measuresToRun.get("I_D"):
+            values["I_D"] = meas.first_measurer_I_D(self.pairs)
+        if self.measuresToRun.get("I_MI"):
+            values["I_MI"] = meas.second_measurer_I_MI(self.pairs)
+        if self.measuresToRun.get("I_P"):
+            values["I_P"] = meas.third_measurer_I_P(self.tuples)
+        if self.measuresToRun.get("I_R"):
+            with tracing.span('I_R'):
+                values["I_R"] = self.cover.update(newPairs, numpy.zeros((0, 2), dtype=numpy.int64))
+        memoMeasures = [m for m in ("I_lin_R", "I_MC") if self.measuresToRun.get(m)]
+        if self.measuresToRun.get("I_MC_log"):
+            memoMeasures += ["I_MC_log", "I_MC_log_var"]
+        if memoMeasures:
+            with tracing.span('memo') as record:
+                values.update(self.memo.evaluate(self.pairs, memoMeasures, self.fullPath))
+                record['computed'] = self.memo.lastComputed
+                record['reused'] = self.memo.lastReused
+        if "I_MC_log_var" in values:
+            values["I_MC_log_err"] = math.sqrt(values.pop("I_MC_log_var"))
+        return values
+
+def stream_measures(chunks, constraintSets, measuresToRun, fullPath, memoryBudget=1<<30):
+    """
+    stream_measures - the measures of a growing database after every chunk of tuples.
+
+    Parameters
+    ----------
+    chunks : iterable of dataframes
+        the chunks of tuples, for example loader.read_chunks or pd.read_csv(..., chunksize=...)
+    constraintSets, measuresToRun, fullPath, memoryBudget :
+        see StreamingMeasures
+
+    Returns
+    -------
+    generator of pairs (number of tuples so far, dictionary of the values of the measures)
+    """
+    streaming = StreamingMeasures(constraintSets, measuresToRun, fullPath, memoryBudget)
+    for chunk in chunks:
+        values = streaming.append(chunk)
+        yield len(streaming.df.index), values
+
+def runTestStream(database_name, chunkSize=10000, measuresToRun=DEFAULT_MEASURES, memoryBudget=1<<30, chunks=None, resultsFormat='csv', batchSize=100):
+    """
+    runTestStream - computes the measures of a database fed in chunks of rows, after every chunk. The results
+    file has a row per chunk, and its iteration column is the number of tuples read so far.
+
+    Parameters
+    ----------
+    database_name : string
+        the name of the folder containing the database and its dcs.txt
+    chunkSize : int
+        the number of rows read from inputDB.csv at a time
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    memoryBudget : int
+        the number of bytes available for the violation detection
+    chunks : iterable of dataframes
+        the chunks of tuples, instead of reading inputDB.csv
+    resultsFormat, batchSize :
+        see runTestRand
+
+    Returns
+    -------
+    string, the path of the results file
+    """
+    while True:
+        fullPath = 'Data/' + database_name + '/' + str(time.time()) + '_stream'
+        try:
+            os.makedirs(fullPath)
+            break
+        except FileExistsError:
+            continue
+    writer = results.ResultsWriter(fullPath + '/results.' + resultsFormat, {'database': database_name, 'chunk_size': chunkSize}, batchSize)
+    tracer = tracing.activate(tracing.Tracer(fullPath + '/trace.jsonl', database=database_name, run_id=writer.runId))
+    if chunks is None:
+        chunks = loader.read_chunks(database_name, chunkSize)
+    streaming = StreamingMeasures(loader.load_constraints(database_name), measuresToRun, fullPath, memoryBudget)
+    for count, chunk in enumerate(chunks):
+        tracing.set_iteration(count)
+        values = streaming.append(chunk)
+        writer.append(len(streaming.df.index), values, tracing.iteration_times())
+    tracing.set_iteration(None)
+    writer.close()
+    tracer.close()
+    tracing.activate(None)
+    return writer.fileName
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Computes the measures of a database read in chunks of rows, after every chunk.')
+    parser.add_argument('database')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--measures', nargs='+', default=[m for m in DEFAULT_MEASURES if DEFAULT_MEASURES[m]])
+    args = parser.parse_args()
+    print(runTestStream(args.database, args.chunk_size, dict((m, m in args.measures) for m in DEFAULT_MEASURES)))
@@ -0,0 +1,124 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import time
+import incorer2 as inc
+
+DEFAULT_MEASURES = {"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False, "I_MC_log":False}
+
+# the databases prepared by run_sweep, from a database name to the result of prepare_database
+PREPARED = {}
+
+def _init_worker(prepared):
+    # with the fork start method the workers already share the prepared databases with the parent
+    PREPARED.update(prepared)
+
+def _run_grid_point(point):
+    runConfig, kwargs = point
+    resultsFileName = inc.runTestRand(runConfig['database'], runConfig['err_rate'], runConfig['skew'], runConfig['typo_prob'], PREPARED[runConfig['database']]['measuresToRun'], seed=runConfig['seed'], prepared=PREPARED[runConfig['database']], **kwargs)
+    runConfig = dict(runConfig)
+    runConfig['results'] = resultsFileName
+    return runConfig
+
+def experiment_grid(databases, errRates, skews, typoProbs, seeds=(None,)):
+    """
+    experiment_grid - the configurations of a sweep, every combination of a database, an error rate, a skew,
+    a typo propability and a seed. Missing seeds are drawn at random, so that parallel runs differ.
+
+    Returns
+    -------
+    list of dictionaries with the keys database, err_rate, skew, typo_prob and seed
+    """
+    seedSource = random.SystemRandom()
+    grid = []
+    for database_name, errRate, skew, typoProb, seed in itertools.product(databases, errRates, skews, typoProbs, seeds):
+        grid.append({'database': database_name, 'err_rate': errRate, 'skew': skew, 'typo_prob': typoProb,
+                     'seed': seed if seed is not None else seedSource.randrange(2**32)})
+    return grid
+
+def run_sweep(databases, errRates=(0.01,), skews=(0,), typoProbs=(0.5,), measuresToRun=DEFAULT_MEASURES, seeds=(None,), workers=1, detectionMode='sql', memoryBudget=1<<30, indexFileName=None, **kwargs):
+    """
+    run_sweep - runs runTestRand on every configuration of the grid of databases x error rates x skews x
+    typo propabilities x seeds.
+
+    Every database is loaded once, and its constraints, dynamic queries, value propabilities (for every skew)
+    and the measures of the clean database are computed once by prepare_database and shared by all its runs.
+    The runs are scheduled on a pool of worker processes, the longest runs (the highest error rates) first.
+    With the fork start method the workers inherit the prepared databases instead of copying them.
+
+    Parameters
+    ----------
+    databases : list of strings
+        the names of the folders containing the databases
+    errRates, skews, typoProbs : lists of float
+        the values of err_rate, skew and typo_prob of runTestRand
+    measuresToRun : dictionary
+        the measures computed by every run
+    seeds : list of int
+        the seeds of every configuration, None for a random seed (several Nones repeat a configuration)
+    workers : int
+        the number of runs at a time, 1 to run in this process
+    detectionMode, memoryBudget :
+        the parameters of constraints_check
+    indexFileName : string
+        a JSON lines file where the configuration and the results file of every finished run are appended
+    kwargs :
+        other parameters of runTestRand (estimateCheckpoints, resultsFormat...)
+
+    Returns
+    -------
+    list of dictionaries, the configuration of every run with the path of its results file under 'results'
+    """
+    grid = experiment_grid(databases, errRates, skews, typoProbs, seeds)
+    grid.sort(key=lambda runConfig: -runConfig['err_rate'])
+    kwargs = dict(kwargs, detectionMode=detectionMode, memoryBudget=memoryBudget)
+
+    prepared = {}
+    for database_name in databases:
+        start = time.time()
+        prepared[database_name] = inc.prepare_database(database_name, measuresToRun, detectionMode, memoryBudget, skews, useBaselineCache=kwargs.get('useBaselineCache', True))
+        print('Prepared ' + database_name + ' in ' + str(time.time() - start))
+    _init_worker(prepared)
+
+    points = [(runConfig, kwargs) for runConfig in grid]
+    finished = []
+    indexFile = open(indexFileName, 'a') if indexFileName is not None else None
+    try:
+        if workers <= 1:
+            runs = map(_run_grid_point, points)
+            pool = None
+        else:
+            context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+            pool = context.Pool(workers, initializer=_init_worker, initargs=(prepared,))
+            runs = pool.imap_unordered(_run_grid_point, points)
+        for runConfig in runs:
+            finished.append(runConfig)
+            if indexFile is not None:
+                indexFile.write(json.dumps(runConfig) + '\n')
+                indexFile.flush()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if indexFile is not None:
+            indexFile.close()
+    return finished
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the noise simulation of runTestRand on a grid of configurations.')
+    parser.add_argument('databases', nargs='+')
+    parser.add_argument('--err-rates', type=float, nargs='+', default=[0.01])
+    parser.add_argument('--skews', type=float, nargs='+', default=[0])
+    parser.add_argument('--typo-probs', type=float, nargs='+', default=[0.5])
+    parser.add_argument('--seeds', type=int, nargs='+', default=None)
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every configuration with random seeds')
+    parser.add_argument('--measures', nargs='+', default=[m for m in DEFAULT_MEASURES if DEFAULT_MEASURES[m]])
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--mode', default='sql', help='the detection mode of constraints_check')
+    parser.add_argument('--index', default='sweep_runs.jsonl')
+    args = parser.parse_args()
+    measuresToRun = dict((m, m in args.measures) for m in DEFAULT_MEASURES)
+    seeds = args.seeds if args.seeds is not None else [None] * args.repeat
+    run_sweep(args.databases, args.err_rates, args.skews, args.typo_probs, measuresToRun, seeds, args.workers, args.mode, indexFileName=args.index)
@@ -0,0 +1,42 @@
+import random
+import numpy as numpy
+import pytest
+import benchmark
+import incorer2
+import liveindex
+import measurments as meas
+
+MEASURES_TO_RUN = {"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":False, "I_MC":False}
+
+def _database(rows=60):
+    df, constraints = benchmark.generate_database(rows, 8, fdDcs=1, orderDcs=1, singleDcs=1, violationRate=0.05, seed=3)
+    return df.astype(float) + 0.5, constraints
+
+def test_live_measures_follow_the_mutated_table(tmp_path):
+    random.seed(7)
+    numpy.random.seed(7)
+    df, constraints = _database()
+    columns = meas.col_in_constraints(' '.join(constraints), df)
+    probs = incorer2.calculate_all_probs(df, columns, 0)
+    allConstraints = meas.build_dynamic_queries(constraints, df)
+    live = liveindex.LiveMeasures(df, constraints, MEASURES_TO_RUN, str(tmp_path))
+    rows = len(df.index)
+    for iteration in range(1, 121):
+        row, column, value = incorer2.rand_vio_algorithm(df, columns, probs, 0.5)
+        assert 0 <= row < rows
+        live.apply([(row, column, value)])
+        if iteration % 10 == 0:
+            # the changes are made to tuples of the database, the table keeps its size
+            assert len(df.index) == rows
+            expected = meas.compute_measures(df, constraints, allConstraints, MEASURES_TO_RUN, str(tmp_path), 'blocked')
+            assert live.measures() == expected
+
+def test_live_update_rejects_absent_rows(tmp_path):
+    df, constraints = _database(10)
+    live = liveindex.LiveViolations(df, constraints)
+    column = df.columns[0]
+    for row in (-1, len(df.index)):
+        with pytest.raises(IndexError):
+            live.update(row, column, 1.5)
+    with pytest.raises(IndexError):
+        live.delete(-1)
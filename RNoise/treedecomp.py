@@ -0,0 +1,201 @@
+import heapq
+
+# components whose heuristic tree decomposition is wider are left to the solvers of measurments.py
+MAX_WIDTH = 8
+
+# the states of a tuple of a bag when counting maximal independent sets
+IN, DOMINATED, FREE = 0, 1, 2
+
+def tree_decomposition(neighbors, maxWidth=MAX_WIDTH):
+    """
+    tree_decomposition - a tree decomposition of a graph from a min-degree elimination ordering.
+    The vertex of lowest degree is eliminated first, and its neighbours are made a clique. The bag of a vertex
+    v is v and its neighbours when it is eliminated, and the parent of the bag is the bag of the neighbour
+    that is eliminated first. The width is the size of the largest bag minus one.
+
+    Parameters
+    ----------
+    neighbors : list of lists of int
+        the neighbours of every vertex (numbered from 0)
+    maxWidth : int
+        the decomposition stops as soon as a bag is wider
+
+    Returns
+    -------
+    dictionary with the keys bags (the neighbours of every vertex in its bag), parent (the parent vertex of every
+    bag, None for the roots) and order (the elimination ordering), or None when the width exceeds maxWidth
+    """
+    n = len(neighbors)
+    adjacency = [set(nb) for nb in neighbors]
+    eliminated = [False] * n
+    position = [0] * n
+    bags = [None] * n
+    order = []
+    heap = [(len(adjacency[v]), v) for v in range(n)]
+    heapq.heapify(heap)
+    while heap:
+        degree, v = heapq.heappop(heap)
+        if eliminated[v] or degree != len(adjacency[v]):
+            continue
+        if degree > maxWidth:
+            return None
+        bag = adjacency[v]
+        for a in bag:
+            adjacency[a].discard(v)
+            adjacency[a] |= bag - {a}
+            heapq.heappush(heap, (len(adjacency[a]), a))
+        bags[v] = sorted(bag)
+        eliminated[v] = True
+        position[v] = len(order)
+        order.append(v)
+    parent = [min(bags[v], key=lambda u: position[u]) if bags[v] else None for v in range(n)]
+    return {'bags': bags, 'parent': parent, 'order': order}
+
+def _children(decomposition):
+    children = dict((v, []) for v in decomposition['order'])
+    for v in decomposition['order']:
+        if decomposition['parent'][v] is not None:
+            children[decomposition['parent'][v]].append(v)
+    return children
+
+def _solve(neighbors, decomposition, empty, introduce, forget, join):
+    # dynamic programming over the decomposition: the bags are processed in the elimination ordering, so the
+    # children come before their parent. A table maps the states of the tuples of a bag to a value, every child
+    # forgets its own vertex, introduces the other tuples of the bag of its parent and is joined with the others.
+    adjacency = [set(nb) for nb in neighbors]
+    children = _children(decomposition)
+    tables = {}
+    roots = []
+    for v in decomposition['order']:
+        variables = tuple(sorted([v] + decomposition['bags'][v]))
+        joined = None
+        for c in children[v] or [None]:
+            if c is None:
+                childVariables, table = (), empty
+            else:
+                childVariables, table = forget(adjacency, tables.pop(c), c)
+            for u in variables:
+                if u not in childVariables:
+                    childVariables, table = introduce(adjacency, (childVariables, table), u)
+            joined = table if joined is None else join(joined, table, variables)
+        tables[v] = (variables, joined)
+        if decomposition['parent'][v] is None:
+            roots.append(v)
+    results = []
+    for root in roots:
+        variables, table = tables.pop(root)
+        for u in list(variables):
+            variables, table = forget(adjacency, (variables, table), u)
+        results.append(table[()])
+    return results
+
+def _mis_introduce(adjacency, bagTable, v):
+    variables, table = bagTable
+    index = sum(1 for u in variables if u < v)
+    near = [i for i, u in enumerate(variables) if u in adjacency[v]]
+    result = {}
+    for state, count in table.items():
+        dominated = any(state[i] == IN for i in near)
+        # v joins the set, its neighbours in the bag become dominated
+        if not dominated:
+            joinedState = list(state)
+            for i in near:
+                joinedState[i] = DOMINATED
+            key = tuple(joinedState[:index]) + (IN,) + tuple(joinedState[index:])
+            result[key] = result.get(key, 0) + count
+        key = state[:index] + (DOMINATED if dominated else FREE,) + state[index:]
+        result[key] = result.get(key, 0) + count
+    return variables[:index] + (v,) + variables[index:], result
+
+def _mis_forget(adjacency, bagTable, v):
+    # all the neighbours of v were seen, an excluded tuple must be dominated by now
+    variables, table = bagTable
+    index = variables.index(v)
+    result = {}
+    for state, count in table.items():
+        if state[index] != FREE:
+            key = state[:index] + state[index+1:]
+            result[key] = result.get(key, 0) + count
+    return variables[:index] + variables[index+1:], result
+
+def _mis_join(first, second, variables):
+    # an excluded tuple is dominated if it is dominated in one of the subtrees. The tables are transformed so that
+    # DOMINATED stands for "dominated or not" (a zeta transform on every tuple), multiplied, and transformed back.
+    def transform(table, sign):
+        table = dict(table)
+        for i in range(len(variables)):
+            for state in list(table):
+                if state[i] == FREE:
+                    key = state[:i] + (DOMINATED,) + state[i+1:]
+                    table[key] = table.get(key, 0) + sign * table[state]
+        return table
+    first, second = transform(first, 1), transform(second, 1)
+    product = dict((state, count * second[state]) for state, count in first.items() if second.get(state, 0))
+    return dict((state, count) for state, count in transform(product, -1).items() if count)
+
+def count_maximal_independent_sets(neighbors, decomposition):
+    """
+    count_maximal_independent_sets - the exact number of maximal independent sets of a graph, by dynamic
+    programming over a tree decomposition in time O(3^width) per bag. Every tuple of a bag is in the set, out
+    of the set and dominated by a tuple of the set, or out of the set and not dominated yet.
+
+    Parameters
+    ----------
+    neighbors : list of lists of int
+        the neighbours of every vertex (numbered from 0)
+    decomposition : dictionary
+        the result of tree_decomposition
+
+    Returns
+    -------
+    int
+    """
+    count = 1
+    for value in _solve(neighbors, decomposition, {(): 1}, _mis_introduce, _mis_forget, _mis_join):
+        count *= value
+    return count
+
+def _cover_introduce(adjacency, bagTable, v):
+    variables, table = bagTable
+    index = sum(1 for u in variables if u < v)
+    near = [i for i, u in enumerate(variables) if u in adjacency[v]]
+    result = {}
+    for state, size in table.items():
+        key = state[:index] + (True,) + state[index:]
+        result[key] = min(result.get(key, size + 1), size + 1)
+        # v may stay out of the cover only if its neighbours in the bag are in it
+        if all(state[i] for i in near):
+            key = state[:index] + (False,) + state[index:]
+            result[key] = min(result.get(key, size), size)
+    return variables[:index] + (v,) + variables[index:], result
+
+def _cover_forget(adjacency, bagTable, v):
+    variables, table = bagTable
+    index = variables.index(v)
+    result = {}
+    for state, size in table.items():
+        key = state[:index] + state[index+1:]
+        result[key] = min(result.get(key, size), size)
+    return variables[:index] + variables[index+1:], result
+
+def _cover_join(first, second, variables):
+    # the tuples of the bag in the cover are counted in both subtrees
+    return dict((state, size + second[state] - sum(state)) for state, size in first.items() if state in second)
+
+def min_vertex_cover(neighbors, decomposition):
+    """
+    min_vertex_cover - the size of a minimum vertex cover of a graph (the ILP of fourth_measurer_I_R), by
+    dynamic programming over a tree decomposition in time O(2^width) per bag.
+
+    Parameters
+    ----------
+    neighbors : list of lists of int
+        the neighbours of every vertex (numbered from 0)
+    decomposition : dictionary
+        the result of tree_decomposition
+
+    Returns
+    -------
+    int
+    """
+    return sum(_solve(neighbors, decomposition, {(): 0}, _cover_introduce, _cover_forget, _cover_join))
@@ -0,0 +1,180 @@
+import pandas as pd
+import numpy as numpy
+import math
+import multiprocessing
+import os
+import conflictgraph as cg
+import dcimplication as dci
+import measurememo
+import measurments as meas
+
+def leave_one_out(constraintSets):
+    """
+    leave_one_out - the subsets of the constraints that drop a single constraint, one per constraint.
+    """
+    constraintSets = list(constraintSets)
+    return [constraintSets[:k] + constraintSets[k+1:] for k in range(len(constraintSets))]
+
+def _component_task(task):
+    # runs in a worker of the pool, the graph of I_MC is generated in a directory of its own
+    key, edges, measures, fullPath = task
+    workDir = os.path.join(fullPath, 'whatif_' + str(os.getpid()))
+    if not os.path.exists(workDir):
+        os.makedirs(workDir)
+    return key, measurememo.component_measures(edges, measures, workDir)
+
+def evaluate_subsets(attribution, subsets, measuresToRun, fullPath, workers=1):
+    """
+    evaluate_subsets - the measures of the database for every subset of the constraints, from a single detection
+    of the violations of all the constraints.
+    The violating pairs of a subset are the pairs that violate one of its constraints, read from the bitmasks of
+    the attribution. Removing constraints only removes pairs, so the conflict graph of a subset is a subgraph of
+    the full conflict graph, and every component of the full graph falls into one of three cases:
+    - all its pairs violate a constraint of the subset: the component is unchanged, and its measures are
+      computed once for all the subsets that keep it;
+    - none of its pairs does: it adds nothing to the measures;
+    - some of its pairs do: the remaining pairs are split into components, which are measured on their own and
+      shared by the subsets that give the same pairs.
+    The distinct components of all the subsets are measured on a pool of processes, and the measures
+    of every subset are summed (multiplied for I_MC) over its components, like in measurememo.MeasureMemo.
+
+    Parameters
+    ----------
+    attribution : detection.Attribution
+        the violating pairs of all the constraints and the constraints they violate
+    subsets : list of lists
+        the subsets of the constraints, as strings or as indexes in attribution.constraints
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    fullPath : string
+        the directory where the graphs of I_MC are generated
+    workers : int
+        the number of processes measuring the components
+
+    Returns
+    -------
+    list of dictionaries, the values of the selected measures for every subset (with I_MC_log_err when I_MC_log
+    is selected)
+    """
+    measures = [m for m in ("I_R", "I_lin_R", "I_MC") if measuresToRun.get(m)]
+    if measuresToRun.get("I_MC_log"):
+        measures += ["I_MC_log", "I_MC_log_var"]
+    pairs = attribution.pairs
+    if len(pairs):
+        nodes, labels = cg.connected_components(pairs)
+        edgeLabels = labels[numpy.searchsorted(nodes, pairs[:,0])]
+    else:
+        edgeLabels = numpy.zeros(0, dtype=numpy.int64)
+    order = numpy.argsort(edgeLabels, kind='stable')
+    componentPairs = numpy.split(order, numpy.flatnonzero(numpy.diff(edgeLabels[order])) + 1) if len(pairs) else []
+    componentSizes = numpy.bincount(edgeLabels, minlength=len(componentPairs))
+
+    # the components of every subset, and the distinct components to measure
+    subsetKeys = []
+    tasks = {}
+    keptMasks = []
+    for subset in subsets:
+        kept = attribution.violates_any(subset)
+        keptMasks.append(kept)
+        keys = []
+        if measures:
+            keptSizes = numpy.bincount(edgeLabels[kept], minlength=len(componentPairs))
+            for c in numpy.flatnonzero(keptSizes == componentSizes):
+                if componentSizes[c]:
+                    key = ('component', int(c))
+                    if key not in tasks:
+                        tasks[key] = pairs[componentPairs[c]]
+                    keys.append(key)
+            for c in numpy.flatnonzero((keptSizes > 0) & (keptSizes < componentSizes)):
+                rows = componentPairs[c][kept[componentPairs[c]]]
+                for edges in measurememo.component_edges(measurememo.canonical_pairs(pairs[rows])):
+                    key = ('subgraph', edges.tobytes())
+                    if key not in tasks:
+                        tasks[key] = edges
+                    keys.append(key)
+        subsetKeys.append(keys)
+
+    jobs = [(key, edges, measures, fullPath) for key, edges in tasks.items()]
+    if workers <= 1 or len(jobs) <= 1:
+        componentValues = dict(map(_component_task, jobs))
+    else:
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+        pool = context.Pool(workers)
+        try:
+            componentValues = dict(pool.imap_unordered(_component_task, jobs, chunksize=max(1, len(jobs) // (8 * workers))))
+        finally:
+            pool.close()
+            pool.join()
+
+    results = []
+    for kept, keys in zip(keptMasks, subsetKeys):
+        values = {}
+        keptPairs = pairs[kept]
+        if measuresToRun.get("I_D"):
+            values["I_D"] = meas.first_measurer_I_D(keptPairs)
+        if measuresToRun.get("I_MI"):
+            values["I_MI"] = meas.second_measurer_I_MI(keptPairs)
+        if measuresToRun.get("I_P"):
+            values["I_P"] = meas.third_measurer_I_P(numpy.unique(keptPairs))
+        for measure in measures:
+            values[measure] = 1 if measure == "I_MC" else 0
+        for key in keys:
+            for measure in measures:
+                if measure == "I_MC":
+                    values[measure] *= componentValues[key][measure]
+                else:
+                    values[measure] += componentValues[key][measure]
+        if "I_MC_log_var" in values:
+            values["I_MC_log_err"] = math.sqrt(values.pop("I_MC_log_var"))
+        results.append(values)
+    return results
+
+def subset_measures(df, constraintSets, subsets=None, measuresToRun={"I_D":True, "I_MI":True, "I_P":True, "I_R":True, "I_lin_R":True, "I_MC":False}, fullPath='.', detectionMode='blocked', memoryBudget=1<<30, workers=1):
+    """
+    subset_measures - what-if analysis of the constraints: the measures of the database when only some of the
+    constraints are checked, for many subsets at once, without editing dcs.txt and running the detection again.
+    The violations of all the constraints are detected once, together with the constraints every pair violates
+    (see detection.Attribution). The constraints implied by others are not checked (see
+    dcimplication.reduce_constraints) and their pairs are derived from the pairs of the constraints that imply
+    them, so a subset may drop a constraint and keep the constraints it implies. The subsets are then evaluated
+    by evaluate_subsets.
+
+    Parameters
+    ----------
+    df : dataframe
+        the database frame
+    constraintSets : list of strings
+        the constraints from the dcs file
+    subsets : list of lists
+        the subsets of the constraints to evaluate, as strings or as indexes in constraintSets. By default all
+        the constraints and every subset that drops one of them (see leave_one_out)
+    measuresToRun : dictionary
+        the measures to compute, from the names in meas.MEASURES to bool
+    fullPath : string
+        the directory where the graphs of I_MC are generated
+    detectionMode : string
+        'blocked', 'parallel' or 'partitioned', the detection of constraints_check
+    memoryBudget : int
+        the number of bytes available for the violation detection
+    workers : int
+        the number of processes measuring the components
+
+    Returns
+    -------
+    dataframe with a row per subset: the number of its constraints, the constraints it drops (separated by
+    spaces) and the values of the selected measures
+    """
+    constraintSets = list(dict.fromkeys(constraintSets))
+    if subsets is None:
+        subsets = [constraintSets] + leave_one_out(constraintSets)
+    subsets = [[constraintSets[con] if isinstance(con, (int, numpy.integer)) else con for con in subset] for subset in subsets]
+    kept, removed = dci.reduce_constraints(constraintSets)
+    attribution = meas.constraints_check(df, kept, None, None, None, detectionMode, memoryBudget, fullPath, attribution=True)[4]
+    attribution = dci.derived_attribution(df, attribution, removed)
+
+    rows = []
+    for subset, values in zip(subsets, evaluate_subsets(attribution, subsets, measuresToRun, fullPath, workers)):
+        row = {'constraints': len(subset), 'dropped': ' '.join(con for con in constraintSets if con not in subset)}
+        row.update(values)
+        rows.append(row)
+    return pd.DataFrame(rows)